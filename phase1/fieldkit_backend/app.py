@@ -3,16 +3,30 @@ FieldKit Flask Application
 Phase 1: Authentication & Company-in-URL Architecture
 """
 
-from flask import Flask, request, session, jsonify, render_template, redirect, url_for, abort
+from flask import Flask, request, session, jsonify, render_template, redirect, url_for, abort, g, has_app_context, has_request_context, send_file, Response
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values, Json
+from psycopg2.pool import PoolError
+import base64
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 import bcrypt
+import hashlib
+import io
 import secrets
 from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
 from functools import wraps
 import json
 import math
 import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, wait
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('FLASK_SECRET_KEY', secrets.token_hex(32))
@@ -29,6 +43,12 @@ DB_PASSWORD = os.environ.get('DB_PASSWORD', '')
 DB_HOST     = os.environ.get('DB_HOST',     'localhost')
 DB_PORT     = os.environ.get('DB_PORT',     '5432')
 
+# Connection pool sizing, per company database, per gunicorn worker. Worst
+# case open connections = workers x 4 companies x DB_POOL_MAX, which must stay
+# under PostgreSQL's max_connections (default 100).
+DB_POOL_MAX     = int(os.environ.get('DB_POOL_MAX',     '5'))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '10'))
+
 COMPANY_BRANDING = {
     'getagrip': {
         'name': 'Get a Grip Charlotte', 'short_name': 'Get a Grip',
@@ -73,16 +93,559 @@ NC_COUNTIES = [
 # Database helpers
 # ============================================================================
 
-def get_db_connection(company_key):
-    if company_key not in DB_CONFIG:
-        raise ValueError(f"Invalid company key: {company_key}")
+class InstrumentedCursor(RealDictCursor):
+    """The cursor every pooled connection hands out. Inside a request it adds
+    each statement's count and wall time, and every row fetched, to the
+    request's query stats (see _begin_request_metrics). Worker threads and
+    scripts have no request, so they run uninstrumented."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._query_stats = g.get('_query_stats') if has_app_context() else None
+
+    def execute(self, query, vars=None):
+        stats = self._query_stats
+        if stats is None:
+            return super().execute(query, vars)
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            elapsed = time.perf_counter() - started
+            stats['queries'] += 1
+            stats['db_seconds'] += elapsed
+            if 0 < SLOW_QUERY_SECONDS <= elapsed:
+                log_slow_query(self, query, vars, elapsed)
+
+    def executemany(self, query, vars_list):
+        stats = self._query_stats
+        if stats is None:
+            return super().executemany(query, vars_list)
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            elapsed = time.perf_counter() - started
+            stats['queries'] += 1
+            stats['db_seconds'] += elapsed
+            if 0 < SLOW_QUERY_SECONDS <= elapsed:
+                log_slow_query(self, query, None, elapsed)
+
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None and self._query_stats is not None:
+            self._query_stats['rows'] += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(size)
+        if self._query_stats is not None:
+            self._query_stats['rows'] += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        if self._query_stats is not None:
+            self._query_stats['rows'] += len(rows)
+        return rows
+
+    def __iter__(self):
+        if self._query_stats is None:
+            yield from super().__iter__()
+            return
+        n = 0
+        try:
+            for row in super().__iter__():
+                n += 1
+                yield row
+        finally:
+            self._query_stats['rows'] += n
+
+def _connect(company_key):
     return psycopg2.connect(
         dbname=DB_CONFIG[company_key],
         user=DB_USER, password=DB_PASSWORD,
         host=DB_HOST, port=DB_PORT,
-        cursor_factory=RealDictCursor
+        cursor_factory=InstrumentedCursor
     )
 
+class CompanyPool:
+    """Bounded pool of open connections to one company database.
+
+    At most maxconn connections exist at once; a checkout beyond that blocks
+    for up to timeout seconds and then raises PoolError. Counters are kept for
+    the pool stats endpoint so workers can be sized against max_connections."""
+
+    def __init__(self, company_key, maxconn, timeout):
+        self.company_key  = company_key
+        self.maxconn      = maxconn
+        self.timeout      = timeout
+        self._idle        = []
+        self._lock        = threading.Lock()
+        self._slots       = threading.BoundedSemaphore(maxconn)
+        self.checkouts    = 0
+        self.waits        = 0
+        self.wait_seconds = 0.0
+        self.timeouts     = 0
+        self.active       = 0
+
+    def getconn(self):
+        if not self._slots.acquire(blocking=False):
+            started = time.monotonic()
+            got     = self._slots.acquire(timeout=self.timeout)
+            with self._lock:
+                self.waits        += 1
+                self.wait_seconds += time.monotonic() - started
+                if not got:
+                    self.timeouts += 1
+            if not got:
+                raise PoolError(f"Connection pool for {self.company_key} exhausted "
+                                f"({self.maxconn} in use for {self.timeout:g}s)")
+        try:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None or conn.closed:
+                conn = _connect(self.company_key)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self.checkouts += 1
+            self.active    += 1
+        return conn
+
+    def putconn(self, conn):
+        """Return a connection. Uncommitted work is rolled back (same as the
+        old close()); a connection that can't even roll back is dropped."""
+        keep = not conn.closed
+        if keep:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                keep = False
+                conn.close()
+        with self._lock:
+            self.active -= 1
+            if keep:
+                self._idle.append(conn)
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max':             self.maxconn,
+                'active':          self.active,
+                'idle':            len(self._idle),
+                'checkouts':       self.checkouts,
+                'waits':           self.waits,
+                'wait_time_ms':    round(self.wait_seconds * 1000, 1),
+                'timeouts':        self.timeouts,
+            }
+
+_pools      = {}
+_pools_lock = threading.Lock()
+
+def _get_pool(company_key):
+    pool = _pools.get(company_key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(company_key)
+            if pool is None:
+                pool = _pools[company_key] = CompanyPool(company_key, DB_POOL_MAX, DB_POOL_TIMEOUT)
+    return pool
+
+def pool_stats():
+    """Counters for every company pool opened so far in this worker."""
+    return {key: pool.stats() for key, pool in sorted(_pools.items())}
+
+class PooledConnection:
+    """What get_db_connection hands out: a psycopg2 connection whose close()
+    gives it back instead of hanging up. Everything else passes through."""
+
+    def __init__(self, conn, release):
+        self._conn    = conn
+        self._release = release
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise psycopg2.InterfaceError('connection already closed')
+        return getattr(self._conn, name)
+
+    @property
+    def closed(self):
+        return self._conn is None or self._conn.closed
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._release(conn)
+
+def get_db_connection(company_key):
+    """Check out a connection to a company database.
+
+    Inside a request, every call for the same company shares ONE pooled
+    connection, held until the request ends (see _return_request_connections),
+    so helpers that open their own connection no longer pay a handshake each.
+    close() keeps its old meaning: once the last holder closes, uncommitted
+    work is rolled back. Outside a request (scripts, worker threads) each
+    call is its own checkout, returned to the pool on close()."""
+    if company_key not in DB_CONFIG:
+        raise ValueError(f"Invalid company key: {company_key}")
+    pool = _get_pool(company_key)
+    if not has_app_context():
+        return PooledConnection(pool.getconn(), pool.putconn)
+
+    held = g.setdefault('_db_connections', {})
+    if company_key not in held:
+        held[company_key] = [pool.getconn(), 0]
+        stats = g.get('_query_stats')
+        if stats is not None:
+            stats['connections'] += 1
+    entry = held[company_key]
+    entry[1] += 1
+
+    def release(conn):
+        entry[1] -= 1
+        if entry[1] == 0 and not conn.closed:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                pass  # broken connection; teardown drops it
+    return PooledConnection(entry[0], release)
+
+@app.teardown_appcontext
+def _return_request_connections(exc):
+    for company_key, (conn, _refs) in g.pop('_db_connections', {}).items():
+        _get_pool(company_key).putconn(conn)
+
+# ============================================================================
+# Request metrics
+# Per-route latency, query count, DB time, rows fetched and connections checked
+# out, kept as histograms per gunicorn worker and served as Prometheus text on
+# /metrics. Each scrape sees the worker that answered it, so scrape workers
+# directly (or run one worker) for exact totals.
+# ============================================================================
+
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+_SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+_QUERY_BUCKETS   = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+_CONN_BUCKETS    = (0, 1, 2, 4, 8)
+_ROW_BUCKETS     = (0, 1, 10, 100, 1000, 10000, 100000)
+
+class Histogram:
+    """Prometheus-style cumulative histogram over (endpoint, company) labels."""
+
+    def __init__(self, name, help_text, buckets):
+        self.name    = name
+        self.help    = help_text
+        self.buckets = buckets
+        self._series = {}   # (endpoint, company) -> [bucket counts..., sum, count]
+        self._lock   = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for (endpoint, company), series in items:
+            labels = f'endpoint="{endpoint}",company="{company}"'
+            for bound, n in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound:g}"}} {n}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {series[-1]}')
+            lines.append(f'{self.name}_sum{{{labels}}} {series[-2]:.6f}')
+            lines.append(f'{self.name}_count{{{labels}}} {series[-1]}')
+        return lines
+
+REQUEST_METRICS = {
+    'latency':     Histogram('fieldkit_request_duration_seconds',
+                             'Wall time per request, from routing to teardown.', _SECONDS_BUCKETS),
+    'db_seconds':  Histogram('fieldkit_request_db_seconds',
+                             'Time spent in cursor execute calls per request.', _SECONDS_BUCKETS),
+    'queries':     Histogram('fieldkit_request_queries',
+                             'Statements executed per request.', _QUERY_BUCKETS),
+    'rows':        Histogram('fieldkit_request_rows',
+                             'Rows fetched per request.', _ROW_BUCKETS),
+    'connections': Histogram('fieldkit_request_connections',
+                             'Pool checkouts per request.', _CONN_BUCKETS),
+}
+_responses      = {}   # (endpoint, company, status) -> count
+_responses_lock = threading.Lock()
+
+@app.before_request
+def _begin_request_metrics():
+    g._request_started = time.perf_counter()
+    g._query_stats     = {'queries': 0, 'db_seconds': 0.0, 'rows': 0, 'connections': 0}
+
+@app.after_request
+def _note_response_status(response):
+    g._response_status = response.status_code
+    started, stats = g.get('_request_started'), g.get('_query_stats')
+    if response.is_streamed and not response.direct_passthrough \
+            and started is not None and stats is not None:
+        # Flask tears a stream_with_context request down once before the body
+        # runs and again after it, so a generated response is recorded when
+        # its body is closed instead -- after the last chunk, with the
+        # queries that produced it counted. (send_file bodies run no queries,
+        # and are handed to the server as-is, without close callbacks.)
+        g._metrics_on_close = True
+        endpoint, company = _request_labels()
+        response.call_on_close(lambda: _observe_request(
+            endpoint, company, response.status_code, started, stats))
+    return response
+
+def _request_labels():
+    endpoint = request.endpoint or 'unmatched'
+    company  = (request.view_args or {}).get('company_key', '')
+    if company not in DB_CONFIG:
+        company = ''
+    return endpoint, company
+
+@app.teardown_request
+def _record_request_metrics(exc):
+    """Runs once the response has been returned; streamed responses are
+    recorded when their body is closed (see _note_response_status)."""
+    if g.get('_metrics_on_close'):
+        return
+    started = g.pop('_request_started', None)
+    stats   = g.pop('_query_stats', None)
+    if started is None or stats is None:
+        return
+    endpoint, company = _request_labels()
+    status = 500 if exc is not None else g.get('_response_status', 500)
+    _observe_request(endpoint, company, status, started, stats)
+
+def _observe_request(endpoint, company, status, started, stats):
+    labels = (endpoint, company)
+    REQUEST_METRICS['latency'].observe(labels, time.perf_counter() - started)
+    REQUEST_METRICS['db_seconds'].observe(labels, stats['db_seconds'])
+    REQUEST_METRICS['queries'].observe(labels, stats['queries'])
+    REQUEST_METRICS['rows'].observe(labels, stats['rows'])
+    REQUEST_METRICS['connections'].observe(labels, stats['connections'])
+    with _responses_lock:
+        key = (endpoint, company, status)
+        _responses[key] = _responses.get(key, 0) + 1
+    for listener in list(_request_stats_listeners):
+        listener({'endpoint': endpoint, 'company': company, 'status': status, **stats})
+
+_request_stats_listeners = []
+
+@contextmanager
+def capture_request_stats():
+    """Collect the stats of every request that finishes inside the block.
+    Yields a list that fills with one dict per request: endpoint, company,
+    status, queries, connections, db_seconds, rows. For query budget checks
+    (benchmarks/check_query_budgets.py), not for live traffic."""
+    captured = []
+    listener = captured.append
+    _request_stats_listeners.append(listener)
+    try:
+        yield captured
+    finally:
+        _request_stats_listeners.remove(listener)
+
+# ============================================================================
+# Slow-query log
+# Any statement run during a request that takes SLOW_QUERY_MS or longer is
+# logged with its fingerprint (SQL with literals and placeholders collapsed),
+# redacted parameters (types and lengths only), company and route. Recent hits
+# are kept in a ring buffer and totals per fingerprint, both per worker. The
+# first hit of each fingerprint also captures its plan: EXPLAIN, never
+# ANALYZE, so nothing runs twice; a generic plan ($n placeholders) where
+# PostgreSQL can infer the parameter types, otherwise the plan for the actual
+# values with every literal in it scrubbed to ?, so parameter values never
+# reach the admin page. SLOW_QUERY_MS=0 turns the log off.
+# ============================================================================
+
+SLOW_QUERY_SECONDS     = float(os.environ.get('SLOW_QUERY_MS', '250')) / 1000
+SLOW_QUERY_LOG_SIZE    = int(os.environ.get('SLOW_QUERY_LOG_SIZE', '200'))
+SLOW_QUERY_EXPLAIN     = os.environ.get('SLOW_QUERY_EXPLAIN', 'on').lower() not in ('0', 'off', 'false', 'no')
+SLOW_QUERY_FINGERPRINTS = 500   # distinct fingerprints kept; the cheapest is dropped
+
+_slow_recent   = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+_slow_totals   = {}   # fingerprint -> totals, sample SQL and captured plan
+_slow_lock     = threading.Lock()
+_DB_COMPANY    = {dbname: key for key, dbname in DB_CONFIG.items()}
+
+_SQL_LITERAL      = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%\(\w+\)s|%s")
+_SQL_LIST         = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SQL_LIST_RUN     = re.compile(r"\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+")
+_SQL_PLACEHOLDER  = re.compile(r"%\((\w+)\)s|%s|%%")
+_EXPLAINABLE      = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+
+def _query_text(cur, query):
+    if isinstance(query, bytes):
+        return query.decode('utf-8', 'replace')
+    if not isinstance(query, str):
+        return query.as_string(cur.connection)   # psycopg2.sql.Composable
+    return query
+
+def fingerprint_sql(text):
+    """(fingerprint, normalized SQL): literals and placeholders become ?, IN
+    lists and multi-row VALUES collapse to (...), whitespace to one space."""
+    normalized = _SQL_LITERAL.sub('?', ' '.join(text.split()))
+    normalized = _SQL_LIST_RUN.sub('(...)', _SQL_LIST.sub('(...)', normalized))
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12], normalized
+
+def _redact(value):
+    if value is None:
+        return 'NULL'
+    if isinstance(value, (str, bytes, list, tuple)):
+        return f'<{type(value).__name__}:{len(value)}>'
+    return f'<{type(value).__name__}>'
+
+def redact_params(vars):
+    if vars is None:
+        return None
+    if isinstance(vars, dict):
+        return {k: _redact(v) for k, v in vars.items()}
+    return [_redact(v) for v in vars]
+
+def _generic_sql(text):
+    """psycopg2 placeholders rewritten as $1..$n for EXPLAIN (GENERIC_PLAN)."""
+    numbers = {}
+    def number(m):
+        if m.group(0) == '%%':
+            return '%'
+        key = m.group(1) if m.group(1) else len(numbers)
+        if key not in numbers:
+            numbers[key] = len(numbers) + 1
+        return f'${numbers[key]}'
+    return _SQL_PLACEHOLDER.sub(number, text)
+
+def _scrub_plan(node):
+    """A plan JSON with quoted and numeric literals in its expressions
+    replaced by ? (cost and row estimates are JSON numbers, not strings)."""
+    if isinstance(node, dict):
+        return {k: _scrub_plan(v) for k, v in node.items()}
+    if isinstance(node, list):
+        return [_scrub_plan(v) for v in node]
+    if isinstance(node, str):
+        return _SQL_LITERAL.sub('?', node)
+    return node
+
+def _explain(cur, text, vars):
+    """JSON plan for a statement without running it, on a separate plain cursor
+    inside a savepoint so a failed EXPLAIN can't poison the caller's
+    transaction. Returns (plan, generic) or (None, None); a plan for the
+    actual values comes back scrubbed of literals."""
+    conn = cur.connection
+    if conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_INERROR:
+        return None, None
+    attempts = []
+    if vars is not None:
+        attempts.append(('EXPLAIN (GENERIC_PLAN, FORMAT JSON) ' + _generic_sql(text), None, True))
+    attempts.append(('EXPLAIN (FORMAT JSON) ' + text, vars, False))
+    ecur = conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+    try:
+        for sql, params, generic in attempts:
+            if not conn.autocommit:
+                ecur.execute('SAVEPOINT slow_query_explain')
+            try:
+                ecur.execute(sql, params)
+                plan = ecur.fetchone()[0]
+            except psycopg2.Error:
+                if not conn.autocommit:
+                    ecur.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+                continue
+            finally:
+                if not conn.autocommit:
+                    ecur.execute('RELEASE SAVEPOINT slow_query_explain')
+            return (plan if generic else _scrub_plan(plan)), generic
+    except psycopg2.Error:
+        pass
+    finally:
+        ecur.close()
+    return None, None
+
+def log_slow_query(cur, query, vars, elapsed):
+    """Record one slow statement; called by InstrumentedCursor."""
+    try:
+        text = _query_text(cur, query)
+        fingerprint, normalized = fingerprint_sql(text)
+        company  = _DB_COMPANY.get(cur.connection.info.dbname, cur.connection.info.dbname)
+        endpoint = request.endpoint if has_request_context() else None
+        entry = {
+            'at':          datetime.now(),
+            'fingerprint': fingerprint,
+            'ms':          round(elapsed * 1000, 1),
+            'company':     company,
+            'endpoint':    endpoint or 'unmatched',
+            'params':      redact_params(vars),
+            'sql':         normalized,
+        }
+        with _slow_lock:
+            _slow_recent.append(entry)
+            totals = _slow_totals.get(fingerprint)
+            if totals is None:
+                if len(_slow_totals) >= SLOW_QUERY_FINGERPRINTS:
+                    cheapest = min(_slow_totals, key=lambda f: _slow_totals[f]['total_ms'])
+                    del _slow_totals[cheapest]
+                totals = _slow_totals[fingerprint] = {
+                    'fingerprint': fingerprint, 'sql': normalized,
+                    'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                    'plan': None, 'plan_generic': None,
+                    'explained': False, 'explaining': False,
+                }
+            totals['calls']    += 1
+            totals['total_ms'] += entry['ms']
+            totals['max_ms']    = max(totals['max_ms'], entry['ms'])
+            totals['last_at']   = entry['at']
+            totals['company']   = company
+            totals['endpoint']  = entry['endpoint']
+            explain = SLOW_QUERY_EXPLAIN and not totals['explained'] \
+                and not totals['explaining'] \
+                and text.lstrip().lstrip('(').upper().startswith(_EXPLAINABLE)
+            if explain:
+                totals['explaining'] = True
+        if explain:
+            try:
+                plan, generic = _explain(cur, text, vars)
+            finally:
+                with _slow_lock:
+                    totals['explaining'] = False
+            if plan is not None:
+                with _slow_lock:
+                    totals['plan'], totals['plan_generic'] = plan, generic
+                    totals['explained'] = True
+    except Exception as e:
+        print(f"SLOW QUERY LOG ERROR: {type(e).__name__}: {e}", flush=True)
+
+def slow_query_report(limit=50):
+    """(top fingerprints by total time, recent hits newest first)."""
+    with _slow_lock:
+        top    = sorted((dict(t) for t in _slow_totals.values()),
+                        key=lambda t: t['total_ms'], reverse=True)[:limit]
+        recent = list(reversed(_slow_recent))
+    for t in top:
+        t['mean_ms'] = round(t['total_ms'] / t['calls'], 1)
+        t['plan']    = json.dumps(t['plan'], indent=2) if t['plan'] is not None else None
+    return top, recent
+
+def render_metrics():
+    """Prometheus text exposition of every request metric in this worker."""
+    lines = []
+    for histogram in REQUEST_METRICS.values():
+        lines.extend(histogram.render())
+    lines.append('# HELP fieldkit_responses_total Responses by route and status code.')
+    lines.append('# TYPE fieldkit_responses_total counter')
+    with _responses_lock:
+        items = sorted(_responses.items())
+    for (endpoint, company, status), n in items:
+        lines.append(f'fieldkit_responses_total{{endpoint="{endpoint}",company="{company}",'
+                     f'status="{status}"}} {n}')
+    return '\n'.join(lines) + '\n'
+
 def get_user_by_username(username):
     conn = get_db_connection('getagrip')
     cur  = conn.cursor()
@@ -101,16 +664,152 @@ def update_last_login(username):
     cur.execute("UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE username = %s", (username,))
     conn.commit(); cur.close(); conn.close()
 
-def get_customer_count(company_key):
+# Per-company stats for the dashboard and home launch pad, computed in one
+# statement per company and held in memory per worker, so both pages read no
+# database at all once warm. Each entry is served for at most
+# COMPANY_STATS_INTERVAL seconds after it was fetched; an older one is cold
+# and read again before the page renders. A background ticker re-reads every
+# company looked at within COMPANY_STATS_IDLE seconds twice per interval, so
+# companies in use stay warm. Writes that move a figure call
+# invalidate_company_stats, which refreshes only the writing worker's copy:
+# other gunicorn workers catch up within the interval.
+COMPANY_STATS_INTERVAL = float(os.environ.get('COMPANY_STATS_INTERVAL', '30'))
+COMPANY_STATS_IDLE     = float(os.environ.get('COMPANY_STATS_IDLE',     '900'))
+COMPANY_STATS_TIMEOUT  = float(os.environ.get('COMPANY_STATS_TIMEOUT',  '2'))
+
+_company_stats      = {}   # company_key -> (time.monotonic() of the fetch, stats dict)
+_company_stats_read = {}   # company_key -> time.monotonic() of the last read
+_company_stats_busy = {}   # company_key -> in-flight refresh future
+_company_stats_lock = threading.Lock()
+_stats_executor     = ThreadPoolExecutor(max_workers=len(DB_CONFIG),
+                                         thread_name_prefix='company-stats')
+_stats_ticker_pid   = None
+
+def _fetch_company_stats(company_key):
+    """Runs on a worker thread (no request context, so its own checkout)."""
+    fetched_at = time.monotonic()
     try:
         conn = get_db_connection(company_key)
-        cur  = conn.cursor()
-        cur.execute("SELECT COUNT(*) as count FROM customers WHERE deleted_at IS NULL AND status = 'Active'")
-        count = cur.fetchone()['count']
-        cur.close(); conn.close()
-        return count
-    except Exception:
-        return 0
+        try:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT
+                    (SELECT COUNT(*) FROM customers
+                     WHERE deleted_at IS NULL AND status = 'Active')              AS active_customers,
+                    (SELECT COUNT(*) FROM work_orders
+                     WHERE deleted_at IS NULL
+                       AND status NOT IN ('Completed', 'No Charge', 'Cancelled', 'Invoiced'))
+                                                                                  AS open_work_orders,
+                    (SELECT COALESCE(SUM(accruing_count), 0) FROM work_orders
+                     WHERE deleted_at IS NULL)                                    AS accruing_equipment,
+                    (SELECT COUNT(*) FROM invoices
+                     WHERE deleted_at IS NULL AND state = 'Live')                 AS live_invoices,
+                    (SELECT COUNT(*) FROM invoices
+                     WHERE deleted_at IS NULL AND state = 'Hardened')             AS hardened_invoices,
+                    (SELECT COALESCE(json_agg(r), '[]') FROM (
+                         SELECT id, property_name, customer_type, city, status
+                         FROM customers WHERE deleted_at IS NULL
+                         ORDER BY created_at DESC LIMIT 10) r)                    AS recent_customers
+            """)
+            stats = dict(cur.fetchone())
+            cur.close()
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"COMPANY STATS ERROR ({company_key}): {type(e).__name__}: {e}", flush=True)
+        return None
+    with _company_stats_lock:
+        if fetched_at >= _company_stats.get(company_key, (0,))[0]:
+            _company_stats[company_key] = (fetched_at, stats)
+    return stats
+
+def _refresh_company_stats(company_key):
+    """Start a background refresh unless one is already running."""
+    with _company_stats_lock:
+        future = _company_stats_busy.get(company_key)
+        if future is None or future.done():
+            future = _company_stats_busy[company_key] = \
+                _stats_executor.submit(_fetch_company_stats, company_key)
+    return future
+
+def _company_stats_ticker():
+    while True:
+        time.sleep(COMPANY_STATS_INTERVAL / 2)
+        now = time.monotonic()
+        with _company_stats_lock:
+            keys = [key for key, read_at in _company_stats_read.items()
+                    if now - read_at < COMPANY_STATS_IDLE]
+        for key in keys:
+            _refresh_company_stats(key)
+
+def _ensure_stats_ticker():
+    # Started on first use in each process, never at import: gunicorn forks
+    # workers after importing the app, and threads don't survive a fork.
+    global _stats_ticker_pid
+    pid = os.getpid()
+    if _stats_ticker_pid == pid:
+        return
+    with _company_stats_lock:
+        if _stats_ticker_pid == pid:
+            return
+        _stats_ticker_pid = pid
+    threading.Thread(target=_company_stats_ticker, name='company-stats-ticker',
+                     daemon=True).start()
+
+def get_company_stats_many(company_keys):
+    """{company_key: stats dict} for several companies: active_customers,
+    open_work_orders, accruing_equipment, live_invoices, hardened_invoices,
+    recent_customers. Callers must treat the dicts as read-only.
+
+    Companies fetched within COMPANY_STATS_INTERVAL come straight from
+    memory. Cold ones (never fetched, or stale) are fetched
+    concurrently and waited on for at most COMPANY_STATS_TIMEOUT; a company
+    that errors or runs late maps to None (the page shows a dash, not a false
+    0), and a late fetch still lands for the next render."""
+    _ensure_stats_ticker()
+    now   = time.monotonic()
+    stats = {}
+    with _company_stats_lock:
+        for key in company_keys:
+            _company_stats_read[key] = now
+            fetched_at, cached = _company_stats.get(key, (None, None))
+            if fetched_at is not None and now - fetched_at < COMPANY_STATS_INTERVAL:
+                stats[key] = cached
+    futures = {key: _refresh_company_stats(key) for key in company_keys if key not in stats}
+    if futures:
+        request_stats = g.get('_query_stats') if has_app_context() else None
+        if request_stats is not None:
+            # The page blocks on these: one checkout and one statement each.
+            request_stats['connections'] += len(futures)
+            request_stats['queries']     += len(futures)
+        wait(futures.values(), timeout=COMPANY_STATS_TIMEOUT)
+    for key, future in futures.items():
+        stats[key] = future.result() if future.done() else None
+    return stats
+
+def get_company_stats(company_key):
+    return get_company_stats_many([company_key])[company_key]
+
+def get_customer_counts(company_keys):
+    """{company_key: active customer count or None} for the home launch pad."""
+    return {key: s['active_customers'] if s else None
+            for key, s in get_company_stats_many(company_keys).items()}
+
+def invalidate_company_stats(company_key):
+    """Call after committing a write that changes a dashboard figure. Always
+    a fresh read: a refresh already in flight may predate the commit."""
+    _stats_executor.submit(_fetch_company_stats, company_key)
+
+# Named version counters (cache_versions, migration 012). A write that changes
+# cached data bumps its counter inside its own transaction; readers compare
+# the stored version against the one their cached copy was built at.
+def bump_cache_version(cur, name):
+    cur.execute("UPDATE cache_versions SET version = version + 1 WHERE name = %s", (name,))
+
+def get_cache_version(cur, name):
+    cur.execute("SELECT version FROM cache_versions WHERE name = %s", (name,))
+    row = cur.fetchone()
+    return row['version'] if row else 0
 
 def get_management_companies(conn):
     """Get all management companies for a company database."""
@@ -124,21 +823,40 @@ def get_management_companies(conn):
 # Custom field helpers
 # ============================================================================
 
+# Custom field values are stored EAV-style in customer_field_values, or -- with
+# CUSTOM_FIELD_STORAGE=jsonb -- in a custom_fields JSONB column on customers
+# and service_locations, keyed by definition id, behind a GIN index so lists
+# can filter on them (migration 016 adds the columns and converts existing
+# values; run it right before switching).
+CUSTOM_FIELD_STORAGE = os.environ.get('CUSTOM_FIELD_STORAGE', 'eav')
+CUSTOM_FIELDS_JSONB  = CUSTOM_FIELD_STORAGE == 'jsonb'
+
 def get_custom_fields(conn, customer_id):
     """Customer-level custom fields (not location-scoped)."""
     cur = conn.cursor()
-    cur.execute("""
-        SELECT fd.id as definition_id, fd.field_name, fd.field_type,
-               fd.display_order, fd.is_active,
-               COALESCE(fv.value, '') as value
-        FROM customer_field_definitions fd
-        LEFT JOIN customer_field_values fv
-            ON fv.field_definition_id = fd.id
-            AND fv.customer_id = %s
-            AND fv.location_id IS NULL
-        WHERE fd.is_active = TRUE
-        ORDER BY fd.display_order ASC
-    """, (customer_id,))
+    if CUSTOM_FIELDS_JSONB:
+        cur.execute("""
+            SELECT fd.id as definition_id, fd.field_name, fd.field_type,
+                   fd.display_order, fd.is_active,
+                   COALESCE(c.custom_fields ->> fd.id::text, '') as value
+            FROM customer_field_definitions fd
+            LEFT JOIN customers c ON c.id = %s
+            WHERE fd.is_active = TRUE
+            ORDER BY fd.display_order ASC
+        """, (customer_id,))
+    else:
+        cur.execute("""
+            SELECT fd.id as definition_id, fd.field_name, fd.field_type,
+                   fd.display_order, fd.is_active,
+                   COALESCE(fv.value, '') as value
+            FROM customer_field_definitions fd
+            LEFT JOIN customer_field_values fv
+                ON fv.field_definition_id = fd.id
+                AND fv.customer_id = %s
+                AND fv.location_id IS NULL
+            WHERE fd.is_active = TRUE
+            ORDER BY fd.display_order ASC
+        """, (customer_id,))
     fields = cur.fetchall()
     cur.close()
     return fields
@@ -146,17 +864,28 @@ def get_custom_fields(conn, customer_id):
 def get_location_custom_fields(conn, location_id):
     """Location-scoped custom field values."""
     cur = conn.cursor()
-    cur.execute("""
-        SELECT fd.id as definition_id, fd.field_name, fd.field_type,
-               fd.display_order,
-               COALESCE(fv.value, '') as value
-        FROM customer_field_definitions fd
-        LEFT JOIN customer_field_values fv
-            ON fv.field_definition_id = fd.id
-            AND fv.location_id = %s
-        WHERE fd.is_active = TRUE
-        ORDER BY fd.display_order ASC
-    """, (location_id,))
+    if CUSTOM_FIELDS_JSONB:
+        cur.execute("""
+            SELECT fd.id as definition_id, fd.field_name, fd.field_type,
+                   fd.display_order,
+                   COALESCE(sl.custom_fields ->> fd.id::text, '') as value
+            FROM customer_field_definitions fd
+            LEFT JOIN service_locations sl ON sl.id = %s
+            WHERE fd.is_active = TRUE
+            ORDER BY fd.display_order ASC
+        """, (location_id,))
+    else:
+        cur.execute("""
+            SELECT fd.id as definition_id, fd.field_name, fd.field_type,
+                   fd.display_order,
+                   COALESCE(fv.value, '') as value
+            FROM customer_field_definitions fd
+            LEFT JOIN customer_field_values fv
+                ON fv.field_definition_id = fd.id
+                AND fv.location_id = %s
+            WHERE fd.is_active = TRUE
+            ORDER BY fd.display_order ASC
+        """, (location_id,))
     fields = cur.fetchall()
     cur.close()
     return fields
@@ -174,6 +903,9 @@ def get_field_definitions(conn):
 
 def save_custom_fields(conn, customer_id, form_data, username, location_id=None):
     """Upsert custom field values. If location_id provided, scopes to location."""
+    if CUSTOM_FIELDS_JSONB:
+        _save_custom_fields_jsonb(conn, customer_id, form_data, location_id)
+        return
     cur = conn.cursor()
     for key, value in form_data.items():
         if key.startswith('field_'):
@@ -204,6 +936,282 @@ def save_custom_fields(conn, customer_id, form_data, username, location_id=None)
                 continue
     cur.close()
 
+def _save_custom_fields_jsonb(conn, customer_id, form_data, location_id):
+    """JSONB form of save_custom_fields: one UPDATE merging the submitted
+    values into custom_fields. Blank values drop the key, so "has a value"
+    is simply key presence."""
+    values = {}
+    for key, value in form_data.items():
+        if key.startswith('field_'):
+            try:
+                values[str(int(key.replace('field_', '')))] = value.strip()
+            except ValueError:
+                continue
+    if not values:
+        return
+    table, row_id = ('service_locations', location_id) if location_id else ('customers', customer_id)
+    cur = conn.cursor()
+    cur.execute(f"""
+        UPDATE {table}
+        SET custom_fields = (custom_fields - %s::text[]) || %s
+        WHERE id = %s
+    """, ([k for k, v in values.items() if not v],
+          Json({k: v for k, v in values.items() if v}), row_id))
+    cur.close()
+
+def custom_field_filter(definition_id, value=''):
+    """WHERE fragment (on customers) + params keeping customers whose own or
+    any location's custom field has `value`, or any value when it's blank.
+    In JSONB mode both halves are GIN index lookups."""
+    if CUSTOM_FIELDS_JSONB:
+        if value:
+            match, match_params = "custom_fields @> %s", [Json({str(definition_id): value})]
+        else:
+            match, match_params = "custom_fields ? %s", [str(definition_id)]
+        return (f"""id IN (SELECT id FROM customers
+                          WHERE deleted_at IS NULL AND {match}
+                          UNION
+                          SELECT customer_id FROM service_locations
+                          WHERE deleted_at IS NULL AND {match})""",
+                match_params * 2)
+    if value:
+        return ("""id IN (SELECT customer_id FROM customer_field_values
+                          WHERE field_definition_id = %s AND value = %s)""",
+                [definition_id, value])
+    return ("""id IN (SELECT customer_id FROM customer_field_values
+                      WHERE field_definition_id = %s AND value <> '')""",
+            [definition_id])
+
+# ============================================================================
+# Customer view loaders
+# ============================================================================
+# The customer detail page and the work order form's customer context each
+# load in ONE statement (json_agg subselects), and are cached per customer per
+# worker. customers.view_version (migration 015) is bumped in the same
+# transaction as every customer, location, contact, note or custom field
+# write, so a cached view is only reused while it still matches. Custom field
+# definitions and management company names are shared across customers, so
+# they bump the company-wide 'customer_views' cache version (migration 019)
+# instead, and a view is keyed on both. Checking that is a primary-key
+# lookup, and a miss is the one aggregate statement.
+CUSTOMER_VIEW_CACHE_SIZE = int(os.environ.get('CUSTOMER_VIEW_CACHE_SIZE', '500'))
+
+_customer_views      = OrderedDict()   # (company_key, kind, customer_id) -> (versions, view)
+_customer_views_lock = threading.Lock()
+
+# Both version stamps; the check and every loader statement select them.
+_CUSTOMER_VIEW_VERSIONS = """c.view_version,
+           (SELECT version FROM cache_versions WHERE name = 'customer_views') AS views_version"""
+
+def touch_customer_view(cur, customer_id):
+    cur.execute("UPDATE customers SET view_version = view_version + 1 WHERE id = %s",
+                (customer_id,))
+
+def _load_customer_view(cur, company_key, kind, customer_id, sql, build):
+    """Cached build(row) for sql's single row (which must select
+    _CUSTOMER_VIEW_VERSIONS), or None if the customer doesn't exist. Callers must
+    treat the view as read-only -- it is shared."""
+    key = (company_key, kind, customer_id)
+    with _customer_views_lock:
+        cached = _customer_views.get(key)
+    if cached:
+        cur.execute(f"SELECT {_CUSTOMER_VIEW_VERSIONS} FROM customers c "
+                    "WHERE c.id = %s AND c.deleted_at IS NULL", (customer_id,))
+        row = cur.fetchone()
+        if row and (row['view_version'], row['views_version']) == cached[0]:
+            with _customer_views_lock:
+                if key in _customer_views:
+                    _customer_views.move_to_end(key)
+            return cached[1]
+    cur.execute(sql, (customer_id,))
+    row = cur.fetchone()
+    if not row:
+        with _customer_views_lock:
+            _customer_views.pop(key, None)
+        return None
+    view = build(row)
+    with _customer_views_lock:
+        _customer_views[key] = ((row['view_version'], row['views_version']), view)
+        _customer_views.move_to_end(key)
+        while len(_customer_views) > CUSTOMER_VIEW_CACHE_SIZE:
+            _customer_views.popitem(last=False)
+    return view
+
+def _custom_fields_agg(scope):
+    """json_agg of the active custom fields of customer c (scope 'customer')
+    or location sl (scope 'location'), for the loader SQL. Same columns and
+    ordering as get_custom_fields / get_location_custom_fields."""
+    if CUSTOM_FIELDS_JSONB:
+        owner = 'c' if scope == 'customer' else 'sl'
+        value, join = f"{owner}.custom_fields ->> fd.id::text", ""
+    elif scope == 'customer':
+        value, join = "fv.value", """
+            LEFT JOIN customer_field_values fv
+                   ON fv.field_definition_id = fd.id
+                  AND fv.customer_id = c.id
+                  AND fv.location_id IS NULL"""
+    else:
+        value, join = "fv.value", """
+            LEFT JOIN customer_field_values fv
+                   ON fv.field_definition_id = fd.id
+                  AND fv.location_id = sl.id"""
+    return f"""COALESCE((
+            SELECT json_agg(json_build_object(
+                       'definition_id', fd.id, 'field_name', fd.field_name,
+                       'field_type', fd.field_type, 'display_order', fd.display_order,
+                       'is_active', fd.is_active, 'value', COALESCE({value}, ''))
+                   ORDER BY fd.display_order)
+            FROM customer_field_definitions fd{join}
+            WHERE fd.is_active = TRUE), '[]')"""
+
+_CUSTOMER_DETAIL_SQL = f"""
+    SELECT c.*, {_CUSTOMER_VIEW_VERSIONS}, mc.name AS management_company_name,
+           COALESCE((SELECT json_agg(ct ORDER BY ct.is_primary DESC, ct.last_name ASC)
+                     FROM customer_contacts ct
+                     WHERE ct.customer_id = c.id AND ct.deleted_at IS NULL), '[]') AS _contacts,
+           COALESCE((SELECT json_agg(n ORDER BY n.created_at DESC)
+                     FROM (SELECT id, note_text, note_type, created_by,
+                                  date_trunc('second', created_at) AS created_at
+                           FROM customer_notes
+                           WHERE customer_id = c.id
+                           ORDER BY created_at DESC LIMIT 50) n), '[]') AS _notes,
+           COALESCE((SELECT json_agg(l ORDER BY l.is_primary DESC, l.location_name ASC)
+                     FROM (SELECT sl.*, {_custom_fields_agg('location')} AS _custom_fields
+                           FROM service_locations sl
+                           WHERE sl.customer_id = c.id AND sl.deleted_at IS NULL) l), '[]') AS _locations,
+           {_custom_fields_agg('customer')} AS _custom_fields
+    FROM customers c
+    LEFT JOIN management_companies mc ON c.management_company_id = mc.id
+    WHERE c.id = %s AND c.deleted_at IS NULL
+"""
+
+def _build_customer_detail(row):
+    customer = dict(row)
+    notes = customer.pop('_notes')
+    for note in notes:
+        if note['created_at']:
+            note['created_at'] = datetime.fromisoformat(note['created_at'])
+    locations = customer.pop('_locations')
+    for loc in locations:
+        loc['custom_fields'] = loc.pop('_custom_fields')
+    return {
+        'customer':      customer,
+        'contacts':      customer.pop('_contacts'),
+        'notes':         notes,
+        'locations':     locations,
+        'custom_fields': customer.pop('_custom_fields'),
+    }
+
+def load_customer_detail(cur, company_key, customer_id):
+    """Everything customer_detail renders: {customer, contacts, notes,
+    locations (each with custom_fields), custom_fields}, or None."""
+    return _load_customer_view(cur, company_key, 'detail', customer_id,
+                               _CUSTOMER_DETAIL_SQL, _build_customer_detail)
+
+_CUSTOMER_CONTEXT_SQL = f"""
+    SELECT {_CUSTOMER_VIEW_VERSIONS}, c.customer_type,
+           COALESCE((SELECT json_agg(l ORDER BY l.is_primary DESC,
+                                                l.location_name NULLS LAST, l.address)
+                     FROM (SELECT id, location_name, address, city, state, is_primary
+                           FROM service_locations
+                           WHERE customer_id = c.id AND deleted_at IS NULL) l), '[]') AS locations,
+           COALESCE((SELECT json_agg(ct ORDER BY ct.last_name, ct.first_name)
+                     FROM (SELECT id, first_name, last_name, title
+                           FROM customer_contacts
+                           WHERE customer_id = c.id AND deleted_at IS NULL) ct), '[]') AS contacts
+    FROM customers c
+    WHERE c.id = %s AND c.deleted_at IS NULL
+"""
+
+def load_customer_context(cur, company_key, customer_id):
+    """customer_type, locations and contacts for the work order form, or None."""
+    return _load_customer_view(cur, company_key, 'context', customer_id,
+                               _CUSTOMER_CONTEXT_SQL,
+                               lambda row: {k: row[k] for k in ('customer_type', 'locations', 'contacts')})
+
+# ============================================================================
+# List pagination (keyset)
+# ============================================================================
+
+# Lists page by cursor, not OFFSET: each page is an index range scan starting
+# at the last row shown, so deep pages cost the same as the first. The header
+# count stops at LIST_COUNT_CAP (shown as "1000+") instead of counting the
+# whole table on every page.
+LIST_COUNT_CAP = int(os.environ.get('LIST_COUNT_CAP', '1000'))
+
+def encode_cursor(direction, key):
+    """Opaque page cursor: page 'next' or 'prev' from the row with sort key."""
+    raw = json.dumps([direction, list(key)], default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def cursor_text(value):
+    if not isinstance(value, str) or '\x00' in value:
+        raise ValueError(value)
+    return value
+
+def cursor_int(value):
+    """An int id column value (the cursor is user input: no bools, floats or
+    anything past int4)."""
+    if type(value) is not int or not -2**31 <= value < 2**31:
+        raise ValueError(value)
+    return value
+
+def cursor_date(value):
+    """An ISO date or None (undated rows)."""
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise ValueError(value)
+    return datetime.strptime(value, '%Y-%m-%d').date().isoformat()
+
+def decode_cursor(token, key_types):
+    """(direction, key) from encode_cursor. key_types checks each key value
+    (cursor_text, cursor_int, cursor_date). A missing or mangled cursor --
+    including a well-formed one whose values don't fit the sort columns --
+    gives (None, None), i.e. the first page, rather than an error."""
+    if not token:
+        return None, None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, key = json.loads(raw)
+    except (ValueError, TypeError):
+        return None, None
+    if direction not in ('next', 'prev') or not isinstance(key, list) or len(key) != len(key_types):
+        return None, None
+    try:
+        key = [check(value) for check, value in zip(key_types, key)]
+    except ValueError:
+        return None, None
+    return direction, key
+
+def keyset_page(rows, per_page, direction, sort_key):
+    """Trim a LIMIT per_page + 1 fetch to one page and build its cursors.
+
+    A 'prev' fetch runs the ORDER BY backwards, so it is flipped back into
+    display order here. sort_key(row) gives the values the cursor resumes
+    from. Returns (rows, next_cursor, prev_cursor); None means no such page."""
+    more = len(rows) > per_page
+    rows = list(rows[:per_page])
+    if direction == 'prev':
+        rows.reverse()
+        has_prev, has_next = more, True
+    else:
+        has_prev, has_next = direction == 'next', more
+    if not rows:
+        return rows, None, None
+    next_cursor = encode_cursor('next', sort_key(rows[-1])) if has_next else None
+    prev_cursor = encode_cursor('prev', sort_key(rows[0]))  if has_prev else None
+    return rows, next_cursor, prev_cursor
+
+def capped_count(cur, from_where, params, cap=None):
+    """COUNT(*) that stops reading after cap rows. from_where is the
+    'FROM ... WHERE ...' of the list query. Returns (count, is_capped)."""
+    cap = LIST_COUNT_CAP if cap is None else cap
+    cur.execute(f"SELECT COUNT(*) AS count FROM (SELECT 1 {from_where} LIMIT %s) AS capped",
+                list(params) + [cap + 1])
+    count = cur.fetchone()['count']
+    return min(count, cap), count > cap
+
 # ============================================================================
 # Decorators
 # ============================================================================
@@ -296,14 +1304,13 @@ def home():
     if len(company_access) == 1:
         return redirect(url_for('dashboard', company_key=company_access[0]))
 
-    companies = []
-    for key in company_access:
-        if key in COMPANY_BRANDING:
-            companies.append({
-                'key':   key,
-                'count': get_customer_count(key),
-                **COMPANY_BRANDING[key],
-            })
+    keys   = [key for key in company_access if key in COMPANY_BRANDING]
+    counts = get_customer_counts(keys)
+    companies = [{
+        'key':   key,
+        'count': counts[key],
+        **COMPANY_BRANDING[key],
+    } for key in keys]
 
     import datetime as _dt
     return render_template('home.html',
@@ -322,24 +1329,12 @@ def home():
 @company_access_required
 @with_branding
 def dashboard(company_key, branding, all_companies, company_access):
-    conn = get_db_connection(company_key)
-    cur  = conn.cursor()
-
-    cur.execute("SELECT COUNT(*) as count FROM customers WHERE deleted_at IS NULL AND status = 'Active'")
-    active_customers = cur.fetchone()['count']
-
-    cur.execute("""
-        SELECT id, property_name, customer_type, city, status
-        FROM customers WHERE deleted_at IS NULL
-        ORDER BY created_at DESC LIMIT 10
-    """)
-    recent_customers = cur.fetchall()
-    cur.close(); conn.close()
+    stats = get_company_stats(company_key) or {}
 
     return render_template('dashboard.html',
         branding=branding, company_key=company_key,
         company_access=company_access, all_companies=all_companies,
-        active_customers=active_customers, recent_customers=recent_customers,
+        stats=stats, recent_customers=stats.get('recent_customers', []),
     )
 
 # ============================================================================
@@ -354,8 +1349,10 @@ def customers(company_key, branding, all_companies, company_access):
     search        = request.args.get('search', '').strip()
     status_filter = request.args.get('status', 'Active')
     type_filter   = request.args.get('type', '')
-    page          = max(1, request.args.get('page', 1, type=int))
-    per_page      = 50
+    field_filter  = request.args.get('field', '')
+    field_value   = request.args.get('field_value', '').strip()
+    direction, key = decode_cursor(request.args.get('cursor'), (cursor_text, cursor_int))
+    per_page       = 50
 
     conditions = ["deleted_at IS NULL"]
     params     = []
@@ -369,25 +1366,36 @@ def customers(company_key, branding, all_companies, company_access):
     if type_filter:
         conditions.append("customer_type = %s")
         params.append(type_filter)
+    if field_filter.isdigit():
+        field_sql, field_params = custom_field_filter(int(field_filter), field_value)
+        conditions.append(field_sql)
+        params.extend(field_params)
 
-    where  = " AND ".join(conditions)
-    offset = (page - 1) * per_page
+    where = " AND ".join(conditions)
 
     conn = get_db_connection(company_key)
     cur  = conn.cursor()
-
-    cur.execute(f"SELECT COUNT(*) as count FROM customers WHERE {where}", params)
-    total       = cur.fetchone()['count']
-    total_pages = max(1, (total + per_page - 1) // per_page)
-
+    field_defs = [d for d in get_field_definitions(conn) if d['is_active']]
+
+    total, total_capped = capped_count(cur, f"FROM customers WHERE {where}", params)
+
+    page_where, page_params, order = where, list(params), "property_name ASC, id ASC"
+    if direction == 'next':
+        page_where += " AND (property_name, id) > (%s, %s)"
+        page_params.extend(key)
+    elif direction == 'prev':
+        page_where += " AND (property_name, id) < (%s, %s)"
+        page_params.extend(key)
+        order = "property_name DESC, id DESC"
     cur.execute(f"""
         SELECT id, property_name, customer_type, city, state, status,
                billing_email, created_at
-        FROM customers WHERE {where}
-        ORDER BY property_name ASC
-        LIMIT %s OFFSET %s
-    """, params + [per_page, offset])
-    customer_list = cur.fetchall()
+        FROM customers WHERE {page_where}
+        ORDER BY {order}
+        LIMIT %s
+    """, page_params + [per_page + 1])
+    customer_list, next_cursor, prev_cursor = keyset_page(
+        cur.fetchall(), per_page, direction, lambda r: (r['property_name'], r['id']))
     cur.close(); conn.close()
 
     return render_template('customers.html',
@@ -395,52 +1403,80 @@ def customers(company_key, branding, all_companies, company_access):
         company_access=company_access, all_companies=all_companies,
         customers=customer_list,
         search=search, status_filter=status_filter, type_filter=type_filter,
-        page=page, total_pages=total_pages, total=total,
+        field_defs=field_defs, field_filter=field_filter, field_value=field_value,
+        next_cursor=next_cursor, prev_cursor=prev_cursor,
+        total=total, total_capped=total_capped,
     )
 
 
+CUSTOMER_SEARCH_LIMIT   = 100
+CUSTOMER_SEARCH_MAX_AGE = int(os.environ.get('CUSTOMER_SEARCH_MAX_AGE', '10'))
+
+def _like_escape(term):
+    """Make user input literal inside a LIKE/ILIKE pattern."""
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
 @app.route('/<company_key>/customers/search')
 @login_required
 @company_access_required
 def customers_search(company_key):
-    """JSON endpoint for live customer search — returns matching rows."""
+    """JSON endpoint for live customer search — returns matching rows.
+
+    Substring matches are served by the trigram index (migration 010) and
+    ranked names-starting-with-the-term first, then by similarity. Rows and
+    total come back from one query; the response carries an ETag and a short
+    private max-age so repeated keystrokes can be answered by the browser."""
     search        = request.args.get('search', '').strip()
     status_filter = request.args.get('status', 'Active')
     type_filter   = request.args.get('type', '')
+    field_filter  = request.args.get('field', '')
+    field_value   = request.args.get('field_value', '').strip()
 
     conditions = ["deleted_at IS NULL"]
     params     = []
 
     if search:
         conditions.append("property_name ILIKE %s")
-        params.append(f'%{search}%')
+        params.append(f'%{_like_escape(search)}%')
     if status_filter:
         conditions.append("status = %s")
         params.append(status_filter)
     if type_filter:
         conditions.append("customer_type = %s")
         params.append(type_filter)
+    if field_filter.isdigit():
+        field_sql, field_params = custom_field_filter(int(field_filter), field_value)
+        conditions.append(field_sql)
+        params.extend(field_params)
 
     where = " AND ".join(conditions)
+    if search:
+        order        = "property_name ILIKE %s DESC, similarity(property_name, %s) DESC, property_name ASC, id ASC"
+        order_params = [f'{_like_escape(search)}%', search]
+    else:
+        order, order_params = "property_name ASC, id ASC", []
 
     conn = get_db_connection(company_key)
     cur  = conn.cursor()
     cur.execute(f"""
-        SELECT id, property_name, customer_type, city, state, status
+        SELECT id, property_name, customer_type, city, state, status,
+               COUNT(*) OVER () AS total
         FROM customers WHERE {where}
-        ORDER BY property_name ASC
-        LIMIT 100
-    """, params)
+        ORDER BY {order}
+        LIMIT %s
+    """, params + order_params + [CUSTOMER_SEARCH_LIMIT])
     rows = cur.fetchall()
-
-    cur.execute(f"SELECT COUNT(*) as count FROM customers WHERE {where}", params)
-    total = cur.fetchone()['count']
     cur.close(); conn.close()
 
-    return jsonify({
+    total = rows[0]['total'] if rows else 0
+    response = jsonify({
         'total': total,
-        'customers': [dict(r) for r in rows],
+        'customers': [{k: v for k, v in r.items() if k != 'total'} for r in rows],
     })
+    response.cache_control.private = True
+    response.cache_control.max_age = CUSTOMER_SEARCH_MAX_AGE
+    response.add_etag()
+    return response.make_conditional(request)
 
 
 # ============================================================================
@@ -454,52 +1490,16 @@ def customers_search(company_key):
 def customer_detail(company_key, customer_id, branding, all_companies, company_access):
     conn = get_db_connection(company_key)
     cur  = conn.cursor()
-
-    cur.execute("""
-        SELECT c.*, mc.name as management_company_name
-        FROM customers c
-        LEFT JOIN management_companies mc ON c.management_company_id = mc.id
-        WHERE c.id = %s AND c.deleted_at IS NULL
-    """, (customer_id,))
-    customer = cur.fetchone()
-    if not customer:
-        cur.close(); conn.close(); abort(404)
-
-    cur.execute("""
-        SELECT * FROM customer_contacts
-        WHERE customer_id = %s AND deleted_at IS NULL
-        ORDER BY is_primary DESC, last_name ASC
-    """, (customer_id,))
-    contacts = cur.fetchall()
-
-    cur.execute("""
-        SELECT * FROM customer_notes
-        WHERE customer_id = %s
-        ORDER BY created_at DESC LIMIT 50
-    """, (customer_id,))
-    notes = cur.fetchall()
-
-    cur.execute("""
-        SELECT * FROM service_locations
-        WHERE customer_id = %s AND deleted_at IS NULL
-        ORDER BY is_primary DESC, location_name ASC
-    """, (customer_id,))
-    locations_raw = cur.fetchall()
-
-    locations = []
-    for loc in locations_raw:
-        loc_dict = dict(loc)
-        loc_dict['custom_fields'] = get_location_custom_fields(conn, loc['id'])
-        locations.append(loc_dict)
-
-    custom_fields = get_custom_fields(conn, customer_id)
+    view = load_customer_detail(cur, company_key, customer_id)
     cur.close(); conn.close()
+    if not view:
+        abort(404)
 
     return render_template('customer_detail.html',
         branding=branding, company_key=company_key,
         company_access=company_access, all_companies=all_companies,
-        customer=customer, contacts=contacts, notes=notes,
-        locations=locations, custom_fields=custom_fields,
+        customer=view['customer'], contacts=view['contacts'], notes=view['notes'],
+        locations=view['locations'], custom_fields=view['custom_fields'],
         nc_counties=NC_COUNTIES,
     )
 
@@ -521,6 +1521,7 @@ def add_note(company_key, customer_id):
         INSERT INTO customer_notes (customer_id, note_text, note_type, created_by)
         VALUES (%s, %s, %s, %s)
     """, (customer_id, note_text, note_type, session.get('username')))
+    touch_customer_view(cur, customer_id)
     conn.commit()
     cur.close(); conn.close()
     return redirect(f'/{company_key}/customers/{customer_id}')
@@ -574,7 +1575,9 @@ def customer_new(company_key, branding, all_companies, company_access):
             ))
             customer_id = cur.fetchone()['id']
             save_custom_fields(conn, customer_id, request.form, session.get('username'))
+            bump_cache_version(cur, 'wo_form')
             conn.commit()
+            invalidate_company_stats(company_key)
             cur.close(); conn.close()
             return redirect(f'/{company_key}/customers/{customer_id}')
         except Exception as e:
@@ -652,7 +1655,10 @@ def customer_edit(company_key, customer_id, branding, all_companies, company_acc
                 customer_id,
             ))
             save_custom_fields(conn, customer_id, request.form, session.get('username'))
+            bump_cache_version(cur, 'wo_form')
+            touch_customer_view(cur, customer_id)
             conn.commit()
+            invalidate_company_stats(company_key)
             cur.close(); conn.close()
             return redirect(f'/{company_key}/customers/{customer_id}')
         except Exception as e:
@@ -723,6 +1729,7 @@ def location_new(company_key, customer_id, branding, all_companies, company_acce
             ))
             location_id = cur.fetchone()['id']
             save_custom_fields(conn, customer_id, request.form, session.get('username'), location_id=location_id)
+            touch_customer_view(cur, customer_id)
             conn.commit()
             cur.close(); conn.close()
             return redirect(f'/{company_key}/customers/{customer_id}')
@@ -793,6 +1800,7 @@ def location_edit(company_key, customer_id, location_id, branding, all_companies
                 location_id,
             ))
             save_custom_fields(conn, customer_id, request.form, session.get('username'), location_id=location_id)
+            touch_customer_view(cur, customer_id)
             conn.commit()
             cur.close(); conn.close()
             return redirect(f'/{company_key}/customers/{customer_id}')
@@ -852,6 +1860,7 @@ def field_add(company_key):
             (SELECT COALESCE(MAX(display_order),0)+1 FROM customer_field_definitions),
             %s)
     """, (field_name, field_type, session.get('username')))
+    bump_cache_version(cur, 'customer_views')
     conn.commit(); cur.close(); conn.close()
     return redirect(f'/{company_key}/settings/fields')
 
@@ -867,6 +1876,7 @@ def field_toggle(company_key, field_id):
         UPDATE customer_field_definitions
         SET is_active = NOT is_active WHERE id = %s
     """, (field_id,))
+    bump_cache_version(cur, 'customer_views')
     conn.commit(); cur.close(); conn.close()
     return redirect(f'/{company_key}/settings/fields')
 
@@ -940,6 +1950,7 @@ def _save_catalog_item(company_key, item_id):
               unit_price, unit_of_measure, estimated_minutes,
               minimum_quantity, billing_increment, is_taxable, cost,
               is_catch_all, is_active, username, item_id))
+    bump_cache_version(cur, 'wo_form')
     conn.commit(); cur.close(); conn.close()
     return None
 
@@ -1041,6 +2052,7 @@ def catalog_delete(company_key, item_id):
         SET deleted_at = CURRENT_TIMESTAMP, deleted_by = %s
         WHERE id = %s AND deleted_at IS NULL
     """, (session.get('username'), item_id))
+    bump_cache_version(cur, 'wo_form')
     conn.commit(); cur.close(); conn.close()
     return redirect(f'/{company_key}/settings/catalog')
 
@@ -1103,6 +2115,7 @@ def _save_equipment_unit(company_key, unit_id):
                 updated_at=CURRENT_TIMESTAMP, updated_by=%s
             WHERE id=%s AND deleted_at IS NULL
         """, (name, catalog_item_id, notes, is_active, username, unit_id))
+    bump_cache_version(cur, 'wo_form')
     conn.commit(); cur.close(); conn.close()
     return None
 
@@ -1195,6 +2208,7 @@ def equipment_delete(company_key, unit_id):
         SET deleted_at = CURRENT_TIMESTAMP, deleted_by = %s
         WHERE id = %s AND deleted_at IS NULL
     """, (session.get('username'), unit_id))
+    bump_cache_version(cur, 'wo_form')
     conn.commit(); cur.close(); conn.close()
     return redirect(f'/{company_key}/settings/equipment')
 
@@ -1271,143 +2285,172 @@ INVOICE_TRANSITIONS_IMPLEMENTED = {
 }
 
 
+def _allocate_number(cur, kind, prefix):
+    """Next number in the (kind, prefix, current year) sequence, e.g.
+    GAG-2026-0007. One upsert on number_sequences (migration 013): a new year
+    starts its own row at 1, and concurrent callers queue on the row lock
+    until the holder's transaction ends rather than reading the same value.
+    The lock is held until commit, so keep the rest of that transaction short."""
+    year = datetime.now().year
+    cur.execute("""
+        INSERT INTO number_sequences (kind, prefix, year, last_value)
+        VALUES (%s, %s, %s, 1)
+        ON CONFLICT (kind, prefix, year)
+            DO UPDATE SET last_value = number_sequences.last_value + 1
+        RETURNING last_value
+    """, (kind, prefix, year))
+    seq = cur.fetchone()['last_value']
+    return f'{prefix}-{year}-{seq:04d}'
+
 def _next_wo_number(cur, company_key):
     """Next per-company work order number, e.g. GAG-2026-0007.
-    Sequence resets each year; the UNIQUE constraint is the real guarantee."""
+    Sequence resets each year; the UNIQUE constraint is the backstop."""
     prefix = WO_NUMBER_PREFIXES.get(company_key, company_key.upper()[:3])
-    year   = datetime.now().year
-    like   = f'{prefix}-{year}-%'
-    cur.execute("""
-        SELECT work_order_number FROM work_orders
-        WHERE work_order_number LIKE %s
-        ORDER BY id DESC LIMIT 1
-    """, (like,))
-    row = cur.fetchone()
-    seq = 1
-    if row:
-        try:
-            seq = int(row['work_order_number'].rsplit('-', 1)[1]) + 1
-        except (ValueError, IndexError):
-            seq = 1
-    return f'{prefix}-{year}-{seq:04d}'
+    return _allocate_number(cur, 'work_order', prefix)
 
 def _next_invoice_number(cur, company_key):
     """Next per-company invoice number, e.g. GAG-2026-0007.
     Sequence resets each year; the UNIQUE(invoice_number, revision_number)
-    constraint is the real guarantee. Only original rows (revision_number = 1)
-    advance the sequence — revisions reuse their parent's number."""
+    constraint is the backstop. Only original rows (revision_number = 1)
+    take a number — revisions reuse their parent's number."""
     prefix = INVOICE_NUMBER_PREFIXES.get(company_key, company_key.upper()[:3])
-    year   = datetime.now().year
-    like   = f'{prefix}-{year}-%'
+    return _allocate_number(cur, 'invoice', prefix)
+
+
+# County tax rates, cached per company per worker. tax_rates is tiny and
+# almost never changes; a statement trigger on it bumps the 'tax_rates' cache
+# version (migration 014), so an edit made anywhere -- even by hand in psql --
+# is seen on the next read.
+_tax_rate_cache      = {}   # company_key -> (version, {county: total_pct})
+_tax_rate_cache_lock = threading.Lock()
+
+def get_tax_rates(cur, company_key, version=None):
+    """{county: total_pct} for the company's active rates at `version`. Pass
+    the version when it already came back with another query; otherwise it
+    is looked up. Costs no query at all beyond that while cached."""
+    if version is None:
+        version = get_cache_version(cur, 'tax_rates')
+    with _tax_rate_cache_lock:
+        cached = _tax_rate_cache.get(company_key)
+    if cached and cached[0] == version:
+        return cached[1]
     cur.execute("""
-        SELECT invoice_number FROM invoices
-        WHERE invoice_number LIKE %s AND revision_number = 1
-        ORDER BY id DESC LIMIT 1
-    """, (like,))
-    row = cur.fetchone()
-    seq = 1
-    if row:
-        try:
-            seq = int(row['invoice_number'].rsplit('-', 1)[1]) + 1
-        except (ValueError, IndexError):
-            seq = 1
-    return f'{prefix}-{year}-{seq:04d}'
-
-
-def _compute_invoice_tax(cur, invoice_id):
-    """Resolve and total the tax for an invoice from its CURRENT county rate.
-    Returns (tax_rate_pct, subtotal, tax_total, total).
-
-    Reads the live tax_rates table — this is the freeze-at-harden read. Once
-    the caller writes these onto the invoice, later edits to tax_rates never
-    change this invoice (Pattern 4: effective-time pinning). A county with no
-    row resolves to 0% (a valid un-taxed invoice, e.g. Florida) rather than
-    failing; the absence shows as tax_rate_pct = None for optional flagging."""
-    cur.execute("""
-        SELECT tax_county FROM invoices WHERE id = %s AND deleted_at IS NULL
-    """, (invoice_id,))
-    inv = cur.fetchone()
-    if not inv:
-        return None, None, None, None
-    county = inv['tax_county']
-
+        SELECT county, total_pct FROM tax_rates
+        WHERE is_active = TRUE AND deleted_at IS NULL
+    """)
+    rates = {r['county']: r['total_pct'] for r in cur.fetchall()}
+    with _tax_rate_cache_lock:
+        _tax_rate_cache[company_key] = (version, rates)
+    return rates
+
+def _compute_invoice_taxes(cur, company_key, invoice_ids):
+    """Resolve and total the tax for a set of invoices from their CURRENT
+    county rates. Returns {invoice_id: (tax_rate_pct, subtotal, tax_total,
+    total)}; ids not found (or deleted) are absent.
+
+    One statement returns each invoice's county and line sums together with
+    the tax_rates version; the rate itself comes from get_tax_rates, which
+    only goes back to the table when that version has moved. This is the
+    freeze-at-harden read: once the caller writes these onto the invoice,
+    later edits to tax_rates never change this invoice (Pattern 4:
+    effective-time pinning). A county with no row resolves to 0% (a valid
+    un-taxed invoice, e.g. Florida) rather than failing; the absence shows as
+    tax_rate_pct = None for optional flagging."""
     cur.execute("""
-        SELECT
-            COALESCE(SUM(total), 0)                            AS subtotal,
-            COALESCE(SUM(total) FILTER (WHERE is_taxable), 0)  AS taxable_base
-        FROM invoice_line_items
-        WHERE invoice_id = %s AND deleted_at IS NULL
-    """, (invoice_id,))
-    sums = cur.fetchone()
-    subtotal     = sums['subtotal']
-    taxable_base = sums['taxable_base']
-
-    rate_pct = None
-    if county:
-        cur.execute("""
-            SELECT total_pct FROM tax_rates
-            WHERE county = %s AND is_active = TRUE AND deleted_at IS NULL
-        """, (county,))
-        r = cur.fetchone()
-        if r:
-            rate_pct = r['total_pct']
-
-    effective_rate = rate_pct if rate_pct is not None else 0
-    tax_total = (taxable_base * effective_rate) / 100
-    total     = subtotal + tax_total
-    return rate_pct, subtotal, tax_total, total
-
+        SELECT i.id, i.tax_county,
+               COALESCE(SUM(li.total), 0)                             AS subtotal,
+               COALESCE(SUM(li.total) FILTER (WHERE li.is_taxable), 0) AS taxable_base,
+               (SELECT version FROM cache_versions WHERE name = 'tax_rates') AS rates_version
+        FROM invoices i
+        LEFT JOIN invoice_line_items li
+               ON li.invoice_id = i.id AND li.deleted_at IS NULL
+        WHERE i.id = ANY(%s) AND i.deleted_at IS NULL
+        GROUP BY i.id
+    """, (list(invoice_ids),))
+    rows = cur.fetchall()
+    if not rows:
+        return {}
+    rates = get_tax_rates(cur, company_key, rows[0]['rates_version'] or 0)
+    taxes = {}
+    for r in rows:
+        rate_pct = rates.get(r['tax_county']) if r['tax_county'] else None
+        effective_rate = rate_pct if rate_pct is not None else 0
+        tax_total = (r['taxable_base'] * effective_rate) / 100
+        taxes[r['id']] = (rate_pct, r['subtotal'], tax_total, r['subtotal'] + tax_total)
+    return taxes
+
+
+def _compute_invoice_tax(cur, company_key, invoice_id):
+    """Single-invoice form of _compute_invoice_taxes -- also what a live
+    invoice preview calls, since it touches nothing but the line sums.
+    Returns (tax_rate_pct, subtotal, tax_total, total), all None if not found."""
+    return _compute_invoice_taxes(cur, company_key, [invoice_id]).get(
+        invoice_id, (None, None, None, None))
+
+
+# The ordinal rule as one window query over any set of invoices: each
+# per_day_equipment line is numbered within its (invoice, billing type) group
+# in (deployed_at, id) order, and a group of one keeps the bare label.
+_EQUIPMENT_LABELS_SQL = """
+    SELECT id,
+           CASE WHEN COUNT(*) OVER grp = 1 THEN base_label
+                ELSE base_label || ' ' || ROW_NUMBER() OVER (grp ORDER BY
+                         deployed_at ASC NULLS LAST, id ASC)
+           END AS resolved_label
+    FROM (
+        SELECT ili.id, ili.invoice_id, ili.catalog_item_id, ili.deployed_at,
+               COALESCE(ci.invoice_label, ci.name) AS base_label
+        FROM invoice_line_items ili
+        JOIN catalog_items ci ON ci.id = ili.catalog_item_id
+        WHERE ili.invoice_id = ANY(%s)
+          AND ili.deleted_at IS NULL
+          AND ci.billing_behavior = 'per_day_equipment'
+    ) eq
+    WINDOW grp AS (PARTITION BY invoice_id, catalog_item_id)
+"""
 
-def _resolve_equipment_labels(cur, invoice_id):
-    """Single source of truth for per_day_equipment line labels on an invoice.
+def _resolve_equipment_labels_many(cur, invoice_ids):
+    """Single source of truth for per_day_equipment line labels on invoices.
 
-    Groups the invoice's per_day_equipment lines by billing type
+    Per invoice, groups the per_day_equipment lines by billing type
     (catalog_item_id), orders each group by (deployed_at ASC, line id ASC),
     and applies the ordinal rule:
       * group of 1  -> bare customer label ("Set Dehu", no number)
       * group of N  -> "Set Dehu 1" .. "Set Dehu N"
-    The ordinal is the Nth machine of that TYPE on THIS invoice — never the
+    The ordinal is the Nth machine of that TYPE on THAT invoice — never the
     registry unit identity (equipment_unit.name stays internal and unshown).
 
     Customer-facing base text is catalog_items.invoice_label, falling back to
     catalog_items.name when invoice_label is unset.
 
-    Returns {line_item_id: resolved_label}. Used both for live rendering
-    (derive fresh every time, so edits renumber cleanly 1..N with no stale
-    gaps) and for baking the frozen snapshot at harden — same logic both ways,
-    so a live preview and the hardened print can never disagree.
+    Returns {line_item_id: resolved_label} across all the given invoices. Used
+    for live rendering (derive fresh every time, so edits renumber cleanly
+    1..N with no stale gaps); _bake_equipment_labels writes the frozen
+    snapshot at harden from the SAME query, so a live preview and the
+    hardened print can never disagree.
 
     Non-equipment lines are simply absent from the returned map; callers render
     those from their own description as usual.
     """
-    cur.execute("""
-        SELECT ili.id,
-               ili.catalog_item_id,
-               ili.deployed_at,
-               COALESCE(ci.invoice_label, ci.name) AS base_label
-        FROM invoice_line_items ili
-        JOIN catalog_items ci ON ci.id = ili.catalog_item_id
-        WHERE ili.invoice_id = %s
-          AND ili.deleted_at IS NULL
-          AND ci.billing_behavior = 'per_day_equipment'
-        ORDER BY ili.catalog_item_id,
-                 ili.deployed_at ASC NULLS LAST,
-                 ili.id ASC
-    """, (invoice_id,))
-    rows = cur.fetchall()
+    cur.execute(_EQUIPMENT_LABELS_SQL, (list(invoice_ids),))
+    return {r['id']: r['resolved_label'] for r in cur.fetchall()}
 
-    # Bucket by billing type, preserving the ORDER BY sequence within each type.
-    groups = {}
-    for r in rows:
-        groups.setdefault(r['catalog_item_id'], []).append(r)
 
-    labels = {}
-    for _cat_id, members in groups.items():
-        n = len(members)
-        for idx, m in enumerate(members, start=1):
-            base = m['base_label']
-            labels[m['id']] = base if n == 1 else f'{base} {idx}'
-    return labels
+def _bake_equipment_labels(cur, invoice_ids, username):
+    """Write resolved_label onto every per_day_equipment line of the given
+    invoices in one UPDATE ... FROM the label query."""
+    cur.execute(f"""
+        UPDATE invoice_line_items li
+        SET resolved_label = lbl.resolved_label,
+            updated_at = CURRENT_TIMESTAMP, updated_by = %s
+        FROM ({_EQUIPMENT_LABELS_SQL}) lbl
+        WHERE li.id = lbl.id
+    """, (username, list(invoice_ids)))
+
+
+def _resolve_equipment_labels(cur, invoice_id):
+    """Single-invoice form of _resolve_equipment_labels_many."""
+    return _resolve_equipment_labels_many(cur, [invoice_id])
 
 
 def _reissue_invoice(cur, company_key, old_invoice_id, username):
@@ -1502,84 +2545,134 @@ def transition_invoice(cur, company_key, invoice_id, to_state, username, notes=N
       * extra  — dict of side-effect outputs, or None. Reissue (Void->Live)
                  returns {'new_invoice_id': <id>} because it spawns a SECOND
                  invoice row the caller must redirect to; every other
-                 transition returns None here."""
-    if to_state not in INVOICE_STATES:
-        return False, f'Unknown target state "{to_state}".', None
+                 transition returns None here.
 
-    cur.execute("""
-        SELECT id, state, amount_paid, invoice_number, revision_number
-        FROM invoices
-        WHERE id = %s AND deleted_at IS NULL
-    """, (invoice_id,))
-    inv = cur.fetchone()
+    A batch of one through transition_invoices, so single and bulk moves can
+    never drift apart."""
+    return transition_invoices(cur, company_key, [invoice_id], to_state, username, notes)[invoice_id]
+
+
+def _invoice_transition_rejection(inv, to_state, notes):
+    """Why inv (a locked invoices row, or None) can't move to to_state, or
+    None if it can. The guard half of a transition; no writes."""
     if not inv:
-        return False, 'Invoice not found.', None
+        return 'Invoice not found.'
 
     from_state = inv['state']
     if from_state == to_state:
-        return False, f'Invoice is already {to_state}.', None
+        return f'Invoice is already {to_state}.'
 
     # (a) Legality: is this edge allowed at all?
     if to_state not in INVOICE_TRANSITIONS.get(from_state, set()):
-        return False, f'Cannot move an invoice from {from_state} to {to_state}.', None
+        return f'Cannot move an invoice from {from_state} to {to_state}.'
 
     # Implemented-in-this-step gate (honest partial build).
     if (from_state, to_state) not in INVOICE_TRANSITIONS_IMPLEMENTED:
-        return False, (f'{from_state} -> {to_state} is a valid transition but '
-                       f'is not implemented yet.'), None
-
-    # --- Reissue (Void -> Live) is structurally special and handled up front,
-    #     BEFORE the reopen guard. It must NOT be treated as a reopen: a voided
-    #     PAID invoice has amount_paid > 0 and would trip the reopen guard. It
-    #     also must NOT flip the current row's state — the void is retained as
-    #     Void forever. It mints a NEW Live invoice that supersedes the void,
-    #     clones its lines, writes history on BOTH rows, and returns the new id.
+        return (f'{from_state} -> {to_state} is a valid transition but '
+                f'is not implemented yet.')
+
+    # Reissue (Void -> Live) is NOT a reopen: a voided PAID invoice has
+    # amount_paid > 0 and would trip the reopen guard below.
     if from_state == 'Void' and to_state == 'Live':
-        new_id = _reissue_invoice(cur, company_key, invoice_id, username)
-        return True, None, {'new_invoice_id': new_id}
+        return None
 
     # (b) Guards.
-    is_reopen = (to_state == 'Live')
-    if is_reopen:
+    if to_state == 'Live':
         # THE governing guard: once any payment attaches, reopen is gone. This
         # prevents a payment application from ever being orphaned by an in-place
         # edit. amount_paid > 0 is the trip wire.
         if inv['amount_paid'] and inv['amount_paid'] > 0:
-            return False, ('This invoice has a payment applied and can no longer '
-                           'be reopened. Use Void or Revision to correct it.'), None
+            return ('This invoice has a payment applied and can no longer '
+                    'be reopened. Use Void or Revision to correct it.')
+
+    if to_state == 'Void' and not (notes or '').strip():
+        # Voiding a committed invoice is never silent — a reason is mandatory.
+        return 'A void reason is required.'
+    return None
+
+
+def transition_invoices(cur, company_key, invoice_ids, to_state, username, notes=None):
+    """Move many invoices to to_state at once (month-end harden / send / void).
+
+    Same guards and side effects as transition_invoice, applied set-wise: the
+    rows are locked with SELECT ... FOR UPDATE in id order (so two overlapping
+    batches can't deadlock), each is checked, and the survivors get their tax,
+    labels, state flip and history in a handful of statements regardless of
+    batch size. One invoice failing its guard does not stop the others. Does
+    NOT commit — the caller owns the transaction.
+
+    Returns {invoice_id: (ok, reason, extra)} for every id passed in, with the
+    same meaning as transition_invoice's return value."""
+    invoice_ids = list(dict.fromkeys(invoice_ids))
+    if to_state not in INVOICE_STATES:
+        reason = f'Unknown target state "{to_state}".'
+        return {inv_id: (False, reason, None) for inv_id in invoice_ids}
+
+    cur.execute("""
+        SELECT id, state, amount_paid, invoice_number, revision_number,
+               tax_rate_pct, tax_total, total
+        FROM invoices
+        WHERE id = ANY(%s) AND deleted_at IS NULL
+        ORDER BY id
+        FOR UPDATE
+    """, (invoice_ids,))
+    locked = {r['id']: r for r in cur.fetchall()}
+
+    results = {}
+    moving  = []
+    for inv_id in invoice_ids:
+        reason = _invoice_transition_rejection(locked.get(inv_id), to_state, notes)
+        if reason:
+            results[inv_id] = (False, reason, None)
+        else:
+            moving.append(locked[inv_id])
+    if not moving:
+        return results
+
+    # --- Reissue (Void -> Live) is structurally special: it must NOT flip the
+    #     current row's state — the void is retained as Void forever. It mints a
+    #     NEW Live invoice that supersedes the void, clones its lines, writes
+    #     history on BOTH rows, and returns the new id.
+    reissues = [inv for inv in moving if inv['state'] == 'Void']
+    for inv in reissues:
+        new_id = _reissue_invoice(cur, company_key, inv['id'], username)
+        invalidate_invoice_render(company_key, inv['id'])
+        results[inv['id']] = (True, None, {'new_invoice_id': new_id})
+    moving = [inv for inv in moving if inv['state'] != 'Void']
+    if not moving:
+        return results
+    ids = [inv['id'] for inv in moving]
 
     # (c) State-specific side effects.
-    history_note = notes
+    history_notes = {inv['id']: notes for inv in moving}
 
     if to_state == 'Hardened':
         # Freeze tax from the CURRENT county rate. After this write the invoice
         # total is pinned regardless of later tax_rates edits.
-        rate_pct, subtotal, tax_total, total = _compute_invoice_tax(cur, invoice_id)
-        cur.execute("""
-            UPDATE invoices
-            SET subtotal = %s, tax_rate_pct = %s, tax_total = %s, total = %s,
-                hardened_at = CURRENT_TIMESTAMP, hardened_by = %s,
-                updated_at = CURRENT_TIMESTAMP, updated_by = %s
-            WHERE id = %s
-        """, (subtotal, rate_pct, tax_total, total, username, username, invoice_id))
+        taxes = _compute_invoice_taxes(cur, company_key, ids)
+        execute_values(cur, """
+            UPDATE invoices i
+            SET subtotal = v.subtotal, tax_rate_pct = v.tax_rate_pct,
+                tax_total = v.tax_total, total = v.total,
+                hardened_at = CURRENT_TIMESTAMP, hardened_by = v.username,
+                updated_at = CURRENT_TIMESTAMP, updated_by = v.username
+            FROM (VALUES %s) AS v(id, subtotal, tax_rate_pct, tax_total, total, username)
+            WHERE i.id = v.id
+        """, [(inv_id,) + tuple(taxes[inv_id]) + (username,) for inv_id in ids],
+            template='(%s::int, %s::numeric, %s::numeric, %s::numeric, %s::numeric, %s::text)')
         # Bake equipment-ordinal labels into the frozen snapshot so a reprint
         # years later is byte-identical (same freeze discipline as the tax rate).
         # Derived from the SAME resolver used for live rendering, so preview and
         # print never disagree.
-        for _li_id, _label in _resolve_equipment_labels(cur, invoice_id).items():
-            cur.execute("""
-                UPDATE invoice_line_items
-                SET resolved_label = %s, updated_at = CURRENT_TIMESTAMP, updated_by = %s
-                WHERE id = %s
-            """, (_label, username, _li_id))
+        _bake_equipment_labels(cur, ids, username)
 
     elif to_state == 'Sent':
         cur.execute("""
             UPDATE invoices
             SET sent_at = CURRENT_TIMESTAMP, sent_by = %s,
                 updated_at = CURRENT_TIMESTAMP, updated_by = %s
-            WHERE id = %s
-        """, (username, username, invoice_id))
+            WHERE id = ANY(%s)
+        """, (username, username, ids))
 
     elif to_state == 'Paid':
         # This step marks the state only. Recording the actual payment amount
@@ -1588,54 +2681,50 @@ def transition_invoice(cur, company_key, invoice_id, to_state, username, notes=N
         cur.execute("""
             UPDATE invoices
             SET updated_at = CURRENT_TIMESTAMP, updated_by = %s
-            WHERE id = %s
-        """, (username, invoice_id))
+            WHERE id = ANY(%s)
+        """, (username, ids))
 
     elif to_state == 'Void':
-        # Voiding a committed invoice is never silent — a reason is mandatory.
-        void_reason = (notes or '').strip()
-        if not void_reason:
-            return False, 'A void reason is required.', None
-        paid_amt = inv['amount_paid'] or 0
-        opens_credit = (from_state == 'Paid' and paid_amt > 0)
-        if opens_credit:
-            # Paid invoice voided => real money now sits against no valid
-            # invoice. Capture it as a STRUCTURED, queryable OPEN credit (not a
-            # buried note) and flag it LOUDLY in history. Reconciliation
-            # Pattern 3: an open gap forwarded to AR to RESOLVE (refund / apply
-            # / write-off) — never a balance left to linger. The credit
-            # resolution lifecycle is its own later step; here we open + shout.
-            cur.execute("""
-                UPDATE invoices
-                SET voided_at = CURRENT_TIMESTAMP, voided_by = %s, void_reason = %s,
-                    credit_amount = %s, credit_status = 'open',
-                    credit_opened_at = CURRENT_TIMESTAMP,
-                    updated_at = CURRENT_TIMESTAMP, updated_by = %s
-                WHERE id = %s
-            """, (username, void_reason, paid_amt, username, invoice_id))
-            history_note = (f'[OPEN CREDIT ${paid_amt:.2f} - REQUIRES RESOLUTION] '
-                            f'Paid invoice voided. {void_reason}')
-        else:
+        void_reason = notes.strip()
+        # A Paid invoice voided => real money now sits against no valid
+        # invoice. Capture it as a STRUCTURED, queryable OPEN credit (not a
+        # buried note) and flag it LOUDLY in history. Reconciliation Pattern 3:
+        # an open gap forwarded to AR to RESOLVE (refund / apply / write-off) —
+        # never a balance left to linger. The credit resolution lifecycle is its
+        # own later step; here we open + shout.
+        credit_ids = [inv['id'] for inv in moving
+                      if inv['state'] == 'Paid' and (inv['amount_paid'] or 0) > 0]
+        cur.execute("""
+            UPDATE invoices
+            SET voided_at = CURRENT_TIMESTAMP, voided_by = %s, void_reason = %s,
+                updated_at = CURRENT_TIMESTAMP, updated_by = %s
+            WHERE id = ANY(%s)
+        """, (username, void_reason, username, ids))
+        if credit_ids:
             cur.execute("""
                 UPDATE invoices
-                SET voided_at = CURRENT_TIMESTAMP, voided_by = %s, void_reason = %s,
-                    updated_at = CURRENT_TIMESTAMP, updated_by = %s
-                WHERE id = %s
-            """, (username, void_reason, username, invoice_id))
-            history_note = void_reason
+                SET credit_amount = amount_paid, credit_status = 'open',
+                    credit_opened_at = CURRENT_TIMESTAMP
+                WHERE id = ANY(%s)
+            """, (credit_ids,))
+        for inv in moving:
+            if inv['id'] in credit_ids:
+                history_notes[inv['id']] = (
+                    f'[OPEN CREDIT ${inv["amount_paid"]:.2f} - REQUIRES RESOLUTION] '
+                    f'Paid invoice voided. {void_reason}')
+            else:
+                history_notes[inv['id']] = void_reason
 
     elif to_state == 'Live':  # reopen
-        # Read frozen figures BEFORE clearing, to preserve them in the audit
-        # trail (the "always keep it referenceable" decision).
-        cur.execute("""
-            SELECT tax_rate_pct, tax_total, total FROM invoices WHERE id = %s
-        """, (invoice_id,))
-        prior = cur.fetchone()
-        if prior and prior['total'] is not None:
-            prior_bit = (f'Prior frozen total: ${prior["total"]:.2f} '
-                         f'(tax ${prior["tax_total"] or 0:.2f} '
-                         f'@ {prior["tax_rate_pct"] or 0}%).')
-            history_note = f'{notes + " " if notes else ""}{prior_bit}'
+        # Frozen figures were read under the row lock, BEFORE clearing, to
+        # preserve them in the audit trail (the "always keep it referenceable"
+        # decision).
+        for inv in moving:
+            if inv['total'] is not None:
+                prior_bit = (f'Prior frozen total: ${inv["total"]:.2f} '
+                             f'(tax ${inv["tax_total"] or 0:.2f} '
+                             f'@ {inv["tax_rate_pct"] or 0}%).')
+                history_notes[inv['id']] = f'{notes + " " if notes else ""}{prior_bit}'
         # Clear frozen values — Live means not-yet-determined.
         cur.execute("""
             UPDATE invoices
@@ -1643,23 +2732,30 @@ def transition_invoice(cur, company_key, invoice_id, to_state, username, notes=N
                 hardened_at = NULL, hardened_by = NULL,
                 sent_at = NULL, sent_by = NULL,
                 updated_at = CURRENT_TIMESTAMP, updated_by = %s
-            WHERE id = %s
-        """, (username, invoice_id))
+            WHERE id = ANY(%s)
+        """, (username, ids))
 
     # Flip the state itself (all paths).
     cur.execute("""
         UPDATE invoices SET state = %s, updated_at = CURRENT_TIMESTAMP, updated_by = %s
-        WHERE id = %s
-    """, (to_state, username, invoice_id))
+        WHERE id = ANY(%s)
+    """, (to_state, username, ids))
+
+    # Reopen and void change what the frozen print shows; drop cached renders.
+    if to_state in ('Live', 'Void'):
+        for inv_id in ids:
+            invalidate_invoice_render(company_key, inv_id)
 
     # (d) Append history. Always, on every real transition.
-    cur.execute("""
+    execute_values(cur, """
         INSERT INTO invoice_status_history (invoice_id, state, changed_by, notes)
-        VALUES (%s, %s, %s, %s)
-    """, (invoice_id, to_state, username,
-          history_note or f'Changed from {from_state}'))
+        VALUES %s
+    """, [(inv['id'], to_state, username,
+           history_notes[inv['id']] or f'Changed from {inv["state"]}') for inv in moving])
 
-    return True, None, None
+    for inv in moving:
+        results[inv['id']] = (True, None, None)
+    return results
 
 
 
@@ -1734,112 +2830,273 @@ def _load_wo_customers(company_key):
     cur.close(); conn.close()
     return rows
 
-def _parse_wo_line_items(company_key, raw_json):
+# Work order form reference data, cached per company per worker and reused
+# while the company's 'wo_form' cache version is unchanged. The page fetches
+# it from workorder_form_data, so the browser can also revalidate by ETag.
+_wo_form_cache      = {}   # company_key -> (version, payload)
+_wo_form_cache_lock = threading.Lock()
+
+def get_wo_reference_data(company_key):
+    """(version, payload) for the work order form: payload holds catalog,
+    equipment, techs and customers. Costs one version lookup when cached.
+    Callers must treat the payload as read-only -- it is shared."""
+    conn = get_db_connection(company_key)
+    cur  = conn.cursor()
+    version = get_cache_version(cur, 'wo_form')
+    cur.close(); conn.close()
+    with _wo_form_cache_lock:
+        cached = _wo_form_cache.get(company_key)
+    if cached and cached[0] == version:
+        return cached
+    catalog_std, equipment, techs = _wo_form_data(company_key)
+    payload = {
+        'catalog':   catalog_std,
+        'equipment': equipment,
+        'techs':     techs,
+        'customers': _load_wo_customers(company_key),
+    }
+    with _wo_form_cache_lock:
+        _wo_form_cache[company_key] = (version, payload)
+    return version, payload
+
+def _line_ref_id(value):
+    """A catalog/equipment id from the line JSON as an int, or None if it
+    isn't one (then it simply won't resolve and the line is rejected)."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def _parse_wo_line_items(cur, raw_json):
     """Parse and validate the line_items_json blob from the form.
     Returns (lines, error). Totals/quantities are always computed server-side.
     Line dict shapes:
       standard:  {id?, kind:'std', catalog_item_id, description, quantity, unit_price}
       equipment: {id?, kind:'eq',  equipment_unit_id, description, deployed_at, retrieved_at}
+    Runs on the caller's cursor: every referenced catalog item and equipment
+    unit is fetched up front (one query each), then the lines are checked in
+    memory, so a 40-unit extraction job costs two round trips, not forty.
     """
     try:
         submitted = json.loads(raw_json or '[]')
     except (ValueError, TypeError):
         return None, 'Line items could not be read. Refresh and try again.'
-    if not isinstance(submitted, list):
+    if not isinstance(submitted, list) or not all(isinstance(i, dict) for i in submitted):
         return None, 'Line items could not be read. Refresh and try again.'
     if len(submitted) == 0:
         return None, 'A work order needs at least one line item.'
 
-    conn = get_db_connection(company_key)
-    cur  = conn.cursor()
+    catalog_ids = {_line_ref_id(i.get('catalog_item_id'))   for i in submitted if i.get('kind') == 'std'}
+    unit_ids    = {_line_ref_id(i.get('equipment_unit_id')) for i in submitted if i.get('kind') == 'eq'}
+    catalog_ids.discard(None); unit_ids.discard(None)
+
+    catalog, units = {}, {}
+    if catalog_ids:
+        cur.execute("""
+            SELECT id, name, unit_price, cost, is_taxable, is_catch_all,
+                   minimum_quantity, billing_increment
+            FROM catalog_items
+            WHERE id = ANY(%s) AND billing_behavior = 'standard' AND deleted_at IS NULL
+        """, (list(catalog_ids),))
+        catalog = {r['id']: r for r in cur.fetchall()}
+    if unit_ids:
+        cur.execute("""
+            SELECT eu.id, eu.name, ci.id AS catalog_item_id,
+                   ci.unit_price AS daily_rate, ci.cost, ci.is_taxable
+            FROM equipment_units eu
+            JOIN catalog_items ci ON ci.id = eu.catalog_item_id
+            WHERE eu.id = ANY(%s) AND eu.deleted_at IS NULL
+              AND ci.billing_behavior = 'per_day_equipment' AND ci.deleted_at IS NULL
+        """, (list(unit_ids),))
+        units = {r['id']: r for r in cur.fetchall()}
+
     lines = []
-    try:
-        for idx, item in enumerate(submitted, start=1):
-            kind = item.get('kind')
-            line_id = item.get('id') or None
+    for idx, item in enumerate(submitted, start=1):
+        kind = item.get('kind')
+        line_id = item.get('id') or None
+
+        if kind == 'std':
+            cat = catalog.get(_line_ref_id(item.get('catalog_item_id')))
+            if not cat:
+                return None, f'Line {idx}: pick a service from the catalog.'
+            description = (item.get('description') or '').strip()
+            if cat['is_catch_all'] and not description:
+                return None, f'Line {idx}: Custom Service requires a description.'
+            try:
+                quantity   = float(item.get('quantity'))
+                unit_price = float(item.get('unit_price'))
+            except (TypeError, ValueError):
+                return None, f'Line {idx}: quantity and price must be numbers.'
+            if quantity <= 0:
+                return None, f'Line {idx}: quantity must be greater than zero.'
+            if unit_price < 0:
+                return None, f'Line {idx}: price cannot be negative.'
+            # Catalog minimum + rounding increment (water extraction service).
+            if cat['minimum_quantity'] is not None:
+                quantity = max(quantity, float(cat['minimum_quantity']))
+            if cat['billing_increment'] is not None:
+                inc = float(cat['billing_increment'])
+                if inc > 0:
+                    quantity = math.ceil(round(quantity / inc, 6)) * inc
+            total = round(quantity * unit_price, 2)
+            lines.append({
+                'id': line_id, 'catalog_item_id': cat['id'],
+                'equipment_unit_id': None, 'description': description or None,
+                'quantity': quantity, 'unit_price': unit_price, 'total': total,
+                'cost': cat['cost'], 'is_taxable': cat['is_taxable'],
+                'deployed_at': None, 'retrieved_at': None,
+            })
 
-            if kind == 'std':
-                catalog_item_id = item.get('catalog_item_id')
-                cur.execute("""
-                    SELECT id, name, unit_price, cost, is_taxable, is_catch_all,
-                           minimum_quantity, billing_increment
-                    FROM catalog_items
-                    WHERE id = %s AND billing_behavior = 'standard' AND deleted_at IS NULL
-                """, (catalog_item_id,))
-                cat = cur.fetchone()
-                if not cat:
-                    return None, f'Line {idx}: pick a service from the catalog.'
-                description = (item.get('description') or '').strip()
-                if cat['is_catch_all'] and not description:
-                    return None, f'Line {idx}: Custom Service requires a description.'
+        elif kind == 'eq':
+            eq = units.get(_line_ref_id(item.get('equipment_unit_id')))
+            if not eq:
+                return None, f'Line {idx}: pick a unit from the equipment registry.'
+            deployed_at  = (item.get('deployed_at') or '').strip() or None
+            retrieved_at = (item.get('retrieved_at') or '').strip() or None
+            if not deployed_at:
+                return None, f'Line {idx}: equipment needs a deployed date.'
+            quantity = None
+            total    = None
+            if retrieved_at:
                 try:
-                    quantity   = float(item.get('quantity'))
-                    unit_price = float(item.get('unit_price'))
-                except (TypeError, ValueError):
-                    return None, f'Line {idx}: quantity and price must be numbers.'
-                if quantity <= 0:
-                    return None, f'Line {idx}: quantity must be greater than zero.'
-                if unit_price < 0:
-                    return None, f'Line {idx}: price cannot be negative.'
-                # Catalog minimum + rounding increment (water extraction service).
-                if cat['minimum_quantity'] is not None:
-                    quantity = max(quantity, float(cat['minimum_quantity']))
-                if cat['billing_increment'] is not None:
-                    inc = float(cat['billing_increment'])
-                    if inc > 0:
-                        quantity = math.ceil(round(quantity / inc, 6)) * inc
-                total = round(quantity * unit_price, 2)
-                lines.append({
-                    'id': line_id, 'catalog_item_id': cat['id'],
-                    'equipment_unit_id': None, 'description': description or None,
-                    'quantity': quantity, 'unit_price': unit_price, 'total': total,
-                    'cost': cat['cost'], 'is_taxable': cat['is_taxable'],
-                    'deployed_at': None, 'retrieved_at': None,
-                })
-
-            elif kind == 'eq':
-                equipment_unit_id = item.get('equipment_unit_id')
-                cur.execute("""
-                    SELECT eu.id, eu.name, ci.id AS catalog_item_id,
-                           ci.unit_price AS daily_rate, ci.cost, ci.is_taxable
-                    FROM equipment_units eu
-                    JOIN catalog_items ci ON ci.id = eu.catalog_item_id
-                    WHERE eu.id = %s AND eu.deleted_at IS NULL
-                      AND ci.billing_behavior = 'per_day_equipment' AND ci.deleted_at IS NULL
-                """, (equipment_unit_id,))
-                eq = cur.fetchone()
-                if not eq:
-                    return None, f'Line {idx}: pick a unit from the equipment registry.'
-                deployed_at  = (item.get('deployed_at') or '').strip() or None
-                retrieved_at = (item.get('retrieved_at') or '').strip() or None
-                if not deployed_at:
-                    return None, f'Line {idx}: equipment needs a deployed date.'
-                quantity = None
-                total    = None
-                if retrieved_at:
-                    try:
-                        d0 = datetime.strptime(deployed_at, '%Y-%m-%d').date()
-                        d1 = datetime.strptime(retrieved_at, '%Y-%m-%d').date()
-                    except ValueError:
-                        return None, f'Line {idx}: dates could not be read.'
-                    if d1 < d0:
-                        return None, f'Line {idx}: retrieved date is before deployed date.'
-                    quantity = max((d1 - d0).days, 1)   # same-day set-and-pull bills 1 day
-                    total    = round(quantity * float(eq['daily_rate']), 2)
-                description = (item.get('description') or '').strip() or eq['name']
-                lines.append({
-                    'id': line_id, 'catalog_item_id': eq['catalog_item_id'],
-                    'equipment_unit_id': eq['id'], 'description': description,
-                    'quantity': quantity, 'unit_price': float(eq['daily_rate']),
-                    'total': total, 'cost': eq['cost'], 'is_taxable': eq['is_taxable'],
-                    'deployed_at': deployed_at, 'retrieved_at': retrieved_at,
-                })
-            else:
-                return None, f'Line {idx}: unknown line type.'
-    finally:
-        cur.close(); conn.close()
+                    d0 = datetime.strptime(deployed_at, '%Y-%m-%d').date()
+                    d1 = datetime.strptime(retrieved_at, '%Y-%m-%d').date()
+                except ValueError:
+                    return None, f'Line {idx}: dates could not be read.'
+                if d1 < d0:
+                    return None, f'Line {idx}: retrieved date is before deployed date.'
+                quantity = max((d1 - d0).days, 1)   # same-day set-and-pull bills 1 day
+                total    = round(quantity * float(eq['daily_rate']), 2)
+            description = (item.get('description') or '').strip() or eq['name']
+            lines.append({
+                'id': line_id, 'catalog_item_id': eq['catalog_item_id'],
+                'equipment_unit_id': eq['id'], 'description': description,
+                'quantity': quantity, 'unit_price': float(eq['daily_rate']),
+                'total': total, 'cost': eq['cost'], 'is_taxable': eq['is_taxable'],
+                'deployed_at': deployed_at, 'retrieved_at': retrieved_at,
+            })
+        else:
+            return None, f'Line {idx}: unknown line type.'
     return lines, None
 
+def _refresh_wo_totals(cur, wo_id):
+    """Recompute the line-item aggregates stored on work_orders (migration
+    011). Call inside the transaction that wrote the lines so the list never
+    sees a half-updated order."""
+    cur.execute("""
+        UPDATE work_orders wo
+        SET line_subtotal            = agg.line_subtotal,
+            line_count               = agg.line_count,
+            accruing_count           = agg.accruing_count,
+            earliest_open_deployment = agg.earliest_open_deployment
+        FROM (
+            SELECT COALESCE(SUM(li.total), 0)                              AS line_subtotal,
+                   COUNT(*)                                                AS line_count,
+                   COUNT(*) FILTER (WHERE li.equipment_unit_id IS NOT NULL
+                                      AND li.retrieved_at IS NULL)         AS accruing_count,
+                   MIN(li.deployed_at) FILTER (WHERE li.equipment_unit_id IS NOT NULL
+                                                 AND li.retrieved_at IS NULL) AS earliest_open_deployment
+            FROM work_order_line_items li
+            WHERE li.work_order_id = %s AND li.deleted_at IS NULL
+        ) agg
+        WHERE wo.id = %s
+    """, (wo_id, wo_id))
+
+# Stored line columns the save diff compares and writes, with the SQL type
+# each needs in a VALUES list (untyped literals there default to text).
+WO_LINE_COLUMNS = {
+    'catalog_item_id':   'int',     'equipment_unit_id': 'int',
+    'description':       'text',    'quantity':          'numeric',
+    'unit_price':        'numeric', 'total':             'numeric',
+    'cost':              'numeric', 'is_taxable':        'boolean',
+    'tax_county':        'text',    'deployed_at':       'date',
+    'retrieved_at':      'date',    'sort_order':        'int',
+}
+
+def _line_values(row):
+    """WO_LINE_COLUMNS of a line, normalized so a stored row (Decimal, date)
+    and a parsed one (float, 'YYYY-MM-DD') compare equal when nothing moved."""
+    out = []
+    for col in WO_LINE_COLUMNS:
+        value = row[col]
+        if isinstance(value, (float, Decimal)):
+            value = Decimal(str(value)).quantize(Decimal('0.01'), ROUND_HALF_UP)
+        elif hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        out.append(value)
+    return tuple(out)
+
+def _apply_wo_line_diff(cur, wo_id, lines, tax_county, username):
+    """Bring a work order's live lines in line with the parsed form lines.
+
+    Lines are split into inserted / changed / removed against what is stored
+    and each class goes out as one statement; unchanged lines are not
+    written at all. A submitted id that isn't a live line of this order is
+    treated as new, as before. Returns True if anything was written."""
+    cols = ', '.join(WO_LINE_COLUMNS)
+    cur.execute(f"""
+        SELECT id, {cols} FROM work_order_line_items
+        WHERE work_order_id = %s AND deleted_at IS NULL
+    """, (wo_id,))
+    stored = {r['id']: _line_values(r) for r in cur.fetchall()}
+
+    inserted, changed, kept = [], [], set()
+    for sort_order, ln in enumerate(lines):
+        values = _line_values({**ln, 'tax_county': tax_county, 'sort_order': sort_order})
+        lid = _line_ref_id(ln['id'])
+        if lid in stored and lid not in kept:
+            kept.add(lid)
+            if stored[lid] != values:
+                changed.append((lid,) + values)
+        else:
+            inserted.append(values)
+    removed = list(set(stored) - kept)
+
+    if inserted:
+        execute_values(cur, f"""
+            INSERT INTO work_order_line_items
+                (work_order_id, {cols}, created_by, updated_by)
+            VALUES %s
+        """, [(wo_id,) + values + (username, username) for values in inserted])
+    if changed:
+        typed = ', '.join(f'%s::{t}' for t in WO_LINE_COLUMNS.values())
+        execute_values(cur, f"""
+            UPDATE work_order_line_items li
+            SET {', '.join(f'{c} = v.{c}' for c in WO_LINE_COLUMNS)},
+                updated_at = CURRENT_TIMESTAMP, updated_by = v.updated_by
+            FROM (VALUES %s) AS v(id, {cols}, work_order_id, updated_by)
+            WHERE li.id = v.id AND li.work_order_id = v.work_order_id
+              AND li.deleted_at IS NULL
+        """, [row + (wo_id, username) for row in changed],
+            template=f'(%s::int, {typed}, %s::int, %s::text)')
+    if removed:
+        cur.execute("""
+            UPDATE work_order_line_items
+            SET deleted_at = CURRENT_TIMESTAMP, deleted_by = %s
+            WHERE id = ANY(%s) AND work_order_id = %s
+        """, (username, removed, wo_id))
+    return bool(inserted or changed or removed)
+
+def _apply_wo_tech_diff(cur, wo_id, assigned_techs):
+    """Add and drop tech assignments so they match the form; assignments
+    that stay keep their row (and assigned_at)."""
+    wanted = {t.strip() for t in assigned_techs if t.strip()}
+    cur.execute("SELECT username FROM work_order_techs WHERE work_order_id = %s", (wo_id,))
+    current = {r['username'] for r in cur.fetchall()}
+    dropped = list(current - wanted)
+    added   = sorted(wanted - current)
+    if dropped:
+        cur.execute("""
+            DELETE FROM work_order_techs
+            WHERE work_order_id = %s AND username = ANY(%s)
+        """, (wo_id, dropped))
+    if added:
+        execute_values(cur, """
+            INSERT INTO work_order_techs (work_order_id, username)
+            VALUES %s
+            ON CONFLICT (work_order_id, username) DO NOTHING
+        """, [(wo_id, tech) for tech in added])
+
 def _save_work_order(company_key, wo_id):
     """Insert (wo_id is None) or update a work order + line items + techs +
     status history from request.form. Returns (wo_id, error)."""
@@ -1884,14 +3141,14 @@ def _save_work_order(company_key, wo_id):
     if time_err:
         return None, time_err
 
-    lines, line_error = _parse_wo_line_items(company_key, request.form.get('line_items_json'))
-    if line_error:
-        return None, line_error
-
     username = session.get('username')
     conn = get_db_connection(company_key)
     cur  = conn.cursor()
     try:
+        lines, line_error = _parse_wo_line_items(cur, request.form.get('line_items_json'))
+        if line_error:
+            return None, line_error
+
         # Validate customer + location + contact belong together.
         cur.execute("SELECT id, customer_type FROM customers WHERE id = %s AND deleted_at IS NULL",
                     (customer_id,))
@@ -1965,57 +3222,11 @@ def _save_work_order(company_key, wo_id):
                   start_date, end_date, arrival_start, arrival_end,
                   est_duration, username, wo_id))
 
-        # ---- Line items: update by id, insert new, soft-delete missing. ----
-        cur.execute("""
-            SELECT id FROM work_order_line_items
-            WHERE work_order_id = %s AND deleted_at IS NULL
-        """, (wo_id,))
-        existing_ids  = {r['id'] for r in cur.fetchall()}
-        submitted_ids = set()
-        for sort_order, ln in enumerate(lines):
-            if ln['id'] and int(ln['id']) in existing_ids:
-                lid = int(ln['id'])
-                submitted_ids.add(lid)
-                cur.execute("""
-                    UPDATE work_order_line_items
-                    SET catalog_item_id=%s, equipment_unit_id=%s, description=%s,
-                        quantity=%s, unit_price=%s, total=%s, cost=%s, is_taxable=%s,
-                        tax_county=%s, deployed_at=%s, retrieved_at=%s, sort_order=%s,
-                        updated_at=CURRENT_TIMESTAMP, updated_by=%s
-                    WHERE id=%s AND work_order_id=%s AND deleted_at IS NULL
-                """, (ln['catalog_item_id'], ln['equipment_unit_id'], ln['description'],
-                      ln['quantity'], ln['unit_price'], ln['total'], ln['cost'],
-                      ln['is_taxable'], tax_county, ln['deployed_at'], ln['retrieved_at'],
-                      sort_order, username, lid, wo_id))
-            else:
-                cur.execute("""
-                    INSERT INTO work_order_line_items
-                        (work_order_id, catalog_item_id, equipment_unit_id, description,
-                         quantity, unit_price, total, cost, is_taxable, tax_county,
-                         deployed_at, retrieved_at, sort_order, created_by, updated_by)
-                    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-                """, (wo_id, ln['catalog_item_id'], ln['equipment_unit_id'], ln['description'],
-                      ln['quantity'], ln['unit_price'], ln['total'], ln['cost'],
-                      ln['is_taxable'], tax_county, ln['deployed_at'], ln['retrieved_at'],
-                      sort_order, username, username))
-        removed = existing_ids - submitted_ids
-        if removed:
-            cur.execute("""
-                UPDATE work_order_line_items
-                SET deleted_at = CURRENT_TIMESTAMP, deleted_by = %s
-                WHERE id = ANY(%s) AND work_order_id = %s
-            """, (username, list(removed), wo_id))
-
-        # ---- Techs: replace assignments (join table, hard replace). ----
-        cur.execute("DELETE FROM work_order_techs WHERE work_order_id = %s", (wo_id,))
-        for tech in assigned_techs:
-            tech = tech.strip()
-            if tech:
-                cur.execute("""
-                    INSERT INTO work_order_techs (work_order_id, username)
-                    VALUES (%s, %s)
-                    ON CONFLICT (work_order_id, username) DO NOTHING
-                """, (wo_id, tech))
+        # ---- Line items and techs: diff against what's stored, bulk-apply. ----
+        lines_changed = _apply_wo_line_diff(cur, wo_id, lines, tax_county, username)
+        if lines_changed:
+            _refresh_wo_totals(cur, wo_id)
+        _apply_wo_tech_diff(cur, wo_id, assigned_techs)
 
         # ---- Status history: on create, or on status change. ----
         if prev_status is None or prev_status != status:
@@ -2027,20 +3238,34 @@ def _save_work_order(company_key, wo_id):
                   'Created' if prev_status is None else f'Changed from {prev_status}'))
 
         conn.commit()
+        invalidate_company_stats(company_key)
         return wo_id, None
     finally:
         cur.close(); conn.close()
 
-@app.route('/<company_key>/workorders')
-@login_required
-@company_access_required
-@with_branding
-def workorder_list(company_key, branding, all_companies, company_access):
-    if session.get('user_role') not in ('admin', 'manager', 'office'):
-        abort(403)
-    search        = request.args.get('search', '').strip()
-    status_filter = request.args.get('status', '').strip()
-
+WO_LIST_PAGE_SIZE = 50
+
+def _wo_keyset(direction, key):
+    """Cursor condition, params and ORDER BY for one work order list page.
+    The list runs start_date DESC NULLS LAST, id DESC -- undated jobs sort
+    last -- so the comparison branches on whether the cursor row had a date."""
+    order = "wo.start_date DESC NULLS LAST, wo.id DESC"
+    if direction is None:
+        return None, [], order
+    start_date, wo_id = key
+    if direction == 'next':
+        if start_date is None:
+            return "wo.start_date IS NULL AND wo.id < %s", [wo_id], order
+        return ("((wo.start_date, wo.id) < (%s::date, %s) OR wo.start_date IS NULL)",
+                [start_date, wo_id], order)
+    order = "wo.start_date ASC NULLS FIRST, wo.id ASC"
+    if start_date is None:
+        return "(wo.start_date IS NOT NULL OR wo.id > %s)", [wo_id], order
+    return "(wo.start_date, wo.id) > (%s::date, %s)", [start_date, wo_id], order
+
+def _query_workorders(cur, search, status_filter, cursor):
+    """One page of the work order list plus its cursors and capped count,
+    shared by the list page and its live-search endpoint."""
     conditions = ["wo.deleted_at IS NULL"]
     params     = []
     if search:
@@ -2051,42 +3276,55 @@ def workorder_list(company_key, branding, all_companies, company_access):
     if status_filter:
         conditions.append("wo.status = %s")
         params.append(status_filter)
-    where = " AND ".join(conditions)
+    from_where = f"""FROM work_orders wo JOIN customers c ON c.id = wo.customer_id
+                     WHERE {" AND ".join(conditions)}"""
 
-    conn = get_db_connection(company_key)
-    cur  = conn.cursor()
+    total, total_capped = capped_count(cur, from_where, params)
+
+    direction, key = decode_cursor(cursor, (cursor_date, cursor_int))
+    page_cond, page_params, order = _wo_keyset(direction, key)
+    if page_cond:
+        from_where += f" AND {page_cond}"
     cur.execute(f"""
         SELECT wo.id, wo.work_order_number, wo.status, wo.priority,
                wo.work_site_label, wo.start_date,
                c.property_name AS customer_name,
-               (SELECT COALESCE(SUM(li.total), 0)
-                FROM work_order_line_items li
-                WHERE li.work_order_id = wo.id AND li.deleted_at IS NULL) AS order_total,
-               (SELECT COUNT(*)
-                FROM work_order_line_items li
-                WHERE li.work_order_id = wo.id AND li.deleted_at IS NULL
-                  AND li.equipment_unit_id IS NOT NULL
-                  AND li.retrieved_at IS NULL) AS accruing_count
-        FROM work_orders wo
-        JOIN customers c ON c.id = wo.customer_id
-        WHERE {where}
-        ORDER BY wo.start_date DESC NULLS LAST, wo.id DESC
-        LIMIT 200
-    """, params)
-    workorders = cur.fetchall()
-    cur.execute(f"""
-        SELECT COUNT(*) AS count
-        FROM work_orders wo JOIN customers c ON c.id = wo.customer_id
-        WHERE {where}
-    """, params)
-    total = cur.fetchone()['count']
+               wo.line_subtotal AS order_total, wo.accruing_count
+        {from_where}
+        ORDER BY {order}
+        LIMIT %s
+    """, params + page_params + [WO_LIST_PAGE_SIZE + 1])
+    rows, next_cursor, prev_cursor = keyset_page(
+        cur.fetchall(), WO_LIST_PAGE_SIZE, direction,
+        lambda r: (r['start_date'].isoformat() if r['start_date'] else None, r['id']))
+    return {
+        'workorders':   rows,
+        'next_cursor':  next_cursor,
+        'prev_cursor':  prev_cursor,
+        'total':        total,
+        'total_capped': total_capped,
+    }
+
+@app.route('/<company_key>/workorders')
+@login_required
+@company_access_required
+@with_branding
+def workorder_list(company_key, branding, all_companies, company_access):
+    if session.get('user_role') not in ('admin', 'manager', 'office'):
+        abort(403)
+    search        = request.args.get('search', '').strip()
+    status_filter = request.args.get('status', '').strip()
+
+    conn = get_db_connection(company_key)
+    cur  = conn.cursor()
+    page = _query_workorders(cur, search, status_filter, request.args.get('cursor'))
     cur.close(); conn.close()
     return render_template('workorder_list.html',
         branding=branding, company_key=company_key,
         company_access=company_access, all_companies=all_companies,
-        workorders=workorders, total=total,
         search=search, status_filter=status_filter,
         statuses=WO_OFFICE_STATUSES,
+        **page,
     )
 
 @app.route('/<company_key>/workorders/search')
@@ -2099,47 +3337,17 @@ def workorders_search(company_key):
     search        = request.args.get('search', '').strip()
     status_filter = request.args.get('status', '').strip()
 
-    conditions = ["wo.deleted_at IS NULL"]
-    params     = []
-    if search:
-        conditions.append("""(wo.work_order_number ILIKE %s
-                              OR c.property_name ILIKE %s
-                              OR wo.work_site_label ILIKE %s)""")
-        params.extend([f'%{search}%'] * 3)
-    if status_filter:
-        conditions.append("wo.status = %s")
-        params.append(status_filter)
-    where = " AND ".join(conditions)
-
     conn = get_db_connection(company_key)
     cur  = conn.cursor()
-    cur.execute(f"""
-        SELECT wo.id, wo.work_order_number, wo.status, wo.priority,
-               wo.work_site_label, wo.start_date::text AS start_date,
-               c.property_name AS customer_name,
-               (SELECT COALESCE(SUM(li.total), 0)
-                FROM work_order_line_items li
-                WHERE li.work_order_id = wo.id AND li.deleted_at IS NULL)::float AS order_total,
-               (SELECT COUNT(*)
-                FROM work_order_line_items li
-                WHERE li.work_order_id = wo.id AND li.deleted_at IS NULL
-                  AND li.equipment_unit_id IS NOT NULL
-                  AND li.retrieved_at IS NULL)::int AS accruing_count
-        FROM work_orders wo
-        JOIN customers c ON c.id = wo.customer_id
-        WHERE {where}
-        ORDER BY wo.start_date DESC NULLS LAST, wo.id DESC
-        LIMIT 200
-    """, params)
-    rows = cur.fetchall()
-    cur.execute(f"""
-        SELECT COUNT(*) AS count
-        FROM work_orders wo JOIN customers c ON c.id = wo.customer_id
-        WHERE {where}
-    """, params)
-    total = cur.fetchone()['count']
+    page = _query_workorders(cur, search, status_filter, request.args.get('cursor'))
     cur.close(); conn.close()
-    return jsonify({'total': total, 'workorders': rows})
+    page['workorders'] = [{
+        **wo,
+        'start_date':     wo['start_date'].isoformat() if wo['start_date'] else None,
+        'order_total':    float(wo['order_total']),
+        'accruing_count': int(wo['accruing_count']),
+    } for wo in page['workorders']]
+    return jsonify(page)
 
 @app.route('/<company_key>/workorders/customer/<int:customer_id>/context')
 @login_required
@@ -2151,38 +3359,67 @@ def workorder_customer_context(company_key, customer_id):
         abort(403)
     conn = get_db_connection(company_key)
     cur  = conn.cursor()
-    cur.execute("""
-        SELECT id, property_name, customer_type FROM customers
-        WHERE id = %s AND deleted_at IS NULL
-    """, (customer_id,))
-    cust = cur.fetchone()
-    if not cust:
-        cur.close(); conn.close()
-        abort(404)
-    label, prefill = WORK_SITE_LABELS.get(cust['customer_type'], ('Work Site', False))
-    cur.execute("""
-        SELECT id, location_name, address, city, state, is_primary
-        FROM service_locations
-        WHERE customer_id = %s AND deleted_at IS NULL
-        ORDER BY is_primary DESC, location_name NULLS LAST, address
-    """, (customer_id,))
-    locations = [dict(r) for r in cur.fetchall()]
-    cur.execute("""
-        SELECT id, first_name, last_name, title
-        FROM customer_contacts
-        WHERE customer_id = %s
-        ORDER BY last_name, first_name
-    """, (customer_id,))
-    contacts = [dict(r) for r in cur.fetchall()]
+    ctx  = load_customer_context(cur, company_key, customer_id)
     cur.close(); conn.close()
+    if not ctx:
+        abort(404)
+    label, prefill = WORK_SITE_LABELS.get(ctx['customer_type'], ('Work Site', False))
     return jsonify({
-        'customer_type': cust['customer_type'],
+        'customer_type': ctx['customer_type'],
         'site_label': label,
         'site_prefill_from_location': prefill,
-        'locations': locations,
-        'contacts': contacts,
+        'locations': ctx['locations'],
+        'contacts': ctx['contacts'],
     })
 
+DUPE_CHECK_BATCH_MAX = 500
+
+def find_site_duplicates(cur, candidates):
+    """Double-booking matches for many (customer_id, service_location_id,
+    site, exclude_id) candidates in one statement: per candidate, up to 5
+    non-cancelled work orders of the same customer + service location +
+    normalized work site, dated within the last 4 weeks or any time in the
+    future. Returns one list of matches per candidate, in order.
+
+    Each candidate is a single range on idx_wo_normalized_site (migration
+    018) over all three equality columns; the input site is normalized by
+    the same expression as the generated column. "Same service location"
+    includes both being unset, and an OR of the two cases can't be an index
+    condition, so each case is its own UNION ALL branch and the one that
+    doesn't apply is skipped without touching the index."""
+    if not candidates:
+        return []
+    match = """
+            SELECT wo.id, wo.work_order_number, wo.work_site_label, wo.status, wo.start_date
+            FROM work_orders wo
+            WHERE wo.deleted_at IS NULL
+              AND wo.customer_id = v.customer_id
+              AND {location}
+              AND wo.normalized_site = lower(regexp_replace(v.site, '[^a-zA-Z0-9]', '', 'g'))
+              AND (v.exclude_id IS NULL OR wo.id <> v.exclude_id)
+              AND wo.status NOT IN ('Cancelled')
+              AND (wo.start_date IS NULL OR wo.start_date >= CURRENT_DATE - INTERVAL '28 days')"""
+    rows = execute_values(cur, f"""
+        SELECT v.idx, m.id, m.work_order_number, m.work_site_label, m.status,
+               m.start_date::text AS start_date
+        FROM (VALUES %s) AS v(idx, customer_id, service_location_id, site, exclude_id)
+        CROSS JOIN LATERAL (
+            ({match.format(location='wo.service_location_id = v.service_location_id')})
+            UNION ALL
+            ({match.format(location='v.service_location_id IS NULL AND wo.service_location_id IS NULL')})
+            ORDER BY start_date DESC NULLS LAST
+            LIMIT 5
+        ) m
+        ORDER BY v.idx, m.start_date DESC NULLS LAST
+    """, [(i, c['customer_id'], c.get('service_location_id'), c['site'], c.get('exclude_id'))
+          for i, c in enumerate(candidates)],
+        template='(%s::int, %s::int, %s::int, %s::text, %s::int)',
+        page_size=len(candidates), fetch=True)
+    results = [[] for _ in candidates]
+    for r in rows:
+        results[r.pop('idx')].append(r)
+    return results
+
 @app.route('/<company_key>/workorders/dupe_check')
 @login_required
 @company_access_required
@@ -2199,37 +3436,55 @@ def workorder_dupe_check(company_key):
     if not customer_id or not site:
         return jsonify({'matches': []})
 
-    params = [customer_id, site]
-    loc_clause = "service_location_id IS NULL" if not service_location_id \
-                 else "service_location_id = %s"
-    if service_location_id:
-        params.append(service_location_id)
-    exclude_clause = ""
-    if exclude_id:
-        exclude_clause = "AND id <> %s"
-        params.append(exclude_id)
-
     conn = get_db_connection(company_key)
     cur  = conn.cursor()
-    cur.execute(f"""
-        SELECT id, work_order_number, work_site_label, status,
-               start_date::text AS start_date
-        FROM work_orders
-        WHERE deleted_at IS NULL
-          AND customer_id = %s
-          AND lower(regexp_replace(work_site_label, '[^a-zA-Z0-9]', '', 'g')) =
-              lower(regexp_replace(%s,              '[^a-zA-Z0-9]', '', 'g'))
-          AND {loc_clause}
-          {exclude_clause}
-          AND status NOT IN ('Cancelled')
-          AND (start_date IS NULL OR start_date >= CURRENT_DATE - INTERVAL '28 days')
-        ORDER BY start_date DESC NULLS LAST
-        LIMIT 5
-    """, params)
-    matches = cur.fetchall()
+    matches = find_site_duplicates(cur, [{
+        'customer_id': customer_id, 'service_location_id': service_location_id,
+        'site': site, 'exclude_id': exclude_id,
+    }])[0]
     cur.close(); conn.close()
     return jsonify({'matches': matches})
 
+@app.route('/<company_key>/workorders/dupe_check/batch', methods=['POST'])
+@login_required
+@company_access_required
+def workorder_dupe_check_batch(company_key):
+    """JSON batch form of workorder_dupe_check, for bulk-created and imported
+    work orders. Body: {"candidates": [{customer_id, service_location_id,
+    site, exclude_id}, ...]}. Returns {"results": [{"matches": [...]}, ...]}
+    in the same order; a candidate without customer_id or site gets none."""
+    if session.get('user_role') not in ('admin', 'manager', 'office'):
+        abort(403)
+    body       = request.get_json(silent=True) or {}
+    candidates = body.get('candidates')
+    if not isinstance(candidates, list) or len(candidates) > DUPE_CHECK_BATCH_MAX:
+        return jsonify({'error': f'candidates must be a list of at most {DUPE_CHECK_BATCH_MAX}'}), 400
+
+    checks, positions = [], []
+    for pos, c in enumerate(candidates):
+        if not isinstance(c, dict):
+            continue
+        customer_id = _line_ref_id(c.get('customer_id'))
+        site        = str(c.get('site') or '').strip()
+        if not customer_id or not site:
+            continue
+        checks.append({
+            'customer_id':         customer_id,
+            'service_location_id': _line_ref_id(c.get('service_location_id')),
+            'site':                site,
+            'exclude_id':          _line_ref_id(c.get('exclude_id')),
+        })
+        positions.append(pos)
+
+    results = [{'matches': []} for _ in candidates]
+    if checks:
+        conn = get_db_connection(company_key)
+        cur  = conn.cursor()
+        for pos, matches in zip(positions, find_site_duplicates(cur, checks)):
+            results[pos]['matches'] = matches
+        cur.close(); conn.close()
+    return jsonify({'results': results})
+
 @app.route('/<company_key>/workorders/<int:wo_id>')
 @login_required
 @company_access_required
@@ -2300,6 +3555,21 @@ def workorder_detail(company_key, wo_id, branding, all_companies, company_access
         accruing=accruing, techs=techs, history=history,
     )
 
+@app.route('/<company_key>/workorders/form-data')
+@login_required
+@company_access_required
+def workorder_form_data(company_key):
+    """JSON: the work order form's option lists. ETag is the company's cache
+    version, so a repeat form open revalidates with a 304 and no body."""
+    if session.get('user_role') not in ('admin', 'manager', 'office'):
+        abort(403)
+    version, payload = get_wo_reference_data(company_key)
+    response = jsonify(payload)
+    response.set_etag(f'{company_key}-{version}')
+    response.cache_control.private  = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
 @app.route('/<company_key>/workorders/new', methods=['GET', 'POST'])
 @login_required
 @company_access_required
@@ -2312,14 +3582,12 @@ def workorder_new(company_key, branding, all_companies, company_access):
         new_id, error = _save_work_order(company_key, wo_id=None)
         if not error:
             return redirect(f'/{company_key}/workorders')
-    catalog_std, equipment, techs = _wo_form_data(company_key)
-    customers = _load_wo_customers(company_key)
     return render_template('workorder_form.html',
         branding=branding, company_key=company_key,
         company_access=company_access, all_companies=all_companies,
         wo=None, line_items=[], wo_techs=[], error=error,
-        customers=customers, catalog_std=catalog_std, equipment=equipment,
-        techs=techs, statuses=WO_OFFICE_STATUSES,
+        form_extras={'catalog': [], 'equipment': [], 'customers': []},
+        statuses=WO_OFFICE_STATUSES,
         job_sources=WO_JOB_SOURCES, priorities=WO_PRIORITIES,
         arrival_suggestions=WO_ARRIVAL_SUGGESTIONS,
         site_labels=WORK_SITE_LABELS,
@@ -2371,16 +3639,17 @@ def workorder_edit(company_key, wo_id, branding, all_companies, company_access):
     """, (wo_id,))
     wo_techs = [r['username'] for r in cur.fetchall()]
     cur.close(); conn.close()
-    catalog_std, equipment, techs = _wo_form_data(company_key)
-    customers = _load_wo_customers(company_key)
-    # Merge in anything this WO already references that the active-only option
-    # lists don't contain (retired units, deactivated items, inactive customers).
-    # Without this, the restricted combobox would silently clear them on edit.
+    _, ref = get_wo_reference_data(company_key)
+    # Send along anything this WO already references that the active-only
+    # option lists don't contain (retired units, deactivated items, inactive
+    # customers). Without this, the restricted combobox would silently clear
+    # them on edit. Extras ride in the page; the shared lists stay cached.
+    extras = {'catalog': [], 'equipment': [], 'customers': []}
     conn = get_db_connection(company_key)
     cur  = conn.cursor()
     missing_cats = ({li['catalog_item_id'] for li in line_items
                      if li['billing_behavior'] == 'standard'}
-                    - {c['id'] for c in catalog_std})
+                    - {c['id'] for c in ref['catalog']})
     if missing_cats:
         cur.execute("""
             SELECT id, name, category, unit_price::float AS unit_price,
@@ -2390,10 +3659,10 @@ def workorder_edit(company_key, wo_id, branding, all_companies, company_access):
                    billing_increment::float AS billing_increment
             FROM catalog_items WHERE id = ANY(%s)
         """, (list(missing_cats),))
-        catalog_std.extend(dict(r) for r in cur.fetchall())
+        extras['catalog'] = [dict(r) for r in cur.fetchall()]
     missing_eq = ({li['equipment_unit_id'] for li in line_items
                    if li['equipment_unit_id']}
-                  - {e['id'] for e in equipment})
+                  - {e['id'] for e in ref['equipment']})
     if missing_eq:
         cur.execute("""
             SELECT eu.id, eu.name, ci.id AS catalog_item_id,
@@ -2403,17 +3672,16 @@ def workorder_edit(company_key, wo_id, branding, all_companies, company_access):
             JOIN catalog_items ci ON ci.id = eu.catalog_item_id
             WHERE eu.id = ANY(%s)
         """, (list(missing_eq),))
-        equipment.extend(dict(r) for r in cur.fetchall())
+        extras['equipment'] = [dict(r) for r in cur.fetchall()]
     cur.close(); conn.close()
-    if wo['customer_id'] not in {c['id'] for c in customers}:
-        customers.append({'id': wo['customer_id'], 'name': wo['customer_name'],
-                          'category': wo['customer_type']})
+    if wo['customer_id'] not in {c['id'] for c in ref['customers']}:
+        extras['customers'] = [{'id': wo['customer_id'], 'name': wo['customer_name'],
+                                'category': wo['customer_type']}]
     return render_template('workorder_form.html',
         branding=branding, company_key=company_key,
         company_access=company_access, all_companies=all_companies,
         wo=wo, line_items=line_items, wo_techs=wo_techs, error=error,
-        customers=customers, catalog_std=catalog_std, equipment=equipment,
-        techs=techs, statuses=WO_OFFICE_STATUSES,
+        form_extras=extras, statuses=WO_OFFICE_STATUSES,
         job_sources=WO_JOB_SOURCES, priorities=WO_PRIORITIES,
         arrival_suggestions=WO_ARRIVAL_SUGGESTIONS,
         site_labels=WORK_SITE_LABELS,
@@ -2439,8 +3707,171 @@ def workorder_delete(company_key, wo_id):
         WHERE work_order_id = %s AND deleted_at IS NULL
     """, (username, wo_id))
     conn.commit(); cur.close(); conn.close()
+    invalidate_company_stats(company_key)
     return redirect(f'/{company_key}/workorders')
 
+# ============================================================================
+# Invoices — print  (admin + manager + office)
+# ============================================================================
+# Once hardened an invoice's figures are frozen (tax rate, totals and
+# equipment labels pinned), but its page also shows data that can still
+# change: the customer's name, address and terms, the service location, the
+# work order number, the notes, the company branding and the template. So
+# Hardened / Sent / Paid renders are cached on disk addressed by a hash of
+# every render input -- the whole invoice row as queried, the branding and
+# the template's own hash -- under one directory per invoice; an edit to any
+# of them is a new address, and the superseded file is dropped when the new
+# one is written. Reopen, void and reissue drop the directory. A file written
+# by a render racing one of those is harmless: reopen clears hardened_at
+# (new address on re-harden) and the other states are never read from the
+# cache.
+INVOICE_RENDER_CACHE_DIR = os.environ.get(
+    'INVOICE_RENDER_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'invoice_cache'))
+INVOICE_CACHEABLE_STATES = {'Hardened', 'Sent', 'Paid'}
+INVOICE_PRINT_BATCH_MAX  = int(os.environ.get('INVOICE_PRINT_BATCH_MAX', '500'))
+
+with open(os.path.join(app.root_path, app.template_folder, 'invoice_print.html'), 'rb') as f:
+    _INVOICE_TEMPLATE_VERSION = hashlib.sha256(f.read()).hexdigest()
+
+def _invoice_render_dir(company_key, invoice_id):
+    return os.path.join(INVOICE_RENDER_CACHE_DIR, company_key, str(invoice_id))
+
+def _invoice_render_path(company_key, inv):
+    """Cache file for inv, or None if its render isn't cacheable."""
+    if inv['state'] not in INVOICE_CACHEABLE_STATES or inv['hardened_at'] is None:
+        return None
+    key = json.dumps([dict(inv), COMPANY_BRANDING.get(company_key, {}),
+                      _INVOICE_TEMPLATE_VERSION], default=str, sort_keys=True)
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return os.path.join(_invoice_render_dir(company_key, inv['id']), f'{digest}.html')
+
+def invalidate_invoice_render(company_key, invoice_id):
+    shutil.rmtree(_invoice_render_dir(company_key, invoice_id), ignore_errors=True)
+
+def _store_invoice_render(path, html):
+    """Write via a temp file + rename so a concurrent reader never sees a
+    partial page, then drop the invoice's older renders (their inputs have
+    changed since). A failed write just means the next print renders again."""
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(html)
+        os.replace(tmp, path)
+        for name in os.listdir(directory):
+            if name.endswith('.html') and name != os.path.basename(path):
+                os.remove(os.path.join(directory, name))
+    except OSError as e:
+        print(f"[invoice_render] could not cache {path}: {e}")
+
+def render_invoices(cur, company_key, invoice_ids):
+    """Printed HTML for each found invoice: {invoice_id: (invoice_row, html)}.
+    Cached renders cost a file read; the rest share one line query and one
+    label query however many there are."""
+    cur.execute("""
+        SELECT i.id, i.invoice_number, i.revision_number, i.state, i.invoice_date,
+               i.subtotal, i.tax_county, i.tax_rate_pct, i.tax_total, i.total,
+               i.hardened_at, i.notes,
+               c.property_name AS customer_name, c.address AS customer_address,
+               c.address_2 AS customer_address_2, c.city AS customer_city,
+               c.state AS customer_state, c.zip AS customer_zip, c.payment_terms,
+               sl.location_name, sl.address AS location_address,
+               sl.city AS location_city, sl.state AS location_state,
+               wo.work_order_number
+        FROM invoices i
+        JOIN customers c ON c.id = i.customer_id
+        LEFT JOIN service_locations sl ON sl.id = i.service_location_id
+        LEFT JOIN work_orders wo ON wo.id = i.work_order_id
+        WHERE i.id = ANY(%s) AND i.deleted_at IS NULL
+    """, (list(invoice_ids),))
+    rendered, pending = {}, []
+    for inv in cur.fetchall():
+        path = _invoice_render_path(company_key, inv)
+        if path:
+            try:
+                with open(path, encoding='utf-8') as f:
+                    rendered[inv['id']] = (inv, f.read())
+                continue
+            except OSError:
+                pass
+        pending.append((inv, path))
+    if not pending:
+        return rendered
+
+    ids = [inv['id'] for inv, _ in pending]
+    cur.execute("""
+        SELECT li.id, li.invoice_id, li.description, li.resolved_label,
+               li.quantity, li.unit_price, li.total,
+               li.deployed_at, li.retrieved_at, ci.name AS catalog_name
+        FROM invoice_line_items li
+        LEFT JOIN catalog_items ci ON ci.id = li.catalog_item_id
+        WHERE li.invoice_id = ANY(%s) AND li.deleted_at IS NULL
+        ORDER BY li.invoice_id, li.sort_order, li.id
+    """, (ids,))
+    lines_by_invoice = {}
+    for li in cur.fetchall():
+        lines_by_invoice.setdefault(li['invoice_id'], []).append(li)
+    # Baked labels win; lines never hardened derive theirs live.
+    live_labels = _resolve_equipment_labels_many(cur, ids)
+
+    branding = COMPANY_BRANDING.get(company_key, {})
+    for inv, path in pending:
+        lines = [dict(li, label=(li['resolved_label'] or live_labels.get(li['id'])
+                                 or li['description'] or li['catalog_name']))
+                 for li in lines_by_invoice.get(inv['id'], [])]
+        html = render_template('invoice_print.html', inv=inv, lines=lines, branding=branding)
+        if path:
+            _store_invoice_render(path, html)
+        rendered[inv['id']] = (inv, html)
+    return rendered
+
+@app.route('/<company_key>/invoices/<int:invoice_id>/print')
+@login_required
+@company_access_required
+@with_branding
+def invoice_print(company_key, invoice_id, branding, all_companies, company_access):
+    if session.get('user_role') not in ('admin', 'manager', 'office'):
+        abort(403)
+    conn = get_db_connection(company_key)
+    cur  = conn.cursor()
+    rendered = render_invoices(cur, company_key, [invoice_id])
+    cur.close(); conn.close()
+    if invoice_id not in rendered:
+        abort(404)
+    return rendered[invoice_id][1]
+
+@app.route('/<company_key>/invoices/print')
+@login_required
+@company_access_required
+@with_branding
+def invoice_print_batch(company_key, branding, all_companies, company_access):
+    """Zip of printed invoices for ?ids=1,2,3 (batch download)."""
+    if session.get('user_role') not in ('admin', 'manager', 'office'):
+        abort(403)
+    try:
+        ids = [int(x) for x in request.args.get('ids', '').split(',') if x.strip()]
+    except ValueError:
+        abort(400)
+    if not ids or len(ids) > INVOICE_PRINT_BATCH_MAX:
+        abort(400)
+    conn = get_db_connection(company_key)
+    cur  = conn.cursor()
+    rendered = render_invoices(cur, company_key, ids)
+    cur.close(); conn.close()
+    if not rendered:
+        abort(404)
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for inv_id in ids:
+            if inv_id in rendered:
+                inv, html = rendered[inv_id]
+                zf.writestr(f"{inv['invoice_number']}-R{inv['revision_number']}.html", html)
+    buf.seek(0)
+    return send_file(buf, mimetype='application/zip', as_attachment=True,
+                     download_name=f'{company_key}_invoices_{datetime.now().strftime("%Y%m%d")}.zip')
+
 # ============================================================================
 # Contacts — new
 # ============================================================================
@@ -2508,6 +3939,7 @@ def contact_new(company_key, customer_id, branding, all_companies, company_acces
                 session.get('username'),
                 session.get('username'),
             ))
+            touch_customer_view(cur, customer_id)
             conn.commit()
             cur.close(); conn.close()
             return redirect(f'/{company_key}/customers/{customer_id}')
@@ -2600,6 +4032,7 @@ def contact_edit(company_key, customer_id, contact_id, branding, all_companies,
                 session.get('username'),
                 contact_id,
             ))
+            touch_customer_view(cur, customer_id)
             conn.commit()
             cur.close(); conn.close()
             return redirect(f'/{company_key}/customers/{customer_id}')
@@ -2644,6 +4077,7 @@ def contact_delete(company_key, customer_id, contact_id):
             SET deleted_at = CURRENT_TIMESTAMP, deleted_by = %s
             WHERE id = %s AND customer_id = %s
         """, (session.get('username'), contact_id, customer_id))
+        touch_customer_view(cur, customer_id)
         conn.commit()
 
     cur.close(); conn.close()
@@ -2661,7 +4095,8 @@ def billing(company_key, branding, all_companies, company_access):
     conn = get_db_connection(company_key)
     cur  = conn.cursor()
 
-    # Get all active customers with their billing contacts
+    # Active customers with their billing contact summary (migration 017;
+    # kept current by triggers, so this is a plain join)
     cur.execute("""
         SELECT
             c.id,
@@ -2670,31 +4105,14 @@ def billing(company_key, branding, all_companies, company_access):
             c.status,
             c.payment_terms,
             mc.name as management_company_name,
-            -- Count of billing contacts
-            COUNT(cc.id) FILTER (
-                WHERE cc.accepts_billing = TRUE AND cc.deleted_at IS NULL
-            ) as billing_contact_count,
-            -- Aggregate billing emails into a comma-separated string
-            STRING_AGG(
-                cc.office_email,
-                ', '
-                ORDER BY cc.is_primary DESC, cc.last_name ASC
-            ) FILTER (
-                WHERE cc.accepts_billing = TRUE
-                  AND cc.deleted_at IS NULL
-                  AND cc.office_email IS NOT NULL
-            ) as billing_emails,
-            -- Primary billing contact name
-            MAX(cc.first_name || ' ' || cc.last_name)
-                FILTER (WHERE cc.accepts_billing = TRUE AND cc.is_primary = TRUE AND cc.deleted_at IS NULL)
-                as primary_billing_name
+            COALESCE(r.billing_contact_count, 0) as billing_contact_count,
+            array_to_string(r.billing_emails, ', ') as billing_emails,
+            r.primary_billing_name
         FROM customers c
         LEFT JOIN management_companies mc ON c.management_company_id = mc.id
-        LEFT JOIN customer_contacts cc ON cc.customer_id = c.id
+        LEFT JOIN customer_billing_readiness r ON r.customer_id = c.id
         WHERE c.deleted_at IS NULL
           AND c.status = 'Active'
-        GROUP BY c.id, c.property_name, c.customer_type, c.status,
-                 c.payment_terms, mc.name
         ORDER BY c.property_name ASC
     """)
     customers = cur.fetchall()
@@ -2712,85 +4130,112 @@ def billing(company_key, branding, all_companies, company_access):
     )
 
 
-@app.route('/<company_key>/billing/export', methods=['POST'])
+BILLING_EXPORT_CHUNK = int(os.environ.get('BILLING_EXPORT_CHUNK', '500'))
+
+def _billing_export_filter(values):
+    """WHERE fragment + params for an export request, or None if it names no
+    customers. Either explicit customer_ids (the billing page checkboxes) or
+    scope=all narrowed by status / type / search / management_company_id /
+    ready (has a billing contact)."""
+    conditions, params = ["c.deleted_at IS NULL"], []
+    ids = values.getlist('customer_ids')
+    if ids:
+        try:
+            params.append([int(i) for i in ids])
+        except ValueError:
+            return None
+        conditions.append("c.id = ANY(%s)")
+    elif values.get('scope') == 'all':
+        if values.get('status'):
+            conditions.append("c.status = %s")
+            params.append(values['status'])
+        if values.get('type'):
+            conditions.append("c.customer_type = %s")
+            params.append(values['type'])
+        if values.get('search', '').strip():
+            conditions.append("c.property_name ILIKE %s")
+            params.append(f"%{_like_escape(values['search'].strip())}%")
+        if values.get('management_company_id', '').isdigit():
+            conditions.append("c.management_company_id = %s")
+            params.append(int(values['management_company_id']))
+        if values.get('ready') == '1':
+            conditions.append("r.billing_contact_count > 0")
+    else:
+        return None
+    return " AND ".join(conditions), params
+
+@app.route('/<company_key>/billing/export', methods=['GET', 'POST'])
 @login_required
 @company_access_required
 def billing_export(company_key):
-    """Generate a CSV of selected customers for batch billing."""
-    import csv, io
-    from flask import Response
+    """Stream a CSV of customers for batch billing -- the posted selection,
+    or every customer matching the filters (see _billing_export_filter).
 
-    selected_ids = request.form.getlist('customer_ids')
-    if not selected_ids:
-        return redirect(f'/{company_key}/billing')
+    Rows come off a server-side cursor BILLING_EXPORT_CHUNK at a time and go
+    out as they're written, so memory stays flat however large the export.
+    Contact columns come from the billing readiness summary (migration 017)."""
+    import csv, io
+    from flask import stream_with_context
 
-    # Convert to ints safely
-    try:
-        selected_ids = [int(i) for i in selected_ids]
-    except ValueError:
+    export_filter = _billing_export_filter(request.values)
+    if not export_filter:
         return redirect(f'/{company_key}/billing')
-
-    conn = get_db_connection(company_key)
-    cur  = conn.cursor()
-
-    cur.execute("""
-        SELECT
-            c.id,
-            c.property_name,
-            c.customer_type,
-            c.payment_terms,
-            mc.name as management_company_name,
-            STRING_AGG(
-                cc.office_email,
-                '; '
-                ORDER BY cc.is_primary DESC, cc.last_name ASC
-            ) FILTER (
-                WHERE cc.accepts_billing = TRUE
-                  AND cc.deleted_at IS NULL
-                  AND cc.office_email IS NOT NULL
-            ) as billing_emails,
-            STRING_AGG(
-                cc.first_name || ' ' || cc.last_name,
-                '; '
-                ORDER BY cc.is_primary DESC, cc.last_name ASC
-            ) FILTER (
-                WHERE cc.accepts_billing = TRUE AND cc.deleted_at IS NULL
-            ) as billing_contacts
-        FROM customers c
-        LEFT JOIN management_companies mc ON c.management_company_id = mc.id
-        LEFT JOIN customer_contacts cc ON cc.customer_id = c.id
-        WHERE c.id = ANY(%s) AND c.deleted_at IS NULL
-        GROUP BY c.id, c.property_name, c.customer_type, c.payment_terms, mc.name
-        ORDER BY c.property_name ASC
-    """, (selected_ids,))
-    rows = cur.fetchall()
-    cur.close(); conn.close()
-
-    # Build CSV
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow([
-        'Customer ID', 'Property Name', 'Customer Type',
-        'Management Company', 'Payment Terms',
-        'Billing Contacts', 'Billing Emails'
-    ])
-    for row in rows:
-        writer.writerow([
-            row['id'],
-            row['property_name'],
-            row['customer_type'],
-            row['management_company_name'] or '',
-            row['payment_terms'] or '',
-            row['billing_contacts'] or '',
-            row['billing_emails'] or '',
+    where, params = export_filter
+
+    def generate():
+        buf    = io.StringIO()
+        writer = csv.writer(buf)
+
+        def line(fields):
+            writer.writerow(fields)
+            out = buf.getvalue()
+            buf.seek(0); buf.truncate(0)
+            return out
+
+        yield line([
+            'Customer ID', 'Property Name', 'Customer Type',
+            'Management Company', 'Payment Terms',
+            'Billing Contacts', 'Billing Emails'
         ])
+        conn = get_db_connection(company_key)
+        cur  = conn.cursor(name='billing_export')
+        cur.itersize = BILLING_EXPORT_CHUNK
+        try:
+            cur.execute(f"""
+                SELECT
+                    c.id,
+                    c.property_name,
+                    c.customer_type,
+                    c.payment_terms,
+                    mc.name as management_company_name,
+                    array_to_string(r.billing_contact_names, '; ') as billing_contacts,
+                    array_to_string(r.billing_emails, '; ') as billing_emails
+                FROM customers c
+                LEFT JOIN management_companies mc ON c.management_company_id = mc.id
+                LEFT JOIN customer_billing_readiness r ON r.customer_id = c.id
+                WHERE {where}
+                ORDER BY c.property_name ASC, c.id ASC
+            """, params)
+            for row in cur:
+                yield line([
+                    row['id'],
+                    row['property_name'],
+                    row['customer_type'],
+                    row['management_company_name'] or '',
+                    row['payment_terms'] or '',
+                    row['billing_contacts'] or '',
+                    row['billing_emails'] or '',
+                ])
+        finally:
+            cur.close(); conn.close()
 
-    output.seek(0)
     from datetime import date
     filename = f"billing_export_{company_key}_{date.today().isoformat()}.csv"
 
+    # stream_with_context keeps the request (and its pooled connection)
+    # alive until the last row has been sent.
     return Response(
-        output.getvalue(),
+        stream_with_context(generate()),
         mimetype='text/csv',
         headers={'Content-Disposition': f'attachment; filename={filename}'}
     )
@@ -2805,19 +4250,122 @@ VALID_ROLES = ['admin', 'manager', 'office', 'salesperson', 'technician']
 ALL_COMPANY_KEYS = list(DB_CONFIG.keys())  # ['getagrip', 'kleanit_charlotte', 'cts', 'kleanit_sf']
 
 
-def write_to_all_dbs(sql, params):
-    """Execute a write (INSERT/UPDATE) against all 4 company databases."""
-    errors = []
-    for key in ALL_COMPANY_KEYS:
+# User writes fan out to every company database at once, as one two-phase
+# commit: each database runs the write and PREPAREs it, and only when all four
+# have prepared is any of them committed (otherwise all roll back), so users
+# never diverge between databases. Needs max_prepared_transactions > 0 on the
+# server (docker-compose.yml). A commit that fails after every prepare
+# succeeded leaves a prepared transaction behind; reconcile_users.py resolves
+# those and repairs any drift.
+#
+# Two workers writing the same user could lock it in different databases
+# and then wait on each other's prepared transactions -- a deadlock
+# PostgreSQL can't see, as it spans databases. So the canonical database
+# (getagrip) is prepared first, alone: whoever holds it is the only writer
+# in the other three, and a second writer queues there until the first
+# finishes. As a backstop each branch runs under lock_timeout and
+# statement_timeout, and the coordinator waits at most
+# USER_REPLICATION_TIMEOUT per phase; a branch that misses it errors out,
+# every prepared branch rolls back, and the replication threads are never
+# held for long.
+_replication_executor = ThreadPoolExecutor(max_workers=len(ALL_COMPANY_KEYS),
+                                           thread_name_prefix='user-replication')
+USER_REPLICATION_GID_PREFIX   = 'fieldkit-users'
+USER_REPLICATION_LOCK_TIMEOUT = float(os.environ.get('USER_REPLICATION_LOCK_TIMEOUT', '3'))
+USER_REPLICATION_TIMEOUT      = float(os.environ.get('USER_REPLICATION_TIMEOUT',      '10'))
+
+def _prepare_user_write(company_key, gid, sql, params, cache_version):
+    """Phase one on one database. Returns the connection, holding the
+    prepared transaction, for phase two. Runs on a worker thread, so the
+    connection is a checkout of its own rather than the request's."""
+    conn = get_db_connection(company_key)
+    try:
+        conn.tpc_begin(f'{gid}:{company_key}')
+        cur = conn.cursor()
+        cur.execute("SELECT set_config('lock_timeout', %s, true), "
+                    "set_config('statement_timeout', %s, true)",
+                    (f'{USER_REPLICATION_LOCK_TIMEOUT * 1000:.0f}ms',
+                     f'{USER_REPLICATION_TIMEOUT * 1000:.0f}ms'))
+        cur.execute(sql, params)
+        if cache_version:
+            bump_cache_version(cur, cache_version)
+        cur.close()
+        conn.tpc_prepare()
+    except Exception:
         try:
-            conn = get_db_connection(key)
-            cur  = conn.cursor()
-            cur.execute(sql, params)
-            conn.commit()
-            cur.close()
-            conn.close()
+            conn.tpc_rollback()
+        except psycopg2.Error:
+            pass
+        conn.close()
+        raise
+    return conn
+
+def _finish_user_write(conn, commit):
+    """Phase two: COMMIT / ROLLBACK PREPARED, then return the connection."""
+    try:
+        if commit:
+            conn.tpc_commit()
+        else:
+            conn.tpc_rollback()
+    finally:
+        conn.close()
+
+def _abandon_user_write(future):
+    """Done-callback for a prepare that finished after the coordinator gave
+    up on it: the write was already reported failed, so roll it back."""
+    try:
+        conn = future.result()
+    except Exception:
+        return   # never prepared; _prepare_user_write cleaned up
+    try:
+        _finish_user_write(conn, commit=False)
+    except Exception as e:
+        print(f"USER REPLICATION: rollback of a late prepared transaction failed ({e}); "
+              f"run reconcile_users.py", flush=True)
+
+def write_to_all_dbs(sql, params, cache_version=None):
+    """Execute a write (INSERT/UPDATE) against all 4 company databases,
+    concurrently and atomically: it lands in every database or in none.
+    cache_version names a cache_versions counter to bump alongside it.
+    Returns a list of per-database error strings (empty on success)."""
+    gid = f'{USER_REPLICATION_GID_PREFIX}:{secrets.token_hex(8)}'
+    stats = g.get('_query_stats') if has_app_context() else None
+    if stats is not None:
+        stats['connections'] += len(ALL_COMPANY_KEYS)   # one checkout per worker thread
+    first, rest = ALL_COMPANY_KEYS[0], ALL_COMPANY_KEYS[1:]
+    futures = {first: _replication_executor.submit(
+                   _prepare_user_write, first, gid, sql, params, cache_version)}
+    done, _late = wait(futures.values(), timeout=USER_REPLICATION_TIMEOUT)
+    if futures[first] in done and futures[first].exception() is None:
+        futures.update({key: _replication_executor.submit(
+                            _prepare_user_write, key, gid, sql, params, cache_version)
+                        for key in rest})
+        done, _late = wait(futures.values(), timeout=USER_REPLICATION_TIMEOUT)
+    prepared, errors = {}, []
+    for key, future in futures.items():
+        if future not in done:
+            errors.append(f"{key}: timed out after {USER_REPLICATION_TIMEOUT:g}s")
+            future.add_done_callback(_abandon_user_write)
+            continue
+        try:
+            prepared[key] = future.result()
         except Exception as e:
             errors.append(f"{key}: {e}")
+
+    commit = not errors
+    finishes = {key: _replication_executor.submit(_finish_user_write, conn, commit)
+                for key, conn in prepared.items()}
+    done, _late = wait(finishes.values(), timeout=USER_REPLICATION_TIMEOUT)
+    for key, future in finishes.items():
+        if future not in done:
+            errors.append(f"{key}: {'commit' if commit else 'rollback'} of prepared "
+                          f"transaction {gid}:{key} timed out; run reconcile_users.py")
+            continue
+        try:
+            future.result()
+        except Exception as e:
+            errors.append(f"{key}: {'commit' if commit else 'rollback'} of prepared "
+                          f"transaction {gid}:{key} failed ({e}); run reconcile_users.py")
     return errors
 
 
@@ -2872,6 +4420,26 @@ def user_list(company_key, branding, all_companies, company_access):
     )
 
 
+@app.route('/<company_key>/settings/slow-queries')
+@login_required
+@company_access_required
+@with_branding
+def slow_queries(company_key, branding, all_companies, company_access):
+    """Slow-query log for this worker, across all companies."""
+    if session.get('user_role') != 'admin':
+        abort(403)
+
+    top, recent = slow_query_report()
+
+    return render_template('slow_queries.html',
+        branding=branding, company_key=company_key,
+        company_access=company_access, all_companies=all_companies,
+        top=top, recent=recent,
+        threshold_ms=round(SLOW_QUERY_SECONDS * 1000),
+        pid=os.getpid(),
+    )
+
+
 @app.route('/<company_key>/settings/users/new', methods=['GET', 'POST'])
 @login_required
 @company_access_required
@@ -2922,13 +4490,13 @@ def user_new(company_key, branding, all_companies, company_access):
                 VALUES (%s, %s, %s, %s, %s, %s, TRUE, %s)
                 ON CONFLICT (username) DO NOTHING
             """, (username, email, full_name, role, pw_hash,
-                  json.dumps(co_access), session.get('username')))
+                  json.dumps(co_access), session.get('username')),
+                cache_version='wo_form')
 
             if errs:
-                error = 'User created but errors syncing to some databases: ' + '; '.join(errs)
-                # Still redirect — getagrip (canonical) succeeded
+                error = 'User not created — could not write to every database: ' + '; '.join(errs)
+            else:
                 return redirect(f'/{company_key}/settings/users')
-            return redirect(f'/{company_key}/settings/users')
 
     return render_template('user_form.html',
         branding=branding, company_key=company_key,
@@ -2973,10 +4541,11 @@ def user_edit(company_key, user_id, branding, all_companies, company_access):
                 SET full_name = %s, email = %s, role = %s,
                     company_access = %s, updated_at = CURRENT_TIMESTAMP
                 WHERE username = %s
-            """, (full_name, email if email else user['email'], role, json.dumps(co_access), user['username']))
+            """, (full_name, email if email else user['email'], role, json.dumps(co_access), user['username']),
+                cache_version='wo_form')
 
             if errs:
-                error = 'Saved but errors syncing: ' + '; '.join(errs)
+                error = 'Not saved — could not write to every database: ' + '; '.join(errs)
             else:
                 return redirect(f'/{company_key}/settings/users')
 
@@ -3035,7 +4604,7 @@ def user_toggle_active(company_key, user_id):
     write_to_all_dbs("""
         UPDATE users SET is_active = NOT is_active, updated_at = CURRENT_TIMESTAMP
         WHERE username = %s
-    """, (user['username'],))
+    """, (user['username'],), cache_version='wo_form')
 
     return redirect(f'/{company_key}/settings/users')
 
@@ -3240,6 +4809,28 @@ def reset_password(token):
         full_name=row['full_name'], error=None,
     )
 
+# ============================================================================
+# Admin — diagnostics
+# ============================================================================
+
+@app.route('/admin/pools')
+@login_required
+def admin_pool_stats():
+    """JSON: per-company connection pool counters for this worker process."""
+    if session.get('user_role') != 'admin':
+        abort(403)
+    return jsonify({'pid': os.getpid(), 'pools': pool_stats()})
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape target. Open to a logged-in admin, or to a scraper
+    sending "Authorization: Bearer <METRICS_TOKEN>" when that is set."""
+    token = request.headers.get('Authorization', '')
+    if not (session.get('user_role') == 'admin'
+            or (METRICS_TOKEN and secrets.compare_digest(token, f'Bearer {METRICS_TOKEN}'))):
+        abort(403)
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
 # ============================================================================
 # Run
 # ============================================================================
@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+"""
+FieldKit: Hot Route Benchmark
+Created: 2026-10-17
+Purpose: Drive the routes staff hit all day over real HTTP, with concurrent
+logged-in clients, and report p50/p95/p99 latency, throughput and queries
+per request. Save the result as a JSON baseline and compare later runs
+against it, so a commit that slows a route or adds queries shows up.
+
+Scenarios:
+  customers_search            GET  /<company>/customers/search
+  workorders_search           GET  /<company>/workorders/search
+  workorder_customer_context  GET  /<company>/workorders/customer/<id>/context
+  workorder_dupe_check        GET  /<company>/workorders/dupe_check
+  workorder_new               POST /<company>/workorders/new  (creates work orders)
+  billing                     GET  /<company>/billing
+  transition_invoice          in-process Live -> Hardened, rolled back. There is
+                              no route for it yet, so it is timed as a call.
+
+Each client logs in through /login with --username (password from
+BENCH_PASSWORD, else prompted); that user needs admin, manager or office
+role and access to the company. Queries per request are read off /metrics
+(user-facing requests only), so the user should be an admin, or
+METRICS_TOKEN must be set. By default the app is served in-process on a
+free port, which keeps /metrics exact; with --base-url against
+multi-worker gunicorn, each /metrics read sees one worker only.
+
+Run against a local database loaded with
+phase1/fieldkit_phase1/generate_dataset.py (same seed and options every
+time). Fixtures (customers, sites, invoices) are picked from it
+deterministically. Baselines record row counts, and a compare against a
+different dataset is flagged. workorder_new writes real work orders, which
+are hard-deleted when the run ends (even an interrupted one); --keep leaves
+them in place for inspection.
+
+Usage:
+    python3 benchmarks/bench_hot_routes.py kleanit_charlotte --username admin --save-baseline benchmarks/baselines/hot_routes.json
+    python3 benchmarks/bench_hot_routes.py kleanit_charlotte --username admin --compare benchmarks/baselines/hot_routes.json
+
+Reads DB_* settings from the environment, same as app.py.
+"""
+
+import argparse
+import getpass
+import http.cookiejar
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import app as fieldkit  # noqa: E402
+from flask import g  # noqa: E402
+
+FIXTURES = 50   # distinct customers / sites / invoices cycled through per scenario
+
+SCENARIOS = ['customers_search', 'workorders_search', 'workorder_customer_context',
+             'workorder_dupe_check', 'workorder_new', 'billing', 'transition_invoice']
+
+_METRIC_LINE = re.compile(
+    r'^fieldkit_request_queries_(sum|count)\{endpoint="([^"]*)",company="([^"]*)"\} (\S+)$')
+
+
+# ============================================================================
+# HTTP clients
+# ============================================================================
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Client:
+    """One logged-in staff member: its own cookie jar, redirects not followed."""
+
+    def __init__(self, base_url, username, password):
+        self.base_url = base_url
+        self.opener   = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+        status, _ = self.request('POST', '/login', {'username': username, 'password': password})
+        if status != 302:
+            raise RuntimeError(f'login as {username!r} failed (HTTP {status})')
+
+    def request(self, method, path, form=None, headers=None):
+        data = urllib.parse.urlencode(form).encode() if form is not None else None
+        req  = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                      headers=headers or {})
+        try:
+            with self.opener.open(req, timeout=60) as resp:
+                return resp.status, resp.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+def read_query_totals(client, company_key):
+    """{endpoint: (queries sum, request count)} from /metrics, or None."""
+    headers = {}
+    if os.environ.get('METRICS_TOKEN'):
+        headers['Authorization'] = f"Bearer {os.environ['METRICS_TOKEN']}"
+    status, body = client.request('GET', '/metrics', headers=headers)
+    if status != 200:
+        return None
+    totals = {}
+    for line in body.decode().splitlines():
+        m = _METRIC_LINE.match(line)
+        if m and m.group(3) == company_key:
+            pair = totals.setdefault(m.group(2), [0.0, 0.0])
+            pair[0 if m.group(1) == 'sum' else 1] = float(m.group(4))
+    return totals
+
+
+def serve_in_process():
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, fieldkit.app, threaded=True,
+                         request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+# ============================================================================
+# Fixtures
+# ============================================================================
+
+def load_fixtures(company_key):
+    """Deterministic picks from the dataset, plus its row counts."""
+    conn = fieldkit.get_db_connection(company_key)
+    cur  = conn.cursor()
+    counts = {}
+    for table in ('customers', 'work_orders', 'work_order_line_items', 'invoices'):
+        cur.execute(f"SELECT COUNT(*) AS n FROM {table}")
+        counts[table] = cur.fetchone()['n']
+
+    cur.execute("""
+        SELECT c.id, c.property_name
+        FROM customers c
+        WHERE c.deleted_at IS NULL AND c.status = 'Active'
+          AND EXISTS (SELECT 1 FROM service_locations sl
+                      WHERE sl.customer_id = c.id AND sl.deleted_at IS NULL)
+        ORDER BY c.id
+    """)
+    customers = cur.fetchall()
+    step      = max(1, len(customers) // FIXTURES)
+    customers = customers[::step][:FIXTURES]
+
+    cur.execute("""
+        SELECT customer_id, service_location_id, work_site_label
+        FROM work_orders
+        WHERE deleted_at IS NULL AND work_site_label IS NOT NULL
+        ORDER BY start_date DESC, id DESC
+        LIMIT %s
+    """, (FIXTURES,))
+    sites = cur.fetchall()
+
+    cur.execute("""
+        SELECT id FROM invoices
+        WHERE deleted_at IS NULL AND state = 'Live'
+        ORDER BY id LIMIT %s
+    """, (FIXTURES,))
+    invoices = [r['id'] for r in cur.fetchall()]
+
+    cur.execute("""
+        SELECT id FROM catalog_items
+        WHERE deleted_at IS NULL AND is_active AND billing_behavior = 'standard'
+          AND NOT is_catch_all
+        ORDER BY sort_order, id LIMIT 1
+    """)
+    catalog = cur.fetchone()
+    cur.close(); conn.close()
+
+    # Search terms: the last word and a 3-letter fragment of each name.
+    terms = []
+    for c in customers:
+        word = c['property_name'].replace(',', ' ').split()
+        terms.append(word[-1] if word else 'a')
+        terms.append(c['property_name'][1:4])
+    return {
+        'counts':    counts,
+        'customers': [c['id'] for c in customers],
+        'terms':     terms,
+        'sites':     sites,
+        'invoices':  invoices,
+        'catalog':   catalog['id'] if catalog else None,
+    }
+
+
+def build_request(name, company_key, fx, i):
+    """(method, path, form) for the i-th request of an HTTP scenario."""
+    base = f'/{company_key}'
+    if name == 'customers_search':
+        term = fx['terms'][i % len(fx['terms'])]
+        return 'GET', f"{base}/customers/search?{urllib.parse.urlencode({'search': term})}", None
+    if name == 'workorders_search':
+        term = fx['terms'][i % len(fx['terms'])]
+        return 'GET', f"{base}/workorders/search?{urllib.parse.urlencode({'search': term})}", None
+    if name == 'workorder_customer_context':
+        return 'GET', f"{base}/workorders/customer/{fx['customers'][i % len(fx['customers'])]}/context", None
+    if name == 'workorder_dupe_check':
+        site = fx['sites'][i % len(fx['sites'])]
+        query = {'customer_id': site['customer_id'], 'site': site['work_site_label']}
+        if site['service_location_id']:
+            query['service_location_id'] = site['service_location_id']
+        return 'GET', f"{base}/workorders/dupe_check?{urllib.parse.urlencode(query)}", None
+    if name == 'workorder_new':
+        return 'POST', f'{base}/workorders/new', {
+            'customer_id':     fx['customers'][i % len(fx['customers'])],
+            'status':          'Scheduled',
+            'priority':        'Normal',
+            'start_date':      date.today().isoformat(),
+            'work_site_label': f'bench {i}',
+            'line_items_json': json.dumps([{'kind': 'std', 'catalog_item_id': fx['catalog'],
+                                            'quantity': 1, 'unit_price': 1}]),
+        }
+    if name == 'billing':
+        return 'GET', f'{base}/billing', None
+    raise ValueError(name)
+
+
+# ============================================================================
+# Running
+# ============================================================================
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[k]
+
+
+def run_http(name, company_key, fx, clients, n, warmup):
+    """Latencies (ms) and failures for n requests spread over the clients."""
+    def one(i):
+        client = clients[i % len(clients)]
+        method, path, form = build_request(name, company_key, fx, i)
+        started = time.perf_counter()
+        status, _ = client.request(method, path, form)
+        elapsed = (time.perf_counter() - started) * 1000
+        ok = status == 302 if name == 'workorder_new' else status == 200
+        return elapsed, ok, status
+
+    with ThreadPoolExecutor(max_workers=len(clients)) as pool:
+        list(pool.map(one, range(warmup)))
+        before = read_query_totals(clients[0], company_key)
+        wall   = time.perf_counter()
+        results = list(pool.map(one, range(warmup, warmup + n)))
+        wall   = time.perf_counter() - wall
+    after = read_query_totals(clients[0], company_key)
+
+    queries = None
+    if before is not None and after is not None:
+        s0, c0 = before.get(name, (0, 0))
+        s1, c1 = after.get(name, (0, 0))
+        if c1 > c0:
+            queries = (s1 - s0) / (c1 - c0)
+    return results, wall, queries
+
+
+def run_transition(company_key, fx, clients, n, warmup, username):
+    """transition_invoice Live -> Hardened on each fixture invoice, rolled
+    back, timed in-process with the same cursor instrumentation as /metrics."""
+    counted = [0, 0]
+    lock    = threading.Lock()
+
+    def one(i):
+        invoice_id = fx['invoices'][i % len(fx['invoices'])]
+        with fieldkit.app.test_request_context():
+            g._query_stats = {'queries': 0, 'db_seconds': 0.0, 'rows': 0, 'connections': 0}
+            conn = fieldkit.get_db_connection(company_key)
+            cur  = conn.cursor()
+            started = time.perf_counter()
+            ok, _reason, _extra = fieldkit.transition_invoice(
+                cur, company_key, invoice_id, 'Hardened', username)
+            elapsed = (time.perf_counter() - started) * 1000
+            conn.rollback()
+            cur.close(); conn.close()
+            if i >= warmup:
+                with lock:
+                    counted[0] += g._query_stats['queries']
+                    counted[1] += 1
+        return elapsed, ok, 'ok' if ok else 'rejected'
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(one, range(warmup)))
+        wall    = time.perf_counter()
+        results = list(pool.map(one, range(warmup, warmup + n)))
+        wall    = time.perf_counter() - wall
+    return results, wall, counted[0] / counted[1] if counted[1] else None
+
+
+def summarize(results, wall, queries):
+    latencies = sorted(r[0] for r in results)
+    failed    = [r[2] for r in results if not r[1]]
+    return {
+        'requests':            len(results),
+        'errors':              len(failed),
+        'error_statuses':      sorted({str(s) for s in failed}),
+        'p50_ms':              round(percentile(latencies, 50), 2),
+        'p95_ms':              round(percentile(latencies, 95), 2),
+        'p99_ms':              round(percentile(latencies, 99), 2),
+        'throughput_rps':      round(len(results) / wall, 1) if wall else None,
+        'queries_per_request': round(queries, 2) if queries is not None else None,
+    }
+
+
+def compare(current, baseline, tolerance):
+    """Print per-scenario deltas; returns the list of regressions."""
+    regressions = []
+    if baseline.get('dataset') != current['dataset']:
+        print("\n  NOTE: dataset differs from the baseline's; comparison is indicative only.")
+    print(f"\n  {'vs baseline':28} {'p95 ms':>18} {'queries/req':>18}")
+    for name, now in current['scenarios'].items():
+        then = baseline.get('scenarios', {}).get(name)
+        if not then:
+            continue
+        p95_delta = now['p95_ms'] - then['p95_ms']
+        slower    = now['p95_ms'] > then['p95_ms'] * (1 + tolerance) and p95_delta > 2
+        q_now, q_then = now['queries_per_request'], then['queries_per_request']
+        more_queries  = q_now is not None and q_then is not None and q_now > q_then + 0.5
+        print(f"  {name:28} {then['p95_ms']:>8.1f} -> {now['p95_ms']:<8.1f}"
+              f" {q_then if q_then is not None else '-':>8} -> {q_now if q_now is not None else '-':<8}"
+              + ('  SLOWER' if slower else '') + ('  MORE QUERIES' if more_queries else ''))
+        if slower or more_queries:
+            regressions.append(name)
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+                              ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def cleanup(company_key, username, since):
+    """Hard-delete the work orders username created since the run started."""
+    conn = fieldkit.get_db_connection(company_key)
+    cur  = conn.cursor()
+    cur.execute("SELECT id FROM work_orders WHERE created_by = %s AND created_at >= %s",
+                (username, since))
+    ids = [r['id'] for r in cur.fetchall()]
+    if ids:
+        for table in ('work_order_line_items', 'work_order_status_history', 'work_order_techs'):
+            cur.execute(f"DELETE FROM {table} WHERE work_order_id = ANY(%s)", (ids,))
+        cur.execute("DELETE FROM work_orders WHERE id = ANY(%s)", (ids,))
+        conn.commit()
+    cur.close(); conn.close()
+    return len(ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('company_key', choices=sorted(fieldkit.DB_CONFIG))
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--base-url', help='benchmark a running server instead of serving in-process')
+    parser.add_argument('--clients', type=int, default=8, help='concurrent clients (default 8)')
+    parser.add_argument('-n', type=int, default=200, help='timed requests per scenario (default 200)')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument('--save-baseline', metavar='PATH')
+    parser.add_argument('--compare', metavar='PATH')
+    parser.add_argument('--tolerance', type=float, default=0.20,
+                        help='allowed p95 slowdown vs baseline (default 0.20 = 20%%)')
+    parser.add_argument('--keep', action='store_true',
+                        help="keep the work orders workorder_new created (default: hard-delete them)")
+    args = parser.parse_args()
+
+    password = os.environ.get('BENCH_PASSWORD') or getpass.getpass(f"Password for {args.username}: ")
+
+    print("=" * 60)
+    print("FieldKit: Hot Route Benchmark")
+    print("=" * 60)
+
+    server, base_url = (None, args.base_url.rstrip('/')) if args.base_url else serve_in_process()
+    fx = load_fixtures(args.company_key)
+    print(f"Company: {args.company_key}   clients: {args.clients}   requests/scenario: {args.n}"
+          f"   target: {base_url}")
+    print(f"Dataset: " + ', '.join(f'{k} {v:,}' for k, v in fx['counts'].items()))
+
+    clients = [Client(base_url, args.username, password) for _ in range(args.clients)]
+    since   = datetime.now()
+    result  = {
+        'created':   since.isoformat(timespec='seconds'),
+        'commit':    git_commit(),
+        'company':   args.company_key,
+        'clients':   args.clients,
+        'dataset':   fx['counts'],
+        'scenarios': {},
+    }
+
+    print(f"\n  {'scenario':28} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>8} {'q/req':>7} {'err':>5}")
+    try:
+        for name in args.scenarios:
+            if name == 'transition_invoice' and not fx['invoices']:
+                print(f"  {name:28} skipped: no Live invoices in the dataset")
+                continue
+            if name == 'workorder_new' and not fx['catalog']:
+                print(f"  {name:28} skipped: no standard catalog item")
+                continue
+            if name == 'transition_invoice':
+                runs = run_transition(args.company_key, fx, args.clients, args.n, args.warmup,
+                                      args.username)
+            else:
+                runs = run_http(name, args.company_key, fx, clients, args.n, args.warmup)
+            s = result['scenarios'][name] = summarize(*runs)
+            q = f"{s['queries_per_request']:.1f}" if s['queries_per_request'] is not None else '-'
+            print(f"  {name:28} {s['p50_ms']:>8.1f} {s['p95_ms']:>8.1f} {s['p99_ms']:>8.1f} "
+                  f"{s['throughput_rps']:>8.1f} {q:>7} {s['errors']:>5}"
+                  + (f"   ({', '.join(s['error_statuses'])})" if s['errors'] else ''))
+    finally:
+        if not args.keep:
+            print(f"\n  Cleaned up {cleanup(args.company_key, args.username, since)} "
+                  "benchmark work orders.")
+
+    if server is not None:
+        server.shutdown()
+
+    failed = [n for n, s in result['scenarios'].items() if s['errors']]
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, 'w') as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"\n  Baseline written to {args.save_baseline}")
+
+    passed = not failed and not regressions
+    print(f"\n  {'PASS' if passed else 'FAIL'}"
+          + (f"  errors in: {', '.join(failed)}" if failed else '')
+          + (f"  regressed: {', '.join(regressions)}" if regressions else ''))
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
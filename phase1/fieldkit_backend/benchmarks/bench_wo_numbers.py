@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+FieldKit: Work Order Number Allocation — Concurrency Benchmark
+Created: 2026-10-17
+Purpose: Fire N work order creations at once through the real POST
+/<company>/workorders/new path and check that number allocation
+(number_sequences, migration 013) neither collides nor stalls.
+
+Passes when every request saves, all N work order numbers are distinct and
+consecutive, and p95 latency stays under --max-p95-ms.
+
+Run against a DEV database only — it creates real work orders. --cleanup
+hard-deletes them afterwards (the sequence keeps its advanced value).
+
+Usage:
+    python3 benchmarks/bench_wo_numbers.py getagrip --customer-id 12 --catalog-item-id 3
+    python3 benchmarks/bench_wo_numbers.py getagrip --customer-id 12 --catalog-item-id 3 -n 50 --cleanup
+
+Reads DB_* settings from the environment, same as app.py.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import app as fieldkit  # noqa: E402
+
+BENCH_USER = 'bench_wo_numbers'
+
+
+def create_one(company_key, form, results, idx, start_gate):
+    client = fieldkit.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id']        = 0
+        sess['username']       = BENCH_USER
+        sess['user_role']      = 'admin'
+        sess['company_access'] = [company_key]
+    start_gate.wait()
+    started = time.perf_counter()
+    resp = client.post(f'/{company_key}/workorders/new', data=form)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    ok = resp.status_code == 302 and resp.headers.get('Location', '').endswith('/workorders')
+    results[idx] = (ok, elapsed_ms, resp.status_code)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('company_key', choices=sorted(fieldkit.DB_CONFIG))
+    parser.add_argument('--customer-id', type=int, required=True)
+    parser.add_argument('--catalog-item-id', type=int, required=True,
+                        help='a standard (non-equipment) catalog item')
+    parser.add_argument('-n', type=int, default=20, help='parallel creations (default 20)')
+    parser.add_argument('--max-p95-ms', type=float, default=1000.0)
+    parser.add_argument('--cleanup', action='store_true')
+    args = parser.parse_args()
+
+    form = {
+        'customer_id':     args.customer_id,
+        'status':          'Scheduled',
+        'priority':        'Normal',
+        'start_date':      date.today().isoformat(),
+        'work_site_label': 'bench',
+        'line_items_json': json.dumps([{'kind': 'std', 'catalog_item_id': args.catalog_item_id,
+                                        'quantity': 1, 'unit_price': 1}]),
+    }
+
+    print("=" * 60)
+    print("FieldKit: Work Order Number Allocation Benchmark")
+    print("=" * 60)
+    print(f"Company: {args.company_key}   parallel creations: {args.n}   "
+          f"pool max: {fieldkit.DB_POOL_MAX}")
+
+    since      = datetime.now()
+    results    = [None] * args.n
+    start_gate = threading.Barrier(args.n)
+    threads    = [threading.Thread(target=create_one,
+                                   args=(args.company_key, form, results, i, start_gate))
+                  for i in range(args.n)]
+    wall = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall_ms = (time.perf_counter() - wall) * 1000
+
+    conn = fieldkit.get_db_connection(args.company_key)
+    cur  = conn.cursor()
+    cur.execute("""
+        SELECT id, work_order_number FROM work_orders
+        WHERE created_by = %s AND created_at >= %s
+        ORDER BY id
+    """, (BENCH_USER, since))
+    rows    = cur.fetchall()
+    numbers = [r['work_order_number'] for r in rows]
+    seqs    = sorted(int(n.rsplit('-', 1)[1]) for n in numbers)
+
+    latencies = sorted(r[1] for r in results)
+    p95       = latencies[max(0, int(round(0.95 * len(latencies))) - 1)]
+    failed    = [r for r in results if not r[0]]
+    distinct  = len(set(numbers)) == len(numbers)
+    gapless   = seqs == list(range(seqs[0], seqs[0] + len(seqs))) if seqs else False
+
+    print(f"\n  Requests ok:        {args.n - len(failed)} / {args.n}"
+          + (f"   (statuses: {sorted({r[2] for r in failed})})" if failed else ''))
+    print(f"  Work orders saved:  {len(numbers)}")
+    print(f"  Distinct numbers:   {'yes' if distinct else 'NO — COLLISION'}")
+    print(f"  Consecutive:        {'yes' if gapless else 'no'}"
+          + (f"   ({numbers[0]} .. {numbers[-1]})" if numbers else ''))
+    print(f"  Latency ms:         p50 {statistics.median(latencies):.1f}   "
+          f"p95 {p95:.1f}   max {latencies[-1]:.1f}")
+    print(f"  Wall time ms:       {wall_ms:.1f}")
+
+    if args.cleanup and rows:
+        ids = [r['id'] for r in rows]
+        for table in ('work_order_line_items', 'work_order_status_history', 'work_order_techs'):
+            cur.execute(f"DELETE FROM {table} WHERE work_order_id = ANY(%s)", (ids,))
+        cur.execute("DELETE FROM work_orders WHERE id = ANY(%s)", (ids,))
+        conn.commit()
+        print(f"\n  Cleaned up {len(ids)} benchmark work orders.")
+    cur.close(); conn.close()
+
+    passed = not failed and len(numbers) == args.n and distinct and gapless and p95 <= args.max_p95_ms
+    print(f"\n  {'PASS' if passed else 'FAIL'}  (p95 bound {args.max_p95_ms:g} ms)")
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
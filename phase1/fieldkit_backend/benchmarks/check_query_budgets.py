@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+FieldKit: Query Budget Check
+Created: 2026-10-17
+Purpose: Fail when a change makes a route run more SQL statements, or check
+out more database connections, than its budget allows -- the way an N+1
+(a lookup per line, an UPDATE per row, a connection per customer) creeps in.
+
+Budgets live in benchmarks/query_budgets.json: one check per route and
+method, with the path to request (placeholders are filled from the
+dataset), the expected status, and the most queries and connections one
+request may use. Every route in the app must have a check or a "skip" entry
+with its reason, so a new route can't slip in unbudgeted.
+
+Each request is served in-process through the Flask test client, as an
+admin with access to every company, and measured with
+app.capture_request_stats() -- the same cursor instrumentation /metrics
+uses. Every check starts with the app's in-process caches emptied, and GET
+checks run twice (cold caches, then warm); the worse run is held to the
+budget, so it doesn't depend on which checks ran before. Fixtures are the
+richest rows in the dataset (the work order and invoice with the most
+lines, the customer with the most locations and contacts), so a per-row
+query shows up as a count far over budget rather than one over.
+
+Run against a local database loaded with
+phase1/fieldkit_phase1/generate_dataset.py. The POST checks create one
+work order, edit it and delete it; it is hard-deleted at the end.
+Exits 1 on any failure. After a deliberate change, --update writes the
+measured counts back into the manifest for review.
+
+Usage:
+    python3 benchmarks/check_query_budgets.py kleanit_charlotte
+    python3 benchmarks/check_query_budgets.py getagrip --routes workorder_detail workorder_edit
+    python3 benchmarks/check_query_budgets.py kleanit_charlotte --update
+
+Reads DB_* settings from the environment, same as app.py.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import string
+import sys
+import tempfile
+import urllib.parse
+from datetime import date, datetime, timedelta
+
+# Keep invoice renders out of the real cache directory.
+RENDER_CACHE_DIR = tempfile.mkdtemp(prefix='fieldkit-budgets-')
+os.environ.setdefault('INVOICE_RENDER_CACHE_DIR', RENDER_CACHE_DIR)
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import app as fieldkit  # noqa: E402
+
+BUDGET_USER      = 'query_budget_check'
+DEFAULT_MANIFEST = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'query_budgets.json')
+
+
+# ============================================================================
+# Fixtures
+# ============================================================================
+
+def load_fixtures(company_key):
+    """Placeholder values for the manifest paths. A placeholder the dataset
+    can't fill is left out, and checks that need it are skipped."""
+    conn = fieldkit.get_db_connection(company_key)
+    cur  = conn.cursor()
+    fx   = {'company': company_key}
+
+    cur.execute("""
+        SELECT c.id, c.property_name,
+               (SELECT MIN(id) FROM service_locations sl
+                WHERE sl.customer_id = c.id AND sl.deleted_at IS NULL) AS location,
+               (SELECT MIN(id) FROM customer_contacts ct
+                WHERE ct.customer_id = c.id AND ct.deleted_at IS NULL) AS contact
+        FROM customers c
+        JOIN (SELECT customer_id, COUNT(*) AS n FROM (
+                  SELECT customer_id FROM service_locations WHERE deleted_at IS NULL
+                  UNION ALL
+                  SELECT customer_id FROM customer_contacts WHERE deleted_at IS NULL) x
+              GROUP BY customer_id) k ON k.customer_id = c.id
+        WHERE c.deleted_at IS NULL AND c.status = 'Active'
+        ORDER BY k.n DESC, c.id
+        LIMIT 1
+    """)
+    row = cur.fetchone()
+    if row:
+        fx['customer'] = row['id']
+        words = row['property_name'].replace(',', ' ').split()
+        fx['term'] = words[-1] if words else row['property_name']
+        if row['location']:
+            fx['location'] = row['location']
+        if row['contact']:
+            fx['contact'] = row['contact']
+
+    cur.execute("""
+        SELECT li.work_order_id AS id
+        FROM work_order_line_items li
+        JOIN work_orders wo ON wo.id = li.work_order_id
+        WHERE li.deleted_at IS NULL AND wo.deleted_at IS NULL
+        GROUP BY li.work_order_id
+        ORDER BY COUNT(*) DESC, li.work_order_id
+        LIMIT 1
+    """)
+    row = cur.fetchone()
+    if row:
+        fx['work_order'] = row['id']
+
+    cur.execute("""
+        SELECT customer_id, service_location_id, work_site_label
+        FROM work_orders
+        WHERE deleted_at IS NULL AND work_site_label IS NOT NULL
+          AND service_location_id IS NOT NULL
+        ORDER BY start_date DESC NULLS LAST, id DESC
+        LIMIT 1
+    """)
+    row = cur.fetchone()
+    if row:
+        fx['site_customer'] = row['customer_id']
+        fx['site_location'] = row['service_location_id']
+        fx['site']          = row['work_site_label']
+
+    cur.execute("""
+        SELECT li.invoice_id AS id
+        FROM invoice_line_items li
+        JOIN invoices i ON i.id = li.invoice_id
+        WHERE li.deleted_at IS NULL AND i.deleted_at IS NULL
+        GROUP BY li.invoice_id
+        ORDER BY COUNT(*) DESC, li.invoice_id
+        LIMIT 1
+    """)
+    row = cur.fetchone()
+    if row:
+        fx['invoice'] = row['id']
+    cur.execute("SELECT id FROM invoices WHERE deleted_at IS NULL ORDER BY id LIMIT 50")
+    ids = [str(r['id']) for r in cur.fetchall()]
+    if ids:
+        fx['invoices'] = ','.join(ids)
+
+    cur.execute("""
+        SELECT id, unit_price FROM catalog_items
+        WHERE deleted_at IS NULL AND is_active AND billing_behavior = 'standard'
+          AND NOT is_catch_all
+        ORDER BY sort_order, id LIMIT 3
+    """)
+    fx['_catalog'] = [dict(r) for r in cur.fetchall()]
+    if fx['_catalog']:
+        fx['catalog_item'] = fx['_catalog'][0]['id']
+
+    cur.execute("""
+        SELECT eu.id FROM equipment_units eu
+        JOIN catalog_items ci ON ci.id = eu.catalog_item_id
+        WHERE eu.deleted_at IS NULL AND eu.is_active
+          AND ci.deleted_at IS NULL AND ci.billing_behavior = 'per_day_equipment'
+        ORDER BY eu.id LIMIT 2
+    """)
+    fx['_equipment'] = [r['id'] for r in cur.fetchall()]
+    if fx['_equipment']:
+        fx['equipment_unit'] = fx['_equipment'][0]
+
+    cur.execute("""
+        SELECT username FROM users
+        WHERE role = 'technician' AND is_active
+        ORDER BY username LIMIT 2
+    """)
+    fx['_techs'] = [r['username'] for r in cur.fetchall()]
+    cur.close(); conn.close()
+
+    conn = fieldkit.get_db_connection('getagrip')
+    cur  = conn.cursor()
+    cur.execute("SELECT MIN(id) AS id FROM users")
+    row = cur.fetchone()
+    if row and row['id'] is not None:
+        fx['user'] = row['id']
+    cur.close(); conn.close()
+    return fx
+
+
+def find_created_work_order(company_key, since):
+    """The work order the new_work_order check saved, with its line ids."""
+    conn = fieldkit.get_db_connection(company_key)
+    cur  = conn.cursor()
+    cur.execute("""
+        SELECT id FROM work_orders
+        WHERE created_by = %s AND created_at >= %s
+        ORDER BY id DESC LIMIT 1
+    """, (BUDGET_USER, since))
+    row = cur.fetchone()
+    lines = []
+    if row:
+        cur.execute("""
+            SELECT id FROM work_order_line_items
+            WHERE work_order_id = %s AND deleted_at IS NULL
+            ORDER BY sort_order, id
+        """, (row['id'],))
+        lines = [r['id'] for r in cur.fetchall()]
+    cur.close(); conn.close()
+    return (row['id'] if row else None), lines
+
+
+def cleanup(company_key, since):
+    conn = fieldkit.get_db_connection(company_key)
+    cur  = conn.cursor()
+    cur.execute("SELECT id FROM work_orders WHERE created_by = %s AND created_at >= %s",
+                (BUDGET_USER, since))
+    ids = [r['id'] for r in cur.fetchall()]
+    if ids:
+        for table in ('work_order_line_items', 'work_order_status_history', 'work_order_techs'):
+            cur.execute(f"DELETE FROM {table} WHERE work_order_id = ANY(%s)", (ids,))
+        cur.execute("DELETE FROM work_orders WHERE id = ANY(%s)", (ids,))
+        conn.commit()
+    cur.close(); conn.close()
+    return len(ids)
+
+
+# ============================================================================
+# Request bodies
+# ============================================================================
+
+def _work_order_lines(fx):
+    today = date.today()
+    lines = [{'kind': 'std', 'catalog_item_id': c['id'], 'description': '',
+              'quantity': 2, 'unit_price': float(c['unit_price'] or 0)}
+             for c in fx['_catalog']]
+    lines += [{'kind': 'eq', 'equipment_unit_id': unit_id, 'description': '',
+               'deployed_at':  (today - timedelta(days=3)).isoformat(),
+               'retrieved_at': (today - timedelta(days=1)).isoformat()}
+              for unit_id in fx['_equipment']]
+    return lines
+
+
+def _work_order_form(fx, lines, status, techs):
+    return {
+        'customer_id':          fx['customer'],
+        'service_location_id':  fx.get('location', ''),
+        'primary_contact_id':   fx.get('contact', ''),
+        'status':               status,
+        'priority':             'Normal',
+        'work_site_label':      'Query budget check',
+        'start_date':           date.today().isoformat(),
+        'arrival_window_start': '8:30 AM',
+        'line_items_json':      json.dumps(lines),
+        'assigned_techs':       techs,
+    }
+
+
+def build_body(name, fx):
+    """Keyword arguments for the test client's open(), or None if the
+    dataset can't supply this body."""
+    if name == 'dupe_candidates':
+        if 'site' not in fx:
+            return None
+        candidate = {'customer_id': fx['site_customer'],
+                     'service_location_id': fx['site_location'], 'site': fx['site']}
+        return {'json': {'candidates': [candidate] * 25}}
+    if name == 'new_work_order':
+        if 'customer' not in fx or not fx['_catalog']:
+            return None
+        return {'data': _work_order_form(fx, _work_order_lines(fx), 'Scheduled', fx['_techs'])}
+    if name == 'edit_work_order':
+        if not fx.get('_new_lines'):
+            return None
+        # Change the first line, drop the last, add one; move the status and
+        # drop a tech, so every write the save can make is exercised.
+        lines = [dict(line, id=line_id)
+                 for line, line_id in zip(_work_order_lines(fx), fx['_new_lines'])]
+        lines[0]['quantity'] = 3
+        if len(lines) > 1:
+            lines.pop()
+        lines.append({'kind': 'std', 'catalog_item_id': fx['_catalog'][0]['id'],
+                      'description': '', 'quantity': 1,
+                      'unit_price': float(fx['_catalog'][0]['unit_price'] or 0)})
+        return {'data': _work_order_form(fx, lines, 'Completed', fx['_techs'][1:])}
+    raise ValueError(f'unknown body {name!r}')
+
+
+# ============================================================================
+# Checks
+# ============================================================================
+
+def fill_path(path, fx):
+    """path with its {placeholders} filled, or (None, missing) if the
+    fixtures lack one."""
+    names = [field for _, field, _, _ in string.Formatter().parse(path) if field]
+    missing = [n for n in names if n not in fx]
+    if missing:
+        return None, missing
+    return path.format(**{n: urllib.parse.quote(str(fx[n]), safe=',') for n in names}), []
+
+
+def measure(client, check, path, body):
+    """(status, stats) of one request, as an admin with every company."""
+    with client.session_transaction() as sess:
+        sess['user_id']        = 0
+        sess['username']       = BUDGET_USER
+        sess['full_name']      = 'Query Budget Check'
+        sess['user_role']      = 'admin'
+        sess['company_access'] = list(fieldkit.DB_CONFIG)
+    with fieldkit.capture_request_stats() as captured:
+        resp = client.open(path, method=check['method'], buffered=True, **(body or {}))
+        resp.close()
+    if not captured:
+        raise RuntimeError(f'{check["endpoint"]}: no request stats recorded')
+    return resp.status_code, captured[-1]
+
+
+def clear_caches():
+    """Empty every per-worker cache in the app, as in a freshly started worker."""
+    with fieldkit._company_stats_lock:
+        fieldkit._company_stats.clear()
+    for cache, lock in ((fieldkit._customer_views, fieldkit._customer_views_lock),
+                        (fieldkit._tax_rate_cache, fieldkit._tax_rate_cache_lock),
+                        (fieldkit._wo_form_cache,  fieldkit._wo_form_cache_lock)):
+        with lock:
+            cache.clear()
+    if fieldkit.INVOICE_RENDER_CACHE_DIR == RENDER_CACHE_DIR:   # never a real cache
+        shutil.rmtree(RENDER_CACHE_DIR, ignore_errors=True)
+
+
+def run_check(client, check, fx):
+    """Measure one check, from cold caches. Returns a result dict, or a skip
+    reason string."""
+    path, missing = fill_path(check['path'], fx)
+    if path is None:
+        return f"no {', '.join(missing)} in the dataset"
+    body = None
+    if check.get('body'):
+        body = build_body(check['body'], fx)
+        if body is None:
+            return f"dataset can't supply {check['body']}"
+    clear_caches()
+    runs = 2 if check['method'] == 'GET' else 1
+    statuses, queries, connections = [], 0, 0
+    for _ in range(runs):
+        status, stats = measure(client, check, path, body)
+        statuses.append(status)
+        queries     = max(queries, stats['queries'])
+        connections = max(connections, stats['connections'])
+    return {'statuses': statuses, 'queries': queries, 'connections': connections}
+
+
+def check_coverage(manifest):
+    """Routes with no check and no skip entry, and entries naming no route."""
+    endpoints = {rule.endpoint for rule in fieldkit.app.url_map.iter_rules()}
+    covered   = {c['endpoint'] for c in manifest['checks']} | set(manifest.get('skip', {}))
+    return sorted(endpoints - covered), sorted(covered - endpoints)
+
+
+def write_manifest(path, manifest):
+    """One check per line, so budget changes review as one-line diffs."""
+    checks = ',\n'.join('    ' + json.dumps(c) for c in manifest['checks'])
+    skip   = ',\n'.join(f'    {json.dumps(k)}: {json.dumps(v)}'
+                        for k, v in manifest.get('skip', {}).items())
+    with open(path, 'w') as f:
+        f.write('{\n  "checks": [\n' + checks + '\n  ],\n  "skip": {\n' + skip + '\n  }\n}\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('company_key', choices=sorted(fieldkit.DB_CONFIG))
+    parser.add_argument('--manifest', default=DEFAULT_MANIFEST)
+    parser.add_argument('--routes', nargs='+', metavar='ENDPOINT',
+                        help='only check these endpoints')
+    parser.add_argument('--update', action='store_true',
+                        help='write the measured counts back into the manifest as the new budgets')
+    args = parser.parse_args()
+
+    with open(args.manifest) as f:
+        manifest = json.load(f)
+
+    print("=" * 60)
+    print("FieldKit: Query Budget Check")
+    print("=" * 60)
+
+    failures = []
+    missing, stale = check_coverage(manifest)
+    for endpoint in missing:
+        failures.append(f"{endpoint}: route has no budget (add a check or a skip entry)")
+    for endpoint in stale:
+        failures.append(f"{endpoint}: in the manifest but no such route")
+
+    fx     = load_fixtures(args.company_key)
+    client = fieldkit.app.test_client()
+    since  = datetime.now()
+    print(f"Company: {args.company_key}   manifest: {os.path.relpath(args.manifest)}")
+    print(f"\n  {'route':34} {'method':6} {'queries':>9} {'conns':>7}  result")
+    try:
+        for check in manifest['checks']:
+            if args.routes and check['endpoint'] not in args.routes:
+                continue
+            label  = f"  {check['endpoint']:34} {check['method']:6}"
+            result = run_check(client, check, fx)
+            if check.get('body') == 'new_work_order' and isinstance(result, dict):
+                fx['new_work_order'], fx['_new_lines'] = \
+                    find_created_work_order(args.company_key, since)
+                if fx['new_work_order'] is None:
+                    del fx['new_work_order']
+            if isinstance(result, str):
+                print(f"{label} {'-':>9} {'-':>7}  skipped: {result}")
+                continue
+
+            expected = check.get('status', 200)
+            problems = []
+            bad_status = [s for s in result['statuses'] if s != expected]
+            if bad_status:
+                problems.append(f"status {bad_status[0]}, expected {expected}")
+            elif args.update:
+                check['queries']     = result['queries']
+                check['connections'] = result['connections']
+            if result['queries'] > check['queries']:
+                problems.append(f"{result['queries']} queries, budget {check['queries']}")
+            if result['connections'] > check['connections']:
+                problems.append(f"{result['connections']} connections, "
+                                f"budget {check['connections']}")
+            for problem in problems:
+                failures.append(f"{check['endpoint']} {check['method']}: {problem}")
+            print(f"{label} {result['queries']:>4} / {check['queries']:<2} "
+                  f"{result['connections']:>2} / {check['connections']:<2}  "
+                  + ('; '.join(problems) if problems else 'ok'))
+    finally:
+        removed = cleanup(args.company_key, since)
+        if removed:
+            print(f"\n  Cleaned up {removed} work order(s).")
+
+    if args.update:
+        write_manifest(args.manifest, manifest)
+        print(f"\nBudgets written to {args.manifest}; review the diff before committing.")
+
+    print()
+    if failures:
+        print(f"FAIL: {len(failures)} problem(s)")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("PASS: every checked route is within budget")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+FieldKit: Work Order Totals Backfill
+Created: 2026-10-17
+Purpose: Populate the denormalized line-item aggregates added by migration
+011 (line_subtotal, line_count, accruing_count, earliest_open_deployment)
+for every existing work order, in all four company databases.
+
+The app keeps these columns current on every save; this is only needed once
+after the migration, or to repair drift. Recomputes from the line items, so
+re-running is harmless.
+
+Usage:
+  Dry run (default — reports how many rows are out of date, no writes):
+    docker exec -it fieldkit-prod-app-1 python3 /app/phase1/fieldkit_phase1/backfill_wo_totals.py
+
+  Real backfill:
+    docker exec -it fieldkit-prod-app-1 python3 /app/phase1/fieldkit_phase1/backfill_wo_totals.py --commit
+"""
+
+import sys
+import getpass
+import psycopg2
+
+DATABASES = [
+    'fieldkit_getagrip',
+    'fieldkit_kleanit_charlotte',
+    'fieldkit_cts',
+    'fieldkit_kleanit_sf',
+]
+DB_HOST = 'db'
+DB_PORT = 5432
+DB_USER = 'fieldkit'
+
+# Same aggregate as _refresh_wo_totals in fieldkit_backend/app.py.
+AGGREGATES = """
+    SELECT wo.id AS work_order_id,
+           COALESCE(SUM(li.total), 0)                              AS line_subtotal,
+           COUNT(li.id)                                            AS line_count,
+           COUNT(li.id) FILTER (WHERE li.equipment_unit_id IS NOT NULL
+                                  AND li.retrieved_at IS NULL)     AS accruing_count,
+           MIN(li.deployed_at) FILTER (WHERE li.equipment_unit_id IS NOT NULL
+                                         AND li.retrieved_at IS NULL) AS earliest_open_deployment
+    FROM work_orders wo
+    LEFT JOIN work_order_line_items li
+           ON li.work_order_id = wo.id AND li.deleted_at IS NULL
+    GROUP BY wo.id
+"""
+
+STALE = """
+    FROM work_orders wo JOIN ({aggregates}) agg ON agg.work_order_id = wo.id
+    WHERE (wo.line_subtotal, wo.line_count, wo.accruing_count, wo.earliest_open_deployment)
+          IS DISTINCT FROM
+          (agg.line_subtotal, agg.line_count, agg.accruing_count, agg.earliest_open_deployment)
+""".format(aggregates=AGGREGATES)
+
+
+def backfill(db_name, password, commit):
+    conn = psycopg2.connect(dbname=db_name, user=DB_USER, password=password,
+                            host=DB_HOST, port=DB_PORT)
+    cursor = conn.cursor()
+    try:
+        if commit:
+            cursor.execute(f"""
+                UPDATE work_orders wo
+                SET line_subtotal            = agg.line_subtotal,
+                    line_count               = agg.line_count,
+                    accruing_count           = agg.accruing_count,
+                    earliest_open_deployment = agg.earliest_open_deployment
+                FROM ({AGGREGATES}) agg
+                WHERE agg.work_order_id = wo.id
+                  AND (wo.line_subtotal, wo.line_count, wo.accruing_count, wo.earliest_open_deployment)
+                      IS DISTINCT FROM
+                      (agg.line_subtotal, agg.line_count, agg.accruing_count, agg.earliest_open_deployment)
+            """)
+            changed = cursor.rowcount
+            conn.commit()
+        else:
+            cursor.execute(f"SELECT COUNT(*) {STALE}")
+            changed = cursor.fetchone()[0]
+        return changed
+    finally:
+        cursor.close(); conn.close()
+
+
+def main():
+    commit = '--commit' in sys.argv
+
+    print("=" * 60)
+    print("FieldKit: Work Order Totals Backfill")
+    print("=" * 60)
+    print(f"Mode: {'COMMIT (writes to database)' if commit else 'DRY RUN (no writes)'}")
+
+    password = getpass.getpass(f"\nPostgreSQL password for user '{DB_USER}': ")
+
+    failed = 0
+    for db_name in DATABASES:
+        try:
+            changed = backfill(db_name, password, commit)
+        except psycopg2.Error as e:
+            print(f"  {db_name:30} ERROR: {e}")
+            failed += 1
+            continue
+        verb = 'updated' if commit else 'out of date'
+        print(f"  {db_name:30} {changed} work orders {verb}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
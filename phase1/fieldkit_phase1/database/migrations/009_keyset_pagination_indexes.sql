@@ -0,0 +1,20 @@
+-- FieldKit Migration 009
+-- Adds: composite indexes behind keyset (cursor) pagination on the customer
+--       and work order lists.
+-- Run on: ALL FOUR databases
+-- Date: 2026-10-17
+--
+-- Notes:
+--   * The customer list pages on (property_name, id); the work order list on
+--     (start_date DESC NULLS LAST, id DESC). With these indexes each page is an
+--     index range scan starting at the cursor, so page 400 costs the same as
+--     page 1 (LIMIT/OFFSET had to walk and discard every earlier row).
+--   * The id tiebreaker makes the order total: duplicate property names or
+--     start dates can no longer repeat or skip rows across a page boundary.
+--   * Partial on deleted_at IS NULL like every other list index.
+
+CREATE INDEX IF NOT EXISTS idx_customers_name_id
+    ON customers(property_name, id) WHERE deleted_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_wo_start_date_id
+    ON work_orders(start_date DESC NULLS LAST, id DESC) WHERE deleted_at IS NULL;
@@ -0,0 +1,18 @@
+-- FieldKit Migration 010
+-- Adds: pg_trgm trigram index on customers.property_name for live search.
+-- Run on: ALL FOUR databases
+-- Date: 2026-10-17
+--
+-- Notes:
+--   * customers_search filters with property_name ILIKE '%term%'. Neither the
+--     btree on property_name nor the to_tsvector GIN index (02_customers.sql)
+--     can serve a leading wildcard, so every keystroke was a sequential scan.
+--     A gin_trgm_ops index answers ILIKE '%term%' directly for terms of three
+--     characters or more, and provides similarity() for ranking.
+--   * CREATE EXTENSION needs a superuser (or the database owner on PG 13+ --
+--     pg_trgm is a trusted extension). pg_trgm ships with PostgreSQL contrib.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_customers_name_trgm
+    ON customers USING gin (property_name gin_trgm_ops) WHERE deleted_at IS NULL;
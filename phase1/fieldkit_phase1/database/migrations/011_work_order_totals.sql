@@ -0,0 +1,31 @@
+-- FieldKit Migration 011
+-- Adds: denormalized line-item aggregates on work_orders.
+-- Run on: ALL FOUR databases
+-- Date: 2026-10-17
+--
+-- Notes:
+--   * The work order list and its live search used to run two correlated
+--     subqueries over work_order_line_items per row, on every render and every
+--     keystroke. These columns hold the same numbers so the list reads
+--     work_orders alone.
+--   * Maintained by the app: _save_work_order refreshes them in the same
+--     transaction that writes the lines (_refresh_wo_totals). Anything else
+--     that writes line items must do the same.
+--   * Existing rows: run fieldkit_phase1/backfill_wo_totals.py --commit once
+--     after applying this migration. It is safe to re-run at any time.
+--   * Aggregates cover live lines only (deleted_at IS NULL). line_subtotal
+--     sums total, which is NULL on accruing equipment lines, so it is the
+--     "finalized so far" figure the list always showed.
+
+ALTER TABLE work_orders
+    ADD COLUMN IF NOT EXISTS line_subtotal            NUMERIC(12,2) NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS line_count               INTEGER       NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS accruing_count           INTEGER       NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS earliest_open_deployment DATE;
+
+COMMENT ON COLUMN work_orders.line_subtotal IS
+    'SUM(total) of live line items. Maintained by the app; see migration 011.';
+COMMENT ON COLUMN work_orders.accruing_count IS
+    'Live equipment lines still deployed (retrieved_at IS NULL).';
+COMMENT ON COLUMN work_orders.earliest_open_deployment IS
+    'MIN(deployed_at) over the accruing equipment lines; NULL when none.';
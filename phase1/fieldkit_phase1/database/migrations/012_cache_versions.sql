@@ -0,0 +1,21 @@
+-- FieldKit Migration 012
+-- Adds: cache_versions -- named version counters for app-side caches.
+-- Run on: ALL FOUR databases
+-- Date: 2026-10-17
+--
+-- Notes:
+--   * The work order form's reference data (standard catalog, equipment
+--     registry, technicians, active customers) is cached per company in each
+--     app worker and reused while the 'wo_form' version is unchanged. Every
+--     write to those tables bumps the counter in the same transaction, so all
+--     workers see the change on their next form open -- no TTL guessing.
+--   * Users are replicated to every database, so a user write bumps the
+--     counter in each one alongside the replicated row.
+
+CREATE TABLE IF NOT EXISTS cache_versions (
+    name    VARCHAR(50) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 1
+);
+
+INSERT INTO cache_versions (name) VALUES ('wo_form')
+ON CONFLICT (name) DO NOTHING;
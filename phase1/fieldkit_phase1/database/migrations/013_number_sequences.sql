@@ -0,0 +1,45 @@
+-- FieldKit Migration 013
+-- Adds: number_sequences -- per-(kind, prefix, year) counters behind work
+--       order and invoice numbers.
+-- Run on: ALL FOUR databases
+-- Date: 2026-10-17
+--
+-- Notes:
+--   * Numbers used to be derived by reading the latest GAG-2026-% row. That
+--     read grows with the year's volume, and two concurrent saves read the
+--     same value so one died on the UNIQUE constraint. The app now allocates
+--     with one INSERT ... ON CONFLICT DO UPDATE ... RETURNING on this table
+--     (_allocate_number): the counter row lock queues concurrent allocations
+--     instead of letting them collide, and a rolled-back save rolls its
+--     number back too, so sequences stay gapless.
+--   * Yearly reset: a new year is simply a new row starting at 1.
+--   * The seed below picks up where existing data left off. Invoice numbers
+--     only advance on originals (revision_number = 1), as before.
+
+CREATE TABLE IF NOT EXISTS number_sequences (
+    kind       VARCHAR(20) NOT NULL,       -- 'work_order' | 'invoice'
+    prefix     VARCHAR(10) NOT NULL,       -- GAG / KC / CTS / KSF
+    year       INTEGER     NOT NULL,
+    last_value INTEGER     NOT NULL,
+    PRIMARY KEY (kind, prefix, year)
+);
+
+INSERT INTO number_sequences (kind, prefix, year, last_value)
+SELECT 'work_order', split_part(work_order_number, '-', 1),
+       split_part(work_order_number, '-', 2)::int,
+       MAX(split_part(work_order_number, '-', 3)::int)
+FROM work_orders
+WHERE work_order_number ~ '^[A-Z]+-[0-9]{4}-[0-9]+$'
+GROUP BY 1, 2, 3
+ON CONFLICT (kind, prefix, year)
+    DO UPDATE SET last_value = GREATEST(number_sequences.last_value, EXCLUDED.last_value);
+
+INSERT INTO number_sequences (kind, prefix, year, last_value)
+SELECT 'invoice', split_part(invoice_number, '-', 1),
+       split_part(invoice_number, '-', 2)::int,
+       MAX(split_part(invoice_number, '-', 3)::int)
+FROM invoices
+WHERE invoice_number ~ '^[A-Z]+-[0-9]{4}-[0-9]+$' AND revision_number = 1
+GROUP BY 1, 2, 3
+ON CONFLICT (kind, prefix, year)
+    DO UPDATE SET last_value = GREATEST(number_sequences.last_value, EXCLUDED.last_value);
@@ -0,0 +1,30 @@
+-- FieldKit Migration 014
+-- Adds: 'tax_rates' cache version, bumped by a trigger on tax_rates.
+-- Run on: ALL FOUR databases
+-- Date: 2026-10-17
+--
+-- Notes:
+--   * The app keeps each company's county rates in memory (get_tax_rates) and
+--     reloads them only when this version moves. Invoice tax is then one
+--     query for the line sums, which carries the version along with it.
+--   * Rates are maintained by hand in SQL, not through the app, so the bump
+--     is a statement-level trigger rather than an app-side call: any insert,
+--     update, delete or truncate on tax_rates invalidates every worker's copy
+--     on its next read, in the same transaction as the edit.
+--   * Hardened invoices are unaffected by rate edits either way -- the rate
+--     is pinned onto the invoice at harden (migration 007).
+
+INSERT INTO cache_versions (name) VALUES ('tax_rates')
+ON CONFLICT (name) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_tax_rates_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE cache_versions SET version = version + 1 WHERE name = 'tax_rates';
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tax_rates_bump_version ON tax_rates;
+CREATE TRIGGER tax_rates_bump_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON tax_rates
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_tax_rates_version();
@@ -0,0 +1,14 @@
+-- FieldKit Migration 015
+-- Adds: customers.view_version -- per-customer version stamp for the cached
+--       customer detail / work order customer-context views.
+-- Run on: ALL FOUR databases
+-- Date: 2026-10-17
+--
+-- Notes:
+--   * The app loads each view in one json_agg statement and caches it per
+--     customer in every worker. Customer, location, contact, note and custom
+--     field writes bump view_version in their own transaction
+--     (touch_customer_view), so every worker notices on its next read with a
+--     primary-key lookup instead of rebuilding the view.
+
+ALTER TABLE customers ADD COLUMN IF NOT EXISTS view_version INTEGER NOT NULL DEFAULT 1;
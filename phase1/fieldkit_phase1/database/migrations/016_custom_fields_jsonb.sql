@@ -0,0 +1,47 @@
+-- FieldKit Migration 016
+-- Adds: custom_fields JSONB on customers and service_locations (+ GIN
+--       indexes), converted from the customer_field_values EAV rows.
+-- Run on: ALL FOUR databases
+-- Date: 2026-10-17
+--
+-- Notes:
+--   * Used when the app runs with CUSTOM_FIELD_STORAGE=jsonb. Values are
+--     keyed by customer_field_definitions.id (as text), so renaming a field
+--     never touches data. Blank values are left out: "has a value" is key
+--     presence, which the GIN index answers directly (custom_fields ? '12').
+--   * Run this right before switching the app over. The conversion only
+--     fills rows whose custom_fields is still empty, so re-running it is
+--     harmless. customer_field_values is left in place (not dropped) so the
+--     switch can be reverted.
+--   * Location-scoped values (migration 003) go to service_locations, the
+--     rest to customers.
+
+ALTER TABLE customers
+    ADD COLUMN IF NOT EXISTS custom_fields JSONB NOT NULL DEFAULT '{}'::jsonb;
+ALTER TABLE service_locations
+    ADD COLUMN IF NOT EXISTS custom_fields JSONB NOT NULL DEFAULT '{}'::jsonb;
+
+UPDATE customers c
+SET custom_fields = v.fields
+FROM (
+    SELECT customer_id, jsonb_object_agg(field_definition_id::text, value) AS fields
+    FROM customer_field_values
+    WHERE location_id IS NULL AND COALESCE(value, '') <> ''
+    GROUP BY customer_id
+) v
+WHERE v.customer_id = c.id AND c.custom_fields = '{}'::jsonb;
+
+UPDATE service_locations sl
+SET custom_fields = v.fields
+FROM (
+    SELECT location_id, jsonb_object_agg(field_definition_id::text, value) AS fields
+    FROM customer_field_values
+    WHERE location_id IS NOT NULL AND COALESCE(value, '') <> ''
+    GROUP BY location_id
+) v
+WHERE v.location_id = sl.id AND sl.custom_fields = '{}'::jsonb;
+
+CREATE INDEX IF NOT EXISTS idx_customers_custom_fields
+    ON customers USING GIN (custom_fields) WHERE deleted_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_service_locations_custom_fields
+    ON service_locations USING GIN (custom_fields) WHERE deleted_at IS NULL;
@@ -0,0 +1,113 @@
+-- FieldKit Migration 017
+-- Adds: customer_billing_readiness -- per-customer billing contact summary,
+--       kept current by triggers on customer_contacts and customers.
+-- Run on: ALL FOUR databases
+-- Date: 2026-10-17
+--
+-- Notes:
+--   * The billing page used to aggregate every active customer's contacts
+--     (COUNT / STRING_AGG / MAX ... FILTER) on each load. The same figures now
+--     live here, one row per customer, so the page is a plain join.
+--   * A contact insert/update/delete recomputes just that customer's row
+--     (both customers if a contact is moved); a new customer gets a zero row.
+--     Customer columns (name, status, terms) are still read from customers.
+--   * Two transactions writing contacts of one customer would each compute
+--     the row from their own snapshot, missing the other's contact, and the
+--     later upsert would overwrite the earlier with stale figures. So
+--     refresh_billing_readiness first takes a transaction advisory lock per
+--     customer (ids in order), and computes in a second statement, which
+--     gets a fresh READ COMMITTED snapshot once the lock is granted. (A row
+--     lock on customers would deadlock against the KEY SHARE lock every
+--     contact insert takes through its foreign key.)
+--   * Emails and names are stored as ordered arrays (primary first, then by
+--     last name) so the page and the CSV export can join them with their own
+--     separators.
+--   * rebuild_billing_readiness() recomputes everything; the seed below calls
+--     it, and fieldkit_phase1/rebuild_billing_readiness.py runs it on demand.
+
+CREATE TABLE IF NOT EXISTS customer_billing_readiness (
+    customer_id            INTEGER PRIMARY KEY REFERENCES customers(id) ON DELETE CASCADE,
+    billing_contact_count  INTEGER NOT NULL DEFAULT 0,
+    billing_emails         TEXT[]  NOT NULL DEFAULT '{}',
+    billing_contact_names  TEXT[]  NOT NULL DEFAULT '{}',
+    primary_billing_name   TEXT,
+    updated_at             TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- The one definition of the figures, for any set of customers.
+CREATE OR REPLACE FUNCTION billing_readiness_rows(ids INTEGER[])
+RETURNS TABLE (customer_id INTEGER, billing_contact_count INTEGER,
+               billing_emails TEXT[], billing_contact_names TEXT[],
+               primary_billing_name TEXT) AS $$
+    SELECT c.id,
+           COUNT(cc.id)::int,
+           COALESCE(ARRAY_AGG(cc.office_email ORDER BY cc.is_primary DESC, cc.last_name ASC)
+                        FILTER (WHERE cc.office_email IS NOT NULL), '{}'),
+           COALESCE(ARRAY_AGG(cc.first_name || ' ' || cc.last_name
+                              ORDER BY cc.is_primary DESC, cc.last_name ASC)
+                        FILTER (WHERE cc.id IS NOT NULL), '{}'),
+           MAX(cc.first_name || ' ' || cc.last_name) FILTER (WHERE cc.is_primary = TRUE)
+    FROM customers c
+    LEFT JOIN customer_contacts cc
+           ON cc.customer_id = c.id
+          AND cc.accepts_billing = TRUE
+          AND cc.deleted_at IS NULL
+    WHERE ids IS NULL OR c.id = ANY(ids)
+    GROUP BY c.id
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION refresh_billing_readiness(ids INTEGER[]) RETURNS void AS $$
+    SELECT pg_advisory_xact_lock(hashtext('customer_billing_readiness'), id)
+    FROM (SELECT DISTINCT id FROM unnest(ids) AS id
+          WHERE id IS NOT NULL ORDER BY id) locked;
+    INSERT INTO customer_billing_readiness
+        (customer_id, billing_contact_count, billing_emails,
+         billing_contact_names, primary_billing_name)
+    SELECT * FROM billing_readiness_rows(ids)
+    ON CONFLICT (customer_id) DO UPDATE
+    SET billing_contact_count = EXCLUDED.billing_contact_count,
+        billing_emails        = EXCLUDED.billing_emails,
+        billing_contact_names = EXCLUDED.billing_contact_names,
+        primary_billing_name  = EXCLUDED.primary_billing_name,
+        updated_at            = CURRENT_TIMESTAMP;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION rebuild_billing_readiness() RETURNS integer AS $$
+    SELECT refresh_billing_readiness(NULL);
+    SELECT COUNT(*)::int FROM customer_billing_readiness;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION billing_readiness_contact_trigger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM refresh_billing_readiness(ARRAY[OLD.customer_id]);
+    ELSIF TG_OP = 'UPDATE' AND OLD.customer_id IS DISTINCT FROM NEW.customer_id THEN
+        PERFORM refresh_billing_readiness(ARRAY[OLD.customer_id, NEW.customer_id]);
+    ELSE
+        PERFORM refresh_billing_readiness(ARRAY[NEW.customer_id]);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION billing_readiness_customer_trigger() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO customer_billing_readiness (customer_id) VALUES (NEW.id)
+    ON CONFLICT (customer_id) DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS customer_contacts_billing_readiness ON customer_contacts;
+CREATE TRIGGER customer_contacts_billing_readiness
+    AFTER INSERT OR DELETE OR UPDATE OF customer_id, accepts_billing, deleted_at,
+          is_primary, office_email, first_name, last_name
+    ON customer_contacts
+    FOR EACH ROW EXECUTE FUNCTION billing_readiness_contact_trigger();
+
+DROP TRIGGER IF EXISTS customers_billing_readiness ON customers;
+CREATE TRIGGER customers_billing_readiness
+    AFTER INSERT ON customers
+    FOR EACH ROW EXECUTE FUNCTION billing_readiness_customer_trigger();
+
+SELECT rebuild_billing_readiness();
@@ -0,0 +1,23 @@
+-- FieldKit Migration 018
+-- Adds: work_orders.normalized_site -- stored, generated double-booking key
+--       -- plus its composite index.
+-- Run on: ALL FOUR databases
+-- Date: 2026-10-17
+--
+-- Notes:
+--   * Same normalization as before (lowercase, alphanumerics only). Adding a
+--     STORED generated column computes it for every existing row, so this is
+--     also the backfill; new and edited rows keep it current on their own.
+--   * The index leads with the dupe check's equality columns and ends with
+--     start_date, so the check (single or batch) is one index range per
+--     candidate. It replaces the expression index from migration 005.
+
+ALTER TABLE work_orders
+    ADD COLUMN IF NOT EXISTS normalized_site TEXT
+    GENERATED ALWAYS AS (lower(regexp_replace(work_site_label, '[^a-zA-Z0-9]', '', 'g'))) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_wo_normalized_site
+    ON work_orders (customer_id, service_location_id, normalized_site, start_date)
+    WHERE deleted_at IS NULL;
+
+DROP INDEX IF EXISTS idx_wo_site_dupe;
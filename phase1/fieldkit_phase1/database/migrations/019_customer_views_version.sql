@@ -0,0 +1,30 @@
+-- FieldKit Migration 019
+-- Adds: 'customer_views' cache version -- company-wide stamp for the cached
+--       customer detail / work order customer-context views.
+-- Run on: ALL FOUR databases
+-- Date: 2026-10-17
+--
+-- Notes:
+--   * customers.view_version (migration 015) only moves with writes to one
+--     customer. A cached view also shows the custom field definitions and
+--     the management company name, which are shared by many customers, so
+--     the app keys each view on both versions.
+--   * Field definition writes go through the app, which bumps the counter
+--     in the same transaction. Management companies are maintained by hand
+--     in SQL, so there a statement-level trigger bumps it (as for tax_rates,
+--     migration 014).
+
+INSERT INTO cache_versions (name) VALUES ('customer_views')
+ON CONFLICT (name) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_customer_views_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE cache_versions SET version = version + 1 WHERE name = 'customer_views';
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS management_companies_bump_views ON management_companies;
+CREATE TRIGGER management_companies_bump_views
+    AFTER UPDATE OR DELETE OR TRUNCATE ON management_companies
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_customer_views_version();
@@ -0,0 +1,29 @@
+-- FieldKit Migration 020
+-- Adds: password_reset_tokens -- one-time password reset links.
+-- Run on: ALL FOUR databases
+-- Date: 2026-10-17
+--
+-- Notes:
+--   * The app has issued and redeemed reset links (create_reset_token,
+--     get_valid_reset_token) since before the numbered migrations, but no
+--     schema file created the table, so a database built from this repo
+--     failed on /reset-password. Where the table already exists this is a
+--     no-op.
+--   * A token is written to the company database the admin sent it from and
+--     looked up in getagrip; users are replicated, so user_id is the same in
+--     every database.
+--   * Tokens are never deleted: used_at marks a redeemed or superseded one,
+--     and expires_at (24 hours) bounds the rest.
+
+CREATE TABLE IF NOT EXISTS password_reset_tokens (
+    id          SERIAL PRIMARY KEY,
+    user_id     INTEGER NOT NULL REFERENCES users(id),
+    token       VARCHAR(128) NOT NULL UNIQUE,
+    expires_at  TIMESTAMP NOT NULL,
+    used_at     TIMESTAMP,
+    created_by  VARCHAR(100),
+    created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_password_reset_tokens_user
+    ON password_reset_tokens (user_id) WHERE used_at IS NULL;
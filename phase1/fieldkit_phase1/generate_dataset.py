@@ -0,0 +1,767 @@
+#!/usr/bin/env python3
+"""
+FieldKit: Synthetic Dataset Generator
+Created: 2026-10-17
+Purpose: Fill the four company databases of a LOCAL PostgreSQL with a
+realistic, deterministic dataset for performance work: management
+companies, customers, contacts, service locations, the service catalog,
+equipment units, work orders with line items, and invoices with line items.
+
+Same --seed and options -> byte-identical data, so timings taken on two
+commits are comparable. Volumes come from --customers (per company, before
+scaling) times each company's factor: Kleanit Charlotte and Kleanit SF are
+10x the others by default, changeable with --company-scale. The defaults
+load roughly a million rows in total. Everything else is
+derived per customer with fixed ratios, including soft deletes (a few
+percent of every table has deleted_at set).
+
+Rows are written with COPY, in one transaction per database, all four
+databases at once. The billing-readiness triggers (migration 017) are off
+during the load and the table is rebuilt once at the end. The work order
+line totals (migration 011) are computed here, and number_sequences and
+the id sequences are moved past the loaded data, so the app can keep
+creating rows afterwards. The databases must be fully migrated (through
+018).
+
+The target tables must be empty, or pass --reset to TRUNCATE them first.
+That CASCADEs to every dependent table (notes, tags, histories, ...).
+users and tax_rates are never touched. NEVER point this at production.
+
+Usage:
+  Dry run (default — prints the row counts it would load, no writes):
+    python3 phase1/fieldkit_phase1/generate_dataset.py --host localhost
+
+  Load into empty databases:
+    python3 phase1/fieldkit_phase1/generate_dataset.py --host localhost --commit
+
+  Reload smaller, every company the same size:
+    python3 phase1/fieldkit_phase1/generate_dataset.py --host localhost --commit --reset \\
+        --customers 200 --company-scale kleanit_charlotte=1 --company-scale kleanit_sf=1
+
+Password comes from PGPASSWORD, else it is prompted for.
+"""
+
+import argparse
+import getpass
+import io
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time as dtime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+import psycopg2
+
+DB_USER = 'fieldkit'
+DB_PORT = 5432
+
+# (database, work order / invoice prefix, state, phone area code, cities).
+# Prefixes must match WO_NUMBER_PREFIXES in fieldkit_backend/app.py.
+# Cities are (city, county, zip prefix).
+COMPANIES = {
+    'getagrip': ('fieldkit_getagrip', 'GAG', 'NC', '704', [
+        ('Charlotte', 'Mecklenburg', '282'), ('Matthews', 'Mecklenburg', '281'),
+        ('Concord', 'Cabarrus', '280'), ('Gastonia', 'Gaston', '280'),
+        ('Mooresville', 'Iredell', '281'), ('Monroe', 'Union', '281'),
+    ]),
+    'kleanit_charlotte': ('fieldkit_kleanit_charlotte', 'KC', 'NC', '704', [
+        ('Charlotte', 'Mecklenburg', '282'), ('Huntersville', 'Mecklenburg', '280'),
+        ('Concord', 'Cabarrus', '280'), ('Indian Trail', 'Union', '280'),
+        ('Mooresville', 'Iredell', '281'), ('Belmont', 'Gaston', '280'),
+    ]),
+    'cts': ('fieldkit_cts', 'CTS', 'NC', '919', [
+        ('Raleigh', 'Wake', '276'), ('Cary', 'Wake', '275'), ('Garner', 'Wake', '275'),
+        ('Durham', 'Durham', '277'), ('Chapel Hill', 'Orange', '275'),
+        ('Smithfield', 'Johnston', '275'),
+    ]),
+    'kleanit_sf': ('fieldkit_kleanit_sf', 'KSF', 'FL', '954', [
+        ('Fort Lauderdale', 'Broward', '333'), ('Hollywood', 'Broward', '330'),
+        ('Miami', 'Miami-Dade', '331'), ('Hialeah', 'Miami-Dade', '330'),
+        ('Boca Raton', 'Palm Beach', '334'), ('West Palm Beach', 'Palm Beach', '334'),
+    ]),
+}
+
+# Soft-delete ratios per table.
+DELETED = {
+    'customers': 0.03, 'customer_contacts': 0.05, 'service_locations': 0.04,
+    'work_orders': 0.02, 'work_order_line_items': 0.03, 'invoices': 0.005,
+}
+
+# Company size relative to --customers unless --company-scale overrides it.
+DEFAULT_SCALE = {'kleanit_charlotte': 10, 'kleanit_sf': 10}
+
+# Work orders per customer (mean of a skewed draw), by customer_type.
+WO_PER_CUSTOMER = {'Multi Family': 14, 'Commercial': 6, 'Contractors': 4, 'Residential': 2}
+
+COPY_CHUNK = 20000   # rows buffered per table between COPYs
+
+# Load order: parents before children, so every flush satisfies the FKs.
+COLUMNS = {
+    'management_companies': (
+        'id', 'name', 'phone', 'email', 'website', 'created_at', 'created_by'),
+    'catalog_items': (
+        'id', 'billing_behavior', 'name', 'default_description', 'category', 'unit_price',
+        'unit_of_measure', 'estimated_minutes', 'minimum_quantity', 'billing_increment',
+        'is_taxable', 'cost', 'is_catch_all', 'sort_order', 'invoice_label', 'created_by'),
+    'equipment_units': (
+        'id', 'name', 'catalog_item_id', 'is_active', 'created_by'),
+    'customers': (
+        'id', 'property_name', 'customer_type', 'address', 'city', 'state', 'zip',
+        'management_company_id', 'status', 'billing_email', 'payment_terms', 'is_taxable',
+        'tax_county', 'created_at', 'created_by', 'deleted_at', 'deleted_by'),
+    'customer_contacts': (
+        'id', 'customer_id', 'first_name', 'last_name', 'title', 'office_phone',
+        'mobile_phone', 'office_email', 'is_primary', 'contact_type', 'accepts_billing',
+        'accepts_statements', 'accepts_general', 'created_at', 'created_by',
+        'deleted_at', 'deleted_by'),
+    'service_locations': (
+        'id', 'customer_id', 'location_name', 'address', 'address_2', 'city', 'state', 'zip',
+        'county', 'is_taxable', 'is_primary', 'created_at', 'created_by',
+        'deleted_at', 'deleted_by'),
+    'work_orders': (
+        'id', 'work_order_number', 'customer_id', 'service_location_id', 'primary_contact_id',
+        'status', 'extraction_status', 'work_site_label', 'auto_description',
+        'description_occ_vac', 'description_am_pm', 'description_gated', 'po_number',
+        'job_source', 'priority', 'start_date', 'end_date', 'arrival_window_start',
+        'arrival_window_end', 'estimated_duration_hours', 'is_multi_day',
+        'extraction_day_count', 'line_subtotal', 'line_count', 'accruing_count',
+        'earliest_open_deployment', 'created_at', 'created_by', 'deleted_at', 'deleted_by'),
+    'work_order_line_items': (
+        'id', 'work_order_id', 'catalog_item_id', 'equipment_unit_id', 'description',
+        'quantity', 'unit_price', 'total', 'cost', 'is_taxable', 'tax_county', 'deployed_at',
+        'retrieved_at', 'sort_order', 'created_at', 'created_by', 'deleted_at', 'deleted_by'),
+    'invoices': (
+        'id', 'invoice_number', 'revision_number', 'state', 'work_order_id', 'customer_id',
+        'service_location_id', 'invoice_date', 'subtotal', 'tax_county', 'tax_rate_pct',
+        'tax_total', 'total', 'amount_paid', 'hardened_at', 'hardened_by', 'sent_at',
+        'sent_by', 'voided_at', 'voided_by', 'void_reason', 'created_at', 'created_by',
+        'deleted_at', 'deleted_by'),
+    'invoice_line_items': (
+        'id', 'invoice_id', 'catalog_item_id', 'equipment_unit_id', 'description',
+        'resolved_label', 'quantity', 'unit_price', 'total', 'is_taxable', 'deployed_at',
+        'retrieved_at', 'sort_order', 'created_at', 'created_by'),
+}
+TABLES = list(COLUMNS)
+
+# (name, category, unit_price, unit_of_measure, estimated_minutes, is_taxable, cost,
+#  minimum_quantity, billing_increment)
+STANDARD_ITEMS = [
+    ('Carpet Cleaning - 1 Bedroom',  'Carpet',     85,    'each',      45,  True,  22,  None, None),
+    ('Carpet Cleaning - 2 Bedroom',  'Carpet',     110,   'each',      60,  True,  28,  None, None),
+    ('Carpet Cleaning - 3 Bedroom',  'Carpet',     135,   'each',      75,  True,  34,  None, None),
+    ('Stairs',                       'Carpet',     25,    'each',      15,  True,  5,   None, None),
+    ('Pet Treatment',                'Carpet',     35,    'each',      10,  True,  8,   None, None),
+    ('Spot Treatment',               'Carpet',     20,    'each',      10,  True,  4,   None, None),
+    ('Deodorizer',                   'Carpet',     15,    'each',      5,   True,  3,   None, None),
+    ('Commercial Carpet Cleaning',   'Carpet',     0.28,  'sq ft',     None, True, 0.07, None, None),
+    ('Tile & Grout Cleaning',        'Hard Floor', 0.75,  'sq ft',     None, True, 0.18, None, None),
+    ('Upholstery - Sofa',            'Upholstery', 95,    'each',      40,  True,  20,  None, None),
+    ('Upholstery - Chair',           'Upholstery', 45,    'each',      20,  True,  10,  None, None),
+    ('Carpet Stretching',            'Repair',     75,    'each',      45,  True,  15,  None, None),
+    ('Carpet Repair',                'Repair',     95,    'hour',      60,  True,  30,  None, None),
+    ('Water Extraction',             'Water',      125,   'hour',      None, True, 40,  1.0,  0.25),
+    ('Trip Charge',                  'Fees',       25,    'flat rate', None, False, 0,  None, None),
+]
+# (name, invoice_label, per-day price, units per scaled company)
+EQUIPMENT_ITEMS = [
+    ('Air Mover',    'Set Fan',          30,  24),
+    ('Dehumidifier', 'Set Dehu',         110, 10),
+    ('Air Scrubber', 'Set Air Scrubber', 100, 4),
+]
+
+MGMT_NAMES = [
+    'Greystar', 'Bell Partners', 'Cortland', 'MAA', 'Camden', 'Lincoln Property',
+    'Northwood Ravin', 'Grubb Properties', 'Bainbridge', 'Asset Living', 'RKW Residential',
+    'Drucker + Falk', 'Crescent Communities', 'Fairfield', 'Pegasus Residential',
+    'Trinity Property Consultants', 'Bell Apartment Living', 'Willow Bridge', 'FPI Management',
+    'ZRS Management',
+]
+PLACES = [
+    'Ballantyne', 'South End', 'NoDa', 'Plaza Midwood', 'Steele Creek', 'University Place',
+    'Lake Norman', 'Dilworth', 'Myers Park', 'Cotswold', 'Providence', 'Sharon Square',
+    'Eastover', 'Elizabeth', 'Wesley Heights', 'Crown Point', 'Highland Creek',
+    'Mallard Creek', 'Berewick', 'Waverly', 'Rea Farms', 'Blakeney', 'Piper Glen', 'Ayrsley',
+    'Birkdale', 'Cornelius', 'Davidson', 'Mint Hill', 'Stallings', 'Riverbend', 'Oak Hollow',
+    'Cedar Park', 'Magnolia Pointe', 'Stonebridge', 'Willow Creek', 'Brightwater',
+    'Harbor Point', 'Palm Grove', 'Sawgrass', 'Coral Ridge',
+]
+MF_FORMS = ['The Reserve at {}', 'The Residences at {}', 'Park at {}', 'Villas at {}',
+            'The Retreat at {}', 'Lofts at {}', '{} Apartments', '{} Commons', '{} Station']
+COMMERCIAL_KINDS = ['Medical Center', 'Office Park', 'Dental Group', 'Baptist Church',
+                    'Business Center', 'Senior Living', 'Hotel & Suites', 'Fitness Club']
+CONTRACTOR_KINDS = ['Restoration', 'Builders', 'Construction', 'Flooring', 'Property Services',
+                    'Remodeling']
+FIRST_NAMES = [
+    'James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David',
+    'Elizabeth', 'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas',
+    'Sarah', 'Carlos', 'Karen', 'Daniel', 'Lisa', 'Marcus', 'Nancy', 'Anthony', 'Ashley',
+    'Kevin', 'Monica', 'Jason', 'Tanya', 'Luis', 'Denise', 'Brian', 'Keisha', 'Eric', 'Maria',
+]
+LAST_NAMES = [
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez',
+    'Martinez', 'Hernandez', 'Lopez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore',
+    'Jackson', 'Martin', 'Lee', 'Thompson', 'White', 'Harris', 'Clark', 'Lewis', 'Robinson',
+    'Walker', 'Young', 'Allen', 'King', 'Wright', 'Scott', 'Green', 'Baker', 'Adams', 'Nelson',
+]
+STREETS = ['Main', 'Oak', 'Park', 'Providence', 'Sharon', 'Tryon', 'Independence', 'Fairview',
+           'Colonial', 'Sunset', 'Lakeview', 'Church', 'Elm', 'Highland', 'Harbor', 'Glenwood']
+STREET_TYPES = ['St', 'Rd', 'Ave', 'Blvd', 'Dr', 'Ln', 'Pkwy', 'Way']
+TITLES = ['Property Manager', 'Assistant Manager', 'Maintenance Supervisor',
+          'Regional Manager', 'Leasing Agent', 'Accounts Payable', 'Owner', 'Office Manager']
+STAFF = ['jmartin', 'kbrooks', 'lwhite', 'tnguyen', 'office']
+VOID_REASONS = ['Billed to wrong customer', 'Duplicate invoice', 'Service disputed',
+                'Pricing error']
+
+CENT = Decimal('0.01')
+
+
+def money(value):
+    return Decimal(value).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def weighted(rng, choices):
+    """choices: [(value, weight), ...]"""
+    return rng.choices([c for c, _ in choices], [w for _, w in choices])[0]
+
+
+def maybe_deleted(rng, table, created_at, anchor):
+    """(deleted_at, deleted_by) -- set for DELETED[table] of rows."""
+    if rng.random() >= DELETED[table]:
+        return None, None
+    span = max(1, (anchor - created_at.date()).days)
+    return created_at + timedelta(days=rng.randint(1, span), minutes=rng.randint(0, 600)), \
+        rng.choice(STAFF)
+
+
+# ============================================================================
+# Sinks: COPY into a database, or just count (dry run)
+# ============================================================================
+
+def _copy_field(value):
+    if value is None:
+        return '\\N'
+    if value is True:
+        return 't'
+    if value is False:
+        return 'f'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t') \
+                     .replace('\n', '\\n').replace('\r', '\\r')
+
+
+class CountingSink:
+    def __init__(self):
+        self.counts = {table: 0 for table in TABLES}
+
+    def emit(self, table, row):
+        self.counts[table] += 1
+
+    def finish(self):
+        pass
+
+
+class CopySink(CountingSink):
+    """Buffers rows per table. When any buffer fills, every table is flushed
+    in load order, so children never reach the database before parents."""
+
+    def __init__(self, cursor):
+        super().__init__()
+        self.cursor  = cursor
+        self.buffers = {table: [] for table in TABLES}
+
+    def emit(self, table, row):
+        super().emit(table, row)
+        buf = self.buffers[table]
+        buf.append('\t'.join(map(_copy_field, row)))
+        if len(buf) >= COPY_CHUNK:
+            self.finish()
+
+    def finish(self):
+        for table in TABLES:
+            buf = self.buffers[table]
+            if not buf:
+                continue
+            data = io.StringIO('\n'.join(buf) + '\n')
+            self.cursor.copy_expert(
+                f"COPY {table} ({', '.join(COLUMNS[table])}) FROM STDIN", data)
+            buf.clear()
+
+
+# ============================================================================
+# Generation
+# ============================================================================
+
+class Ids:
+    def __init__(self):
+        self.last = {table: 0 for table in TABLES}
+
+    def next(self, table):
+        self.last[table] += 1
+        return self.last[table]
+
+
+def generate(company_key, n_customers, seed, anchor, rates, sink):
+    """Emit one company's dataset into sink. Deterministic for a given
+    (company_key, n_customers, seed, anchor)."""
+    _db, prefix, state, area, cities = COMPANIES[company_key]
+    rng   = random.Random(f'{seed}:{company_key}')
+    ids   = Ids()
+    start = anchor - timedelta(days=730)
+    epoch = datetime.combine(start, dtime(8, 0)) - timedelta(days=120)
+
+    def phone():
+        return f'({area}) {rng.randint(200, 999)}-{rng.randint(1000, 9999)}'
+
+    def street_address():
+        return f'{rng.randint(100, 9999)} {rng.choice(STREETS)} {rng.choice(STREET_TYPES)}'
+
+    # --- management companies ---------------------------------------------
+    mgmt_ids = []
+    for i in range(max(5, n_customers // 40)):
+        base = MGMT_NAMES[i % len(MGMT_NAMES)]
+        name = base if i < len(MGMT_NAMES) else f'{base} - Region {i // len(MGMT_NAMES) + 1}'
+        mid  = ids.next('management_companies')
+        slug = ''.join(ch for ch in base.lower() if ch.isalnum())
+        sink.emit('management_companies', (mid, name, phone(), f'ap@{slug}.com',
+                                           f'https://www.{slug}.com', epoch, 'seed'))
+        mgmt_ids.append(mid)
+
+    # --- catalog and equipment --------------------------------------------
+    standard = []   # (id, name, price, uom, taxable, cost, min_qty, increment)
+    for order, (name, category, price, uom, minutes, taxable, cost, min_qty, incr) \
+            in enumerate(STANDARD_ITEMS, 1):
+        cid = ids.next('catalog_items')
+        sink.emit('catalog_items', (cid, 'standard', name, name, category, money(price), uom,
+                                    minutes, min_qty, incr, taxable, money(cost), False, order,
+                                    None, 'seed'))
+        standard.append((cid, name, money(price), uom, taxable, money(cost), min_qty, incr))
+    catch_all = ids.next('catalog_items')
+    sink.emit('catalog_items', (catch_all, 'standard', 'Custom Service', None, 'Other',
+                                money(0), 'each', None, None, None, True, None, True,
+                                len(STANDARD_ITEMS) + 1, None, 'seed'))
+    extraction = next(item for item in standard if item[1] == 'Water Extraction')
+
+    scale    = max(1, n_customers // 500)
+    equip    = []   # (catalog id, name, label, price, [unit ids])
+    for order, (name, label, price, per_company) in enumerate(EQUIPMENT_ITEMS, 1):
+        cid = ids.next('catalog_items')
+        sink.emit('catalog_items', (cid, 'per_day_equipment', name, name, 'Equipment',
+                                    money(price), 'day', None, None, None, True, None, False,
+                                    100 + order, label, 'seed'))
+        units = []
+        for n in range(1, per_company * scale + 1):
+            uid = ids.next('equipment_units')
+            sink.emit('equipment_units', (uid, f'{name} #{n:02d}', cid, True, 'seed'))
+            units.append(uid)
+        equip.append((cid, name, label, money(price), units))
+
+    # --- customers, contacts, locations -----------------------------------
+    customers = []   # (id, type, primary contact id, [(location id, county, taxable, address)])
+    plans     = []   # (created_at, start_date, customer index)
+    for _ in range(n_customers):
+        cid      = ids.next('customers')
+        ctype    = weighted(rng, [('Multi Family', 60), ('Commercial', 15),
+                                  ('Residential', 15), ('Contractors', 10)])
+        status   = weighted(rng, [('Active', 85), ('Inactive', 8), ('On Hold', 3), ('Lead', 4)])
+        city, county, zip3 = rng.choice(cities)
+        address  = street_address()
+        zipcode  = f'{zip3}{rng.randint(0, 99):02d}'
+        taxable  = rng.random() < 0.95
+        created  = epoch + timedelta(days=rng.randint(0, 700), minutes=rng.randint(0, 600))
+        place    = rng.choice(PLACES)
+        if ctype == 'Multi Family':
+            name = rng.choice(MF_FORMS).format(place)
+        elif ctype == 'Commercial':
+            name = f'{place} {rng.choice(COMMERCIAL_KINDS)}'
+        elif ctype == 'Contractors':
+            name = f'{rng.choice(LAST_NAMES)} {rng.choice(CONTRACTOR_KINDS)}'
+        else:
+            name = f'{rng.choice(LAST_NAMES)}, {rng.choice(FIRST_NAMES)}'
+        mgmt     = rng.choice(mgmt_ids) if ctype == 'Multi Family' and rng.random() < 0.7 else None
+        deleted_at, deleted_by = maybe_deleted(rng, 'customers', created, anchor)
+        terms    = weighted(rng, [('Net 30', 70), ('Due on Receipt', 20), ('Net 15', 10)])
+        sink.emit('customers', (cid, name, ctype, address, city, state, zipcode, mgmt, status,
+                                None, terms, taxable, county, created, 'seed',
+                                deleted_at, deleted_by))
+
+        primary_contact = None
+        for n in range(weighted(rng, [(1, 35), (2, 35), (3, 20), (4, 10)])):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            ccid        = ids.next('customer_contacts')
+            is_primary  = n == 0
+            billing     = is_primary or rng.random() < 0.25
+            email       = f'{first[0]}{last}{ccid}@example.com'.lower() if rng.random() < 0.9 else None
+            c_deleted_at, c_deleted_by = (None, None) if is_primary else \
+                maybe_deleted(rng, 'customer_contacts', created, anchor)
+            ctype_c     = 'billing' if billing and not is_primary else \
+                weighted(rng, [('general', 70), ('onsite', 15), ('owner', 10), ('emergency', 5)])
+            sink.emit('customer_contacts', (ccid, cid, first, last, rng.choice(TITLES), phone(),
+                                            phone() if rng.random() < 0.6 else None, email,
+                                            is_primary, ctype_c, billing, billing, True,
+                                            created, 'seed', c_deleted_at, c_deleted_by))
+            if is_primary:
+                primary_contact = ccid
+
+        locations = []
+        extra = rng.randint(1, 4) if ctype in ('Multi Family', 'Commercial') \
+            and rng.random() < 0.15 else 0
+        for n in range(1 + extra):
+            lid = ids.next('service_locations')
+            if n == 0:
+                loc = (name, address, None, city, zipcode, county)
+            else:
+                lcity, lcounty, lzip3 = rng.choice(cities)
+                loc = (f'{name} - Building {chr(65 + n)}', street_address(), None, lcity,
+                       f'{lzip3}{rng.randint(0, 99):02d}', lcounty)
+            l_deleted_at, l_deleted_by = (None, None) if n == 0 else \
+                maybe_deleted(rng, 'service_locations', created, anchor)
+            sink.emit('service_locations', (lid, cid, loc[0], loc[1], loc[2], loc[3], state,
+                                            loc[4], loc[5], taxable, n == 0, created, 'seed',
+                                            l_deleted_at, l_deleted_by))
+            if l_deleted_at is None:
+                locations.append((lid, loc[5], taxable, loc[1]))
+
+        customers.append((cid, ctype, primary_contact, locations))
+        mean = WO_PER_CUSTOMER[ctype] * (0 if status == 'Lead' else 0.5 if status != 'Active' else 1)
+        if mean:
+            n_wo = min(int(rng.expovariate(1 / mean)), mean * 6)
+            first_day = max(start, created.date())
+            span = (anchor + timedelta(days=21) - first_day).days
+            for _ in range(int(n_wo)):
+                day = first_day + timedelta(days=rng.randint(0, max(0, span)))
+                booked = min(day - timedelta(days=rng.randint(1, 21)), anchor)
+                made = datetime.combine(booked, dtime(8, 0)) + timedelta(minutes=rng.randint(0, 540))
+                plans.append((made, day, len(customers) - 1))
+
+    # --- work orders, line items, invoices --------------------------------
+    plans.sort()
+    wo_seq, inv_seq = {}, {}
+    open_units      = set()
+    for made, day, cidx in plans:
+        cid, ctype, primary_contact, locations = customers[cidx]
+        if not locations:
+            continue
+        woid   = ids.next('work_orders')
+        wo_seq[made.year] = wo_seq.get(made.year, 0) + 1
+        number = f'{prefix}-{made.year}-{wo_seq[made.year]:04d}'
+        loc_id, county, taxable, loc_address = \
+            locations[0] if rng.random() < 0.8 else rng.choice(locations)
+        age    = (anchor - day).days
+        water  = rng.random() < 0.12
+        deleted_at, deleted_by = maybe_deleted(rng, 'work_orders', made, anchor)
+
+        if age < 0:
+            status = weighted(rng, [('Scheduled', 95), ('Cancelled', 5)])
+        elif age < 3:
+            status = weighted(rng, [('Scheduled', 30), ('In Progress', 20), ('On The Way', 5),
+                                    ('Completed', 40), ('Cancelled', 5)])
+        elif age < 21:
+            status = weighted(rng, [('Completed', 50), ('Invoiced', 40), ('No Charge', 5),
+                                    ('Cancelled', 5)])
+        else:
+            status = weighted(rng, [('Invoiced', 85), ('Completed', 5), ('No Charge', 5),
+                                    ('Cancelled', 5)])
+        extraction_status = None
+        accruing = water and 0 <= age < 6 and status not in ('Cancelled', 'Invoiced') \
+            and deleted_at is None
+        if accruing:
+            status, extraction_status = 'Extraction Active', weighted(rng, [
+                ('Drying', 60), ('Needs More Time', 15), ('Ready for Pickup', 20),
+                ('Missed Today', 5)])
+        if status == 'Invoiced' and deleted_at is not None:
+            status = 'Cancelled'
+
+        # line items
+        lines = []   # (id, catalog id, unit id, description, qty, price, total, taxable,
+                     #  deployed, retrieved, live)
+        if water:
+            picks = [extraction] + rng.sample(standard, rng.randint(0, 1))
+        else:
+            picks = rng.sample(standard, weighted(rng, [(1, 40), (2, 35), (3, 15), (4, 10)]))
+        for item_id, name, price, uom, item_taxable, cost, min_qty, incr in picks:
+            if uom == 'sq ft':
+                qty = Decimal(rng.randint(150, 2500))
+            elif uom == 'hour':
+                qty = max(Decimal(str(min_qty or 1)), Decimal(rng.randint(4, 16)) / 4)
+            else:
+                qty = Decimal(weighted(rng, [(1, 70), (2, 20), (3, 10)]))
+            lines.append([item_id, None, name, qty, price, money(qty * price), item_taxable,
+                          None, None, cost])
+        if not water and rng.random() < 0.05:
+            price = money(rng.randint(50, 400))
+            lines.append([catch_all, None, 'Custom: additional labor', Decimal(1), price, price,
+                          True, None, None, None])
+        if water:
+            days = rng.randint(2, 5)
+            for eq_id, eq_name, _label, price, units in equip:
+                for _ in range(rng.randint(1 if eq_id == equip[0][0] else 0, 4)):
+                    if accruing:
+                        free = [u for u in units if u not in open_units]
+                        if not free:
+                            break
+                        unit = rng.choice(free)
+                        open_units.add(unit)
+                        lines.append([eq_id, unit, eq_name, None, price, None, True, day, None, None])
+                    else:
+                        qty = Decimal(days)
+                        lines.append([eq_id, rng.choice(units), eq_name, qty, price,
+                                      money(qty * price), True, day, day + timedelta(days=days),
+                                      None])
+
+        # Emitted after the work order row: a flush may fall between the two.
+        line_rows, live_lines = [], []
+        for order, (item_id, unit, desc, qty, price, total, item_taxable, deployed, retrieved,
+                    cost) in enumerate(lines, 1):
+            lid = ids.next('work_order_line_items')
+            l_deleted_at, l_deleted_by = (None, None) if unit and retrieved is None else \
+                maybe_deleted(rng, 'work_order_line_items', made, anchor)
+            line_rows.append((lid, woid, item_id, unit, desc, qty, price, total,
+                              cost, item_taxable and taxable, county, deployed,
+                              retrieved, order, made, 'seed', l_deleted_at, l_deleted_by))
+            if l_deleted_at is None:
+                live_lines.append((item_id, unit, desc, qty, price, total,
+                                   item_taxable and taxable, deployed, retrieved, order))
+
+        # Same aggregates as _refresh_wo_totals in fieldkit_backend/app.py.
+        subtotal = sum((l[5] for l in live_lines if l[5] is not None), Decimal('0.00'))
+        open_eq  = [l for l in live_lines if l[1] is not None and l[8] is None]
+        multi    = rng.random() < 0.05
+        arrive   = rng.randint(16, 30)   # half hours from midnight: 8:00 .. 15:00
+        if ctype == 'Multi Family':
+            site = f'Unit #{rng.randint(1, 40)}{rng.randint(1, 3):01d}-{rng.randint(100, 499)}'
+        elif ctype == 'Residential':
+            site = loc_address
+        else:
+            site = f'Suite {rng.randint(1, 9)}00'
+        sink.emit('work_orders', (
+            woid, number, cid, loc_id, primary_contact, status, extraction_status, site,
+            ', '.join(l[2] for l in live_lines[:3]) or None,
+            rng.choice([None, 'OCC', 'VAC']) if ctype == 'Multi Family' else None,
+            rng.choice([None, 'AM', 'PM']), rng.random() < 0.1,
+            f'PO-{rng.randint(10000, 99999)}' if rng.random() < 0.1 else None,
+            weighted(rng, [('Phone', 45), ('Email', 35), ('Website', 8), ('Referral', 7),
+                           ('Salesperson', 5)]),
+            weighted(rng, [('Normal', 85), ('High', 12), ('Urgent', 3)]),
+            day, day + timedelta(days=rng.randint(1, 3)) if multi else day,
+            dtime(arrive // 2, 30 * (arrive % 2)), dtime(arrive // 2 + 2, 30 * (arrive % 2)),
+            Decimal(rng.randint(2, 16)) / 2, multi, max(0, age) if accruing else 0,
+            subtotal, len(live_lines), len(open_eq),
+            min((l[7] for l in open_eq), default=None),
+            made, rng.choice(STAFF), deleted_at, deleted_by))
+        for row in line_rows:
+            sink.emit('work_order_line_items', row)
+
+        if status != 'Invoiced':
+            continue
+
+        # invoice
+        inv_date = min(anchor, day + timedelta(days=rng.randint(0, 5)))
+        inv_age  = (anchor - inv_date).days
+        if inv_age > 45:
+            state_ = weighted(rng, [('Paid', 85), ('Sent', 12), ('Void', 3)])
+        elif inv_age >= 10:
+            state_ = weighted(rng, [('Sent', 55), ('Paid', 35), ('Hardened', 7), ('Void', 3)])
+        else:
+            state_ = weighted(rng, [('Live', 40), ('Hardened', 40), ('Sent', 20)])
+        inv_id = ids.next('invoices')
+        inv_seq[inv_date.year] = inv_seq.get(inv_date.year, 0) + 1
+        inv_number = f'{prefix}-{inv_date.year}-{inv_seq[inv_date.year]:04d}'
+        created    = datetime.combine(inv_date, dtime(9, 0)) + timedelta(minutes=rng.randint(0, 480))
+        hardened   = created + timedelta(hours=rng.randint(1, 30))
+        sent       = hardened + timedelta(hours=rng.randint(1, 48))
+        is_live    = state_ == 'Live'
+        rate       = rates.get(county, Decimal('0'))
+        taxable_subtotal = sum((l[5] for l in live_lines if l[6] and l[5] is not None),
+                               Decimal('0.00'))
+        tax_total  = None if is_live else money(taxable_subtotal * rate / 100)
+        total      = None if is_live else subtotal + tax_total
+        i_deleted_at, i_deleted_by = maybe_deleted(rng, 'invoices', created, anchor)
+        who = rng.choice(STAFF)
+        sink.emit('invoices', (
+            inv_id, inv_number, 1, state_, woid, cid, loc_id, inv_date, subtotal, county,
+            None if is_live else rate, tax_total, total,
+            total if state_ == 'Paid' else Decimal('0.00'),
+            None if is_live else hardened, None if is_live else who,
+            sent if state_ in ('Sent', 'Paid', 'Void') else None,
+            who if state_ in ('Sent', 'Paid', 'Void') else None,
+            sent + timedelta(days=rng.randint(1, 20)) if state_ == 'Void' else None,
+            who if state_ == 'Void' else None,
+            rng.choice(VOID_REASONS) if state_ == 'Void' else None,
+            created, who, i_deleted_at, i_deleted_by))
+
+        # Hardened invoices carry baked equipment labels: the ordinal rule of
+        # _EQUIPMENT_LABELS_SQL in fieldkit_backend/app.py.
+        labels = {}
+        if not is_live:
+            for eq_id, _name, label, _price, _units in equip:
+                group = sorted((l for l in live_lines if l[0] == eq_id),
+                               key=lambda l: (l[7], l[9]))
+                for n, l in enumerate(group, 1):
+                    labels[l[9]] = label if len(group) == 1 else f'{label} {n}'
+        for item_id, unit, desc, qty, price, line_total, line_taxable, deployed, retrieved, \
+                order in live_lines:
+            sink.emit('invoice_line_items', (ids.next('invoice_line_items'), inv_id, item_id,
+                                             unit, desc, labels.get(order), qty, price,
+                                             line_total, line_taxable, deployed, retrieved,
+                                             order, created, who))
+    sink.finish()
+    return sink.counts
+
+
+# ============================================================================
+# Database work
+# ============================================================================
+
+def connect(args, db_name, password):
+    return psycopg2.connect(dbname=db_name, user=args.user, password=password,
+                            host=args.host, port=args.port)
+
+
+def load_rates(cursor):
+    cursor.execute("SELECT county, total_pct FROM tax_rates WHERE deleted_at IS NULL AND is_active")
+    return dict(cursor.fetchall())
+
+
+def existing_rows(cursor):
+    counts = {}
+    for table in TABLES:
+        cursor.execute(f"SELECT COUNT(*) FROM {table}")
+        counts[table] = cursor.fetchone()[0]
+    return counts
+
+
+def load(args, company_key, n_customers, password):
+    """Returns (counts, seconds, existing rows or None once loaded)."""
+    db_name = COMPANIES[company_key][0]
+    started = time.monotonic()
+    conn    = connect(args, db_name, password)
+    try:
+        cursor = conn.cursor()
+        rates  = load_rates(cursor)
+        before = existing_rows(cursor)
+        if not args.commit:
+            counts = generate(company_key, n_customers, args.seed, args.as_of, rates,
+                              CountingSink())
+            return counts, time.monotonic() - started, before
+        if any(before.values()):
+            if not args.reset:
+                raise RuntimeError('target tables are not empty (use --reset)')
+            cursor.execute(f"TRUNCATE {', '.join(TABLES)} RESTART IDENTITY CASCADE")
+
+        cursor.execute("ALTER TABLE customer_contacts DISABLE TRIGGER customer_contacts_billing_readiness")
+        cursor.execute("ALTER TABLE customers DISABLE TRIGGER customers_billing_readiness")
+        counts = generate(company_key, n_customers, args.seed, args.as_of, rates,
+                          CopySink(cursor))
+        cursor.execute("ALTER TABLE customer_contacts ENABLE TRIGGER customer_contacts_billing_readiness")
+        cursor.execute("ALTER TABLE customers ENABLE TRIGGER customers_billing_readiness")
+        cursor.execute("SELECT rebuild_billing_readiness()")
+
+        for table in TABLES:
+            cursor.execute(f"""
+                SELECT setval(pg_get_serial_sequence('{table}', 'id'),
+                              COALESCE(MAX(id), 0) + 1, false) FROM {table}
+            """)
+        # Same as migration 013: continue numbering after the loaded rows.
+        prefix = COMPANIES[company_key][1]
+        cursor.execute("DELETE FROM number_sequences WHERE prefix = %s", (prefix,))
+        cursor.execute("""
+            INSERT INTO number_sequences (kind, prefix, year, last_value)
+            SELECT 'work_order', split_part(work_order_number, '-', 1),
+                   split_part(work_order_number, '-', 2)::int,
+                   MAX(split_part(work_order_number, '-', 3)::int)
+            FROM work_orders
+            WHERE work_order_number ~ '^[A-Z]+-[0-9]{4}-[0-9]+$'
+            GROUP BY 1, 2, 3
+        """)
+        cursor.execute("""
+            INSERT INTO number_sequences (kind, prefix, year, last_value)
+            SELECT 'invoice', split_part(invoice_number, '-', 1),
+                   split_part(invoice_number, '-', 2)::int,
+                   MAX(split_part(invoice_number, '-', 3)::int)
+            FROM invoices
+            WHERE invoice_number ~ '^[A-Z]+-[0-9]{4}-[0-9]+$' AND revision_number = 1
+            GROUP BY 1, 2, 3
+        """)
+        # Running app workers drop their catalog / tax rate caches.
+        cursor.execute("UPDATE cache_versions SET version = version + 1")
+        conn.commit()
+
+        conn.autocommit = True
+        for table in TABLES:
+            cursor.execute(f"ANALYZE {table}")
+        return counts, time.monotonic() - started, None
+    finally:
+        conn.close()
+
+
+def company_scale(value):
+    key, _, factor = value.partition('=')
+    if key not in COMPANIES or not factor:
+        raise argparse.ArgumentTypeError(f"expected <company>=<factor>, company one of {', '.join(COMPANIES)}")
+    return key, float(factor)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='FieldKit synthetic dataset generator')
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=DB_PORT)
+    parser.add_argument('--user', default=DB_USER)
+    parser.add_argument('--customers', type=int, default=750,
+                        help='customers per company before scaling (default 750)')
+    parser.add_argument('--company-scale', type=company_scale, action='append', default=[],
+                        metavar='COMPANY=FACTOR', help='multiply one company (repeatable)')
+    parser.add_argument('--companies', nargs='+', choices=list(COMPANIES), default=list(COMPANIES))
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--as-of', type=date.fromisoformat, default=date(2026, 10, 1),
+                        help='"today" for the generated history (default 2026-10-01)')
+    parser.add_argument('--reset', action='store_true', help='TRUNCATE the target tables first')
+    parser.add_argument('--commit', action='store_true')
+    args = parser.parse_args()
+
+    factors = dict(DEFAULT_SCALE, **dict(args.company_scale))
+    sizes   = {key: max(1, round(args.customers * factors.get(key, 1)))
+               for key in args.companies}
+
+    print("=" * 60)
+    print("FieldKit: Synthetic Dataset Generator")
+    print("=" * 60)
+    print(f"Mode: {'COMMIT (writes to database)' if args.commit else 'DRY RUN (no writes)'}"
+          f"{' + RESET' if args.commit and args.reset else ''}")
+    print(f"Target: {args.user}@{args.host}:{args.port}   seed {args.seed}   as of {args.as_of}")
+
+    password = os.environ.get('PGPASSWORD') or \
+        getpass.getpass(f"\nPostgreSQL password for user '{args.user}': ")
+
+    def run(key):
+        try:
+            return key, load(args, key, sizes[key], password), None
+        except (psycopg2.Error, RuntimeError) as e:
+            return key, None, e
+
+    with ThreadPoolExecutor(max_workers=len(args.companies)) as pool:
+        results = list(pool.map(run, args.companies))
+
+    failed, grand = 0, 0
+    for key, result, error in results:
+        db_name = COMPANIES[key][0]
+        if error is not None:
+            print(f"\n  {db_name:30} ERROR: {error}")
+            failed += 1
+            continue
+        counts, seconds, before = result
+        total  = sum(counts.values())
+        grand += total
+        verb   = 'would load' if before is not None else f'loaded in {seconds:.1f}s'
+        print(f"\n  {db_name:30} {sizes[key]} customers, {total:,} rows {verb}")
+        for table in TABLES:
+            existing = f"   (has {before[table]:,})" if before and before[table] else ''
+            print(f"      {table:24} {counts[table]:>10,}{existing}")
+    print(f"\nTotal: {grand:,} rows")
+    if not args.commit and not failed:
+        print("Re-run with --commit to load.")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+FieldKit: Billing Readiness Rebuild
+Created: 2026-10-17
+Purpose: Recompute customer_billing_readiness (migration 017) from
+customer_contacts for every customer, in all four company databases.
+
+Triggers keep the table current on every contact and customer write; this
+is for repairing drift (e.g. after a bulk load with triggers disabled) and
+is what the migration itself runs once. Recomputes from the contacts, so
+re-running is harmless.
+
+Usage:
+  Dry run (default — reports how many customers are out of date, no writes):
+    docker exec -it fieldkit-prod-app-1 python3 /app/phase1/fieldkit_phase1/rebuild_billing_readiness.py
+
+  Real rebuild:
+    docker exec -it fieldkit-prod-app-1 python3 /app/phase1/fieldkit_phase1/rebuild_billing_readiness.py --commit
+"""
+
+import sys
+import getpass
+import psycopg2
+
+DATABASES = [
+    'fieldkit_getagrip',
+    'fieldkit_kleanit_charlotte',
+    'fieldkit_cts',
+    'fieldkit_kleanit_sf',
+]
+DB_HOST = 'db'
+DB_PORT = 5432
+DB_USER = 'fieldkit'
+
+# Customers whose stored row is missing or differs from a fresh computation.
+STALE = """
+    SELECT COUNT(*)
+    FROM billing_readiness_rows(NULL) fresh
+    LEFT JOIN customer_billing_readiness r ON r.customer_id = fresh.customer_id
+    WHERE r.customer_id IS NULL
+       OR (r.billing_contact_count, r.billing_emails, r.billing_contact_names, r.primary_billing_name)
+          IS DISTINCT FROM
+          (fresh.billing_contact_count, fresh.billing_emails, fresh.billing_contact_names,
+           fresh.primary_billing_name)
+"""
+
+
+def rebuild(db_name, password, commit):
+    conn = psycopg2.connect(dbname=db_name, user=DB_USER, password=password,
+                            host=DB_HOST, port=DB_PORT)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(STALE)
+        stale = cursor.fetchone()[0]
+        if commit:
+            cursor.execute("SELECT rebuild_billing_readiness()")
+            conn.commit()
+        return stale
+    finally:
+        cursor.close(); conn.close()
+
+
+def main():
+    commit = '--commit' in sys.argv
+
+    print("=" * 60)
+    print("FieldKit: Billing Readiness Rebuild")
+    print("=" * 60)
+    print(f"Mode: {'COMMIT (writes to database)' if commit else 'DRY RUN (no writes)'}")
+
+    password = getpass.getpass(f"\nPostgreSQL password for user '{DB_USER}': ")
+
+    failed = 0
+    for db_name in DATABASES:
+        try:
+            stale = rebuild(db_name, password, commit)
+        except psycopg2.Error as e:
+            print(f"  {db_name:30} ERROR: {e}")
+            failed += 1
+            continue
+        verb = 'rebuilt' if commit else 'out of date'
+        print(f"  {db_name:30} {stale} customers {verb}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
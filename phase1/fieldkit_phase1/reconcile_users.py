@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+FieldKit: User Replication Reconciliation
+Created: 2026-10-17
+Purpose: Find and repair drift in the users table across the four company
+databases. getagrip is canonical (the app reads users from it); the other
+three should hold identical rows, matched by username.
+
+User writes go to all four databases as one two-phase commit
+(write_to_all_dbs in fieldkit_backend/app.py). If the app dies between
+PREPARE and COMMIT, a prepared transaction is left holding row locks. This
+script first rolls back any such leftovers older than a minute. It then
+copies canonical rows over whatever differs, so a change that reached
+getagrip is re-applied everywhere else, and one that didn't is undone.
+All four databases are read in parallel.
+
+Users that exist only in a non-canonical database are reported, never
+deleted -- users are disabled, not removed.
+
+Usage:
+  Dry run (default — reports drift and leftover prepared transactions, no writes):
+    docker exec -it fieldkit-prod-app-1 python3 /app/phase1/fieldkit_phase1/reconcile_users.py
+
+  Repair:
+    docker exec -it fieldkit-prod-app-1 python3 /app/phase1/fieldkit_phase1/reconcile_users.py --commit
+"""
+
+import sys
+import getpass
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+from psycopg2.extras import Json, RealDictCursor
+
+CANONICAL = 'fieldkit_getagrip'
+DATABASES = [
+    'fieldkit_getagrip',
+    'fieldkit_kleanit_charlotte',
+    'fieldkit_cts',
+    'fieldkit_kleanit_sf',
+]
+DB_HOST = 'db'
+DB_PORT = 5432
+DB_USER = 'fieldkit'
+
+# Must match USER_REPLICATION_GID_PREFIX in fieldkit_backend/app.py.
+GID_PREFIX = 'fieldkit-users'
+
+# Replicated columns. last_login is only kept on the canonical database.
+FIELDS = ['email', 'password_hash', 'full_name', 'role', 'company_access', 'is_active']
+
+
+def connect(db_name, password):
+    return psycopg2.connect(dbname=db_name, user=DB_USER, password=password,
+                            host=DB_HOST, port=DB_PORT, cursor_factory=RealDictCursor)
+
+
+def leftover_prepared(db_name, password):
+    """Prepared user-replication transactions in this database that are old
+    enough that no running write can still be finishing them."""
+    conn = connect(db_name, password)
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT gid, prepared FROM pg_prepared_xacts
+            WHERE database = current_database()
+              AND gid LIKE %s
+              AND prepared < now() - interval '1 minute'
+            ORDER BY prepared
+        """, (GID_PREFIX + ':%',))
+        return [r['gid'] for r in cur.fetchall()]
+    finally:
+        conn.close()
+
+
+def rollback_prepared(db_name, password, gids):
+    conn = connect(db_name, password)
+    conn.autocommit = True  # ROLLBACK PREPARED can't run inside a transaction
+    try:
+        cur = conn.cursor()
+        for gid in gids:
+            cur.execute("ROLLBACK PREPARED %s", (gid,))
+    finally:
+        conn.close()
+
+
+def load_users(db_name, password):
+    conn = connect(db_name, password)
+    try:
+        cur = conn.cursor()
+        cur.execute(f"SELECT username, {', '.join(FIELDS)} FROM users")
+        return {r['username']: r for r in cur.fetchall()}
+    finally:
+        conn.close()
+
+
+def diff(canonical, replica):
+    """(missing usernames, {username: [differing fields]}, extra usernames)."""
+    missing = sorted(u for u in canonical if u not in replica)
+    extra   = sorted(u for u in replica if u not in canonical)
+    changed = {}
+    for username, row in canonical.items():
+        other = replica.get(username)
+        if other is None:
+            continue
+        fields = [f for f in FIELDS if row[f] != other[f]]
+        if fields:
+            changed[username] = fields
+    return missing, changed, extra
+
+
+def repair(db_name, password, canonical, missing, changed):
+    conn = connect(db_name, password)
+    try:
+        cur = conn.cursor()
+        for username in missing:
+            row = canonical[username]
+            cur.execute(f"""
+                INSERT INTO users (username, {', '.join(FIELDS)})
+                VALUES (%s, {', '.join(['%s'] * len(FIELDS))})
+                ON CONFLICT (username) DO NOTHING
+            """, [username] + [Json(row[f]) if f == 'company_access' else row[f]
+                               for f in FIELDS])
+        for username in changed:
+            row = canonical[username]
+            cur.execute(f"""
+                UPDATE users
+                SET {', '.join(f'{f} = %s' for f in FIELDS)},
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE username = %s
+            """, [Json(row[f]) if f == 'company_access' else row[f] for f in FIELDS]
+                 + [username])
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def main():
+    commit = '--commit' in sys.argv
+
+    print("=" * 60)
+    print("FieldKit: User Replication Reconciliation")
+    print("=" * 60)
+    print(f"Mode: {'COMMIT (writes to database)' if commit else 'DRY RUN (no writes)'}")
+
+    password = getpass.getpass(f"\nPostgreSQL password for user '{DB_USER}': ")
+
+    with ThreadPoolExecutor(max_workers=len(DATABASES)) as pool:
+        print("\nLeftover prepared transactions:")
+        leftovers = dict(zip(DATABASES, pool.map(lambda db: leftover_prepared(db, password), DATABASES)))
+        for db_name, gids in leftovers.items():
+            print(f"  {db_name:30} {len(gids)}")
+            for gid in gids:
+                print(f"      {gid}")
+        if commit:
+            list(pool.map(lambda db: rollback_prepared(db, password, leftovers[db]),
+                          [db for db in DATABASES if leftovers[db]]))
+
+        users = dict(zip(DATABASES, pool.map(lambda db: load_users(db, password), DATABASES)))
+
+    canonical = users[CANONICAL]
+    print(f"\nCanonical ({CANONICAL}): {len(canonical)} users")
+    drift = 0
+    for db_name in DATABASES:
+        if db_name == CANONICAL:
+            continue
+        missing, changed, extra = diff(canonical, users[db_name])
+        print(f"  {db_name:30} missing {len(missing)}, differing {len(changed)}, extra {len(extra)}")
+        for username in missing:
+            print(f"      missing:   {username}")
+        for username, fields in sorted(changed.items()):
+            print(f"      differs:   {username} ({', '.join(fields)})")
+        for username in extra:
+            print(f"      extra:     {username} (not in canonical; left alone)")
+        if missing or changed:
+            drift += 1
+            if commit:
+                repair(db_name, password, canonical, missing, changed)
+                print(f"      repaired from canonical")
+
+    if drift and not commit:
+        print("\nRe-run with --commit to repair.")
+    return 1 if drift and not commit else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())